@@ -0,0 +1,103 @@
+"""normalized tags
+
+Revision ID: a306157938b8
+Revises: 7b75b348d53f
+Create Date: 2026-10-18 15:35:42.785432
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = "a306157938b8"
+down_revision: Union[str, None] = "7b75b348d53f"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Старая таблица (twitter_account_id, tag) переименовывается, данные переносятся в tag + account_tag
+    with op.batch_alter_table("tag", schema=None) as batch_op:
+        batch_op.drop_index("ix_tag_tag_twitter_account_id")
+    op.rename_table("tag", "tag_legacy")
+    op.execute("ALTER TABLE tag_legacy RENAME CONSTRAINT tag_pkey TO tag_legacy_pkey")
+
+    op.create_table(
+        "tag",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("name", sa.String(length=16), nullable=False),
+        sa.PrimaryKeyConstraint("id"),
+        sa.UniqueConstraint("name"),
+    )
+    op.create_table(
+        "account_tag",
+        sa.Column("twitter_account_id", sa.Integer(), nullable=False),
+        sa.Column("tag_id", sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(
+            ["tag_id"],
+            ["tag.id"],
+        ),
+        sa.ForeignKeyConstraint(
+            ["twitter_account_id"],
+            ["twitter_account.database_id"],
+        ),
+        sa.PrimaryKeyConstraint("twitter_account_id", "tag_id"),
+    )
+
+    op.execute("INSERT INTO tag (name) SELECT DISTINCT tag FROM tag_legacy ORDER BY tag")
+    op.execute(
+        """
+        INSERT INTO account_tag (twitter_account_id, tag_id)
+        SELECT tag_legacy.twitter_account_id, tag.id
+        FROM tag_legacy
+        JOIN tag ON tag.name = tag_legacy.tag
+        """
+    )
+    op.drop_table("tag_legacy")
+
+    # Индекс создается после переноса данных: так быстрее, чем обновлять его на каждую строку
+    with op.batch_alter_table("account_tag", schema=None) as batch_op:
+        batch_op.create_index(
+            "ix_account_tag_tag_id_twitter_account_id",
+            ["tag_id", "twitter_account_id"],
+            unique=False,
+        )
+
+
+def downgrade() -> None:
+    op.create_table(
+        "tag_legacy",
+        sa.Column("twitter_account_id", sa.Integer(), nullable=False),
+        sa.Column("tag", sa.String(length=16), nullable=False),
+        sa.ForeignKeyConstraint(
+            ["twitter_account_id"],
+            ["twitter_account.database_id"],
+            name="tag_twitter_account_id_fkey",
+        ),
+        sa.PrimaryKeyConstraint("twitter_account_id", "tag", name="tag_legacy_pkey"),
+    )
+    op.execute(
+        """
+        INSERT INTO tag_legacy (twitter_account_id, tag)
+        SELECT account_tag.twitter_account_id, tag.name
+        FROM account_tag
+        JOIN tag ON tag.id = account_tag.tag_id
+        """
+    )
+
+    with op.batch_alter_table("account_tag", schema=None) as batch_op:
+        batch_op.drop_index("ix_account_tag_tag_id_twitter_account_id")
+    op.drop_table("account_tag")
+    op.drop_table("tag")
+
+    op.rename_table("tag_legacy", "tag")
+    op.execute("ALTER TABLE tag RENAME CONSTRAINT tag_legacy_pkey TO tag_pkey")
+    with op.batch_alter_table("tag", schema=None) as batch_op:
+        batch_op.create_index(
+            "ix_tag_tag_twitter_account_id",
+            ["tag", "twitter_account_id"],
+            unique=False,
+        )
@@ -49,9 +49,10 @@ async def ask_float(message: str = "Enter value (float):", min: float = None, ma
     return float(value)
 
 
-async def ask_int(message: str = "Enter value (int):", min: int = None, max: int = None) -> int:
+async def ask_int(message: str = "Enter value (int):", min: int = None, max: int = None) -> int | None:
+    """None при отмене ввода."""
     value = await questionary.text(message, validate=lambda text: _validate_int(text, min, max)).ask_async()
-    return int(value)
+    return int(value) if value is not None else None
 
 
 async def ask_filename(message: str = "Enter filename:", default: str = "", blacklist: Iterable[str] = None) -> str:
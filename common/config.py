@@ -1,3 +1,5 @@
+from typing import Literal
+
 from pydantic import BaseModel
 
 from .logger import LoggingLevel
@@ -9,12 +11,23 @@ class LoggingConfig(BaseModel):
 
 class ConcurrencyConfig(BaseModel):
     MAX_TASKS: int = 1
+    MAX_TASKS_PER_PROXY: int = 0
     MAX_RETRIES: int = 3
     DELAY_BETWEEN_RETRIES: int = 5
     DELAY_BETWEEN_ACTIONS: tuple[int, int] = (0, 0)
     DELAY_BETWEEN_ACCOUNTS: tuple[int, int] = (0, 0)
 
 
+class RetryConfig(BaseModel):
+    MAX_DELAY: int = 60
+    JITTER: bool = True
+    SERVER_ERROR_RETRIES: int = 3
+    NETWORK_ERROR_RETRIES: int = 3
+    RATE_LIMIT_RETRIES: int = 3
+    CIRCUIT_BREAKER_THRESHOLD: int = 5
+    CIRCUIT_BREAKER_COOLDOWN: int = 60
+
+
 class RequestsConfig(BaseModel):
     TIMEOUT: int = 30
     REQUIRE_PROXY: bool = True
@@ -26,6 +39,22 @@ class TwitterConfig(BaseModel):
     USE_SUSPENDED_ACCOUNTS: bool = False
 
 
+class RateLimitsConfig(BaseModel):
+    # [actions, per seconds]
+    FOLLOW: tuple[int, int] = (15, 900)
+    QUOTE: tuple[int, int] = (15, 900)
+    LOOKUP: tuple[int, int] = (95, 900)
+    TOTP: tuple[int, int] = (5, 900)
+
+
+class TextConfig(BaseModel):
+    STRATEGY: Literal["words", "templates", "markov"] = "words"
+    WORDS_COUNT: tuple[int, int] = (1, 1)
+    POOL_SIZE: int = 10000
+    MARKOV_ORDER: int = 2
+    MARKOV_MAX_WORDS: int = 20
+
+
 class CaptchaConfig(BaseModel):
     CAPSOLVER_API_KEY: str | None = None
 
@@ -41,3 +70,13 @@ class DatabaseConfig(BaseModel):
     PASSWORD: str
     HOST: str
     PORT: int
+    POOL_SIZE: int = 20
+    MAX_OVERFLOW: int = 10
+    POOL_TIMEOUT: int = 30
+    POOL_PRE_PING: bool = True
+    POOL_RECYCLE: int = 1800
+    STATEMENT_CACHE_SIZE: int = 500
+    BULK_CHUNK_SIZE: int = 1000
+    WRITE_BUFFER_SIZE: int = 100
+    WRITE_BUFFER_INTERVAL: int = 5
+    TAG_INDEX: bool = True
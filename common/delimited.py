@@ -0,0 +1,154 @@
+import csv
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Iterable, Iterator, Sequence
+
+from .excel import Column
+from .files import read_fields_from_file
+
+# Расширение файла: разделитель
+DELIMITERS = {
+    ".csv": ",",
+    ".tsv": "\t",
+    ".txt": ":",
+}
+# В файлах .txt нет заголовков, поэтому порядок полей задается отдельно
+FIELDS_SEPARATOR = ":"
+
+
+def get_delimited_filepaths(dirpath: Path) -> list[Path]:
+    return [filepath for filepath in dirpath.iterdir() if filepath.is_file() and filepath.suffix in DELIMITERS]
+
+
+class DelimitedText:
+    """
+    Потоковые чтение и запись таблиц в текстовых форматах по той же схеме столбцов, что и Excel:
+    - CSV и TSV с заголовками (Column.full_header или Column.key) в первой строке;
+    - строки вида field:field:field без заголовков, порядок полей задается ключами столбцов.
+
+    Строки представлены так же, как в Excel: столбцы с group_name вложены в отдельный словарь.
+    """
+
+    def __init__(self, columns: list[Column]) -> None:
+        self.columns = columns
+        self._columns_by_key = {column.key: column for column in columns}
+
+    def parse_fields(self, fields: str | Sequence[str]) -> list[str]:
+        """
+        :param fields: Ключи столбцов через FIELDS_SEPARATOR или списком. Пример: username:password:auth_token
+        """
+        if isinstance(fields, str):
+            fields = fields.split(FIELDS_SEPARATOR)
+        fields = [field.strip() for field in fields]
+        if unknown_fields := [field for field in fields if field not in self._columns_by_key]:
+            raise ValueError(f"Unknown fields: {', '.join(unknown_fields)}."
+                             f" Available: {', '.join(self._columns_by_key)}")
+        return fields
+
+    def _nest(self, flat_row: dict[str, Any]) -> dict[str, Any]:
+        row_data: dict[str, Any] = {}
+        for key, value in flat_row.items():
+            column = self._columns_by_key[key]
+            if column.group_name:
+                row_data.setdefault(column.group_name, {})[key] = value
+            else:
+                row_data[key] = value
+        return row_data
+
+    def _flatten(self, row_data: dict[str, Any], keys: Sequence[str]) -> list[Any]:
+        values = []
+        for key in keys:
+            column = self._columns_by_key[key]
+            value = row_data.get(column.group_name, {}).get(key) if column.group_name else row_data.get(key)
+            values.append("" if value is None else value)
+        return values
+
+    def read_rows(self, filepath: Path, *, fields: str | Sequence[str] = None) -> Iterator[dict[str, Any]]:
+        """
+        Читает строки файла по одной. Разделитель определяется по расширению (см. DELIMITERS).
+
+        :param fields: Порядок полей для файлов без заголовков (.txt).
+        """
+        delimiter = DELIMITERS[filepath.suffix]
+        if delimiter == FIELDS_SEPARATOR:
+            if not fields:
+                raise ValueError(f"Fields order is required for {filepath.suffix} files")
+            for flat_row in read_fields_from_file(filepath, separator=delimiter, fields=self.parse_fields(fields)):
+                yield self._nest(flat_row)
+            return
+
+        headers = {column.full_header: column.key for column in self.columns}
+        headers.update({column.key: column.key for column in self.columns})
+        with open(filepath, "r", encoding="utf-8", newline="") as file:
+            reader = csv.reader(file, delimiter=delimiter)
+            # (номер значения в строке, ключ, группа) для известных столбцов
+            plan = [
+                (index, key, self._columns_by_key[key].group_name)
+                for index, key in enumerate(headers.get(header.strip()) for header in next(reader, ()))
+                if key
+            ]
+            groups = {group for _, _, group in plan if group}
+            for values in reader:
+                if not any(values):
+                    continue
+                row_data: dict[str, Any] = {group: {} for group in groups}
+                for index, key, group in plan:
+                    value = values[index] if index < len(values) else None
+                    (row_data[group] if group else row_data)[key] = value or None
+                yield row_data
+
+    @contextmanager
+    def stream_writer(self, filepath: Path, *, fields: str | Sequence[str] = None) -> Iterator["DelimitedStreamWriter"]:
+        """
+        Построчная запись в файл: writer.write(row_data) для каждой строки.
+        Разделитель определяется по расширению.
+
+        :param fields: Какие поля и в каком порядке записать. По умолчанию все столбцы.
+        """
+        delimiter = DELIMITERS[filepath.suffix]
+        keys = self.parse_fields(fields) if fields else [column.key for column in self.columns]
+        with open(filepath, "w", encoding="utf-8", newline="") as file:
+            writer = DelimitedStreamWriter(file, delimiter, keys, self._flatten)
+            if delimiter != FIELDS_SEPARATOR:
+                writer.write_headers([self._columns_by_key[key].full_header for key in keys])
+            yield writer
+
+    def export(
+            self,
+            filepath: Path,
+            rows: Iterable[dict[str, Any]],
+            *,
+            fields: str | Sequence[str] = None,
+    ) -> int:
+        """
+        Записывает строки в файл по мере их поступления. Разделитель определяется по расширению.
+
+        :param fields: Какие поля и в каком порядке записать. По умолчанию все столбцы.
+        :return: Количество записанных строк.
+        """
+        with self.stream_writer(filepath, fields=fields) as writer:
+            for row_data in rows:
+                writer.write(row_data)
+        return writer.count
+
+
+class DelimitedStreamWriter:
+    def __init__(self, file, delimiter: str, keys: Sequence[str], flatten):
+        self.keys = keys
+        self.flatten = flatten
+        self.count = 0
+        self._delimiter = delimiter
+        self._file = file
+        self._csv_writer = csv.writer(file, delimiter=delimiter) if delimiter != FIELDS_SEPARATOR else None
+
+    def write_headers(self, headers: Sequence[str]):
+        self._csv_writer.writerow(headers)
+
+    def write(self, row_data: dict[str, Any]):
+        values = self.flatten(row_data, self.keys)
+        if self._csv_writer:
+            self._csv_writer.writerow(values)
+        else:
+            self._file.write(self._delimiter.join(map(str, values)))
+            self._file.write("\n")
+        self.count += 1
@@ -1,14 +1,21 @@
+from contextlib import contextmanager
 from datetime import datetime
-from typing import Any
+from typing import Any, Callable, Iterable, Iterator, Sequence
 from pathlib import Path
+import pickle
+import tempfile
 
 from openpyxl import Workbook, load_workbook
 from openpyxl.worksheet.worksheet import Worksheet
+from openpyxl.worksheet._write_only import WriteOnlyWorksheet
+from openpyxl.cell import WriteOnlyCell
 from openpyxl.styles import PatternFill
 from openpyxl.utils import get_column_letter
 
 
 RED = "90EE90"
+# Первая строка — заголовки, вторая — описания столбцов
+DATA_FIRST_ROW = 3
 
 
 class Column:
@@ -62,38 +69,39 @@ class Excel:
 
     def create_empty_table(self, dirpath: Path, name: str) -> Path:
         """Создает пустую таблицу с заголовками и описаниями."""
-        wb = Workbook()
-        ws = wb.active
-
-        for i, column in enumerate(self.columns, start=1):
-            ws.cell(row=1, column=i, value=column.full_header)
-
-        for i, column in enumerate(self.columns, start=1):
-            cell = ws.cell(row=2, column=i, value=column.full_description)
-
+        workbook = Workbook(write_only=True)
+        worksheet = workbook.create_sheet()
+
+        widths = ColumnWidths(column.full_header for column in self.columns)
+        for i, column in enumerate(self.columns):
+            widths.update(i, max(column.full_description.splitlines(), key=len))
+        widths.apply(worksheet)
+
+        worksheet.append([column.full_header for column in self.columns])
+        descriptions = []
+        for column in self.columns:
+            cell = WriteOnlyCell(worksheet, value=column.full_description)
             if column.color:
                 cell.fill = column.color
-
-        for column_cells in ws.columns:
-            length = max(len(str(cell.value)) for cell in column_cells)
-            ws.column_dimensions[get_column_letter(column_cells[0].column)].width = length
+            descriptions.append(cell)
+        worksheet.append(descriptions)
 
         table_filepath = dirpath / f"{name}.xlsx"
-        wb.save(table_filepath)
+        workbook.save(table_filepath)
         return table_filepath
 
-    def read_worksheet(self, worksheet: Worksheet) -> list[dict[str, Any]]:
-        """Читает данные из таблицы начиная с третьей строки."""
+    def iter_worksheet(self, worksheet: Worksheet) -> Iterator[dict[str, Any]]:
+        """Построчно читает данные из таблицы начиная с третьей строки."""
         # Создаем словарь для сопоставления заголовков столбцов из файла с объектами Column
         column_map: dict[int, Column] = {}
-        for i, cell in enumerate(worksheet[1], start=1):  # Предполагаем, что заголовки находятся в первой строке
+        headers = next(worksheet.iter_rows(min_row=1, max_row=1, values_only=True), ())
+        for i, header in enumerate(headers, start=1):  # Предполагаем, что заголовки находятся в первой строке
             for column in self.columns:
-                if cell.value == column.full_header:
+                if header == column.full_header:
                     column_map[i] = column
                     break
 
-        data: list[dict[str, Any]] = []
-        for row in worksheet.iter_rows(min_row=3, values_only=True):
+        for row in worksheet.iter_rows(min_row=DATA_FIRST_ROW, values_only=True):
             row_data: dict[str, Any] = {}
             for i, value in enumerate(row, start=1):
                 column = column_map.get(i)
@@ -104,57 +112,157 @@ class Excel:
                         row_data[column.group_name][column.key] = value
                     else:
                         row_data[column.key] = value
-            if row_data:  # Добавляем только если есть данные
-                data.append(row_data)
+            if row_data:  # Отдаем только если есть данные
+                yield row_data
+
+    def read_worksheet(self, worksheet: Worksheet) -> list[dict[str, Any]]:
+        """Читает данные из таблицы начиная с третьей строки."""
+        return list(self.iter_worksheet(worksheet))
+
+    def read_rows(self, filepath: Path, worksheet_name: str = None) -> Iterator[dict[str, Any]]:
+        """
+        Читает строки листа по одной, не загружая рабочую книгу в память.
+
+        :param worksheet_name: По умолчанию первый лист.
+        """
+        workbook = load_workbook(filepath, read_only=True)
+        try:
+            worksheet = workbook[worksheet_name] if worksheet_name else workbook.worksheets[0]
+            yield from self.iter_worksheet(worksheet)
+        finally:
+            workbook.close()
+
+    def _row_values(self, row_data: dict[str, Any]) -> list[Any]:
+        values = []
+        for column in self.columns:
+            if column.group_name:
+                values.append(row_data.get(column.group_name, {}).get(column.key))
+            else:
+                values.append(row_data.get(column.key))
+        return values
+
+    @contextmanager
+    def stream_writer(self, filepath: Path) -> Iterator["ExcelStreamWriter"]:
+        """
+        Построчная выгрузка рабочей книги: writer.write(row_data) для каждой строки.
+        Книга сохраняется при выходе из контекста.
+        """
+        writer = ExcelStreamWriter(
+            [column.full_header for column in self.columns],
+            self._row_values,
+            title=datetime.now().strftime("%d.%m.%Y"),
+        )
+        try:
+            yield writer
+            writer.save(filepath)
+        finally:
+            writer.close()
+
+    def export_stream(self, filepath: Path, rows: Iterable[dict[str, Any]]) -> int:
+        """
+        Выгружает рабочую книгу по указанному пути, забирая строки из итератора по одной.
+        Память зависит только от количества столбцов.
 
-        return data
+        :param filepath: Путь к файлу рабочей книги.
+        :param rows: Словари, где ключи — названия полей, а значения — данные.
+        :return: Количество выгруженных строк.
+        """
+        with self.stream_writer(filepath) as writer:
+            for row_data in rows:
+                writer.write(row_data)
+        return writer.count
 
-    def export(self, filepath: Path, data: list[dict[str, Any]]):
+    def export(self, filepath: Path, data: Iterable[dict[str, Any]]):
         """
         Выгружает рабочую книгу по указанному пути.
 
         :param filepath: Путь к файлу рабочей книги.
-        :param data: Список словарей, где ключи — названия полей, а значения — данные.
+        :param data: Словари, где ключи — названия полей, а значения — данные.
         """
-        workbook = Workbook()
-        worksheet = workbook.active
-
-        now = datetime.now()
-        worksheet.title = now.strftime("%d.%m.%Y")
-
-        # Записываем заголовки
-        for column_idx, column in enumerate(self.columns, start=1):
-            worksheet.cell(row=1, column=column_idx, value=column.full_header)
-
-        # Записываем данные
-        for row_idx, row_data in enumerate(data, start=2):
-            for column_idx, column in enumerate(self.columns, start=1):
-                if column.group_name:
-                    group_data = row_data.get(column.group_name, {})
-                    value = group_data.get(column.key, "")
-                else:
-                    value = row_data.get(column.key, "")
-                worksheet.cell(row=row_idx, column=column_idx, value=value)
-
-        # Устанавливаем ширину столбцов
-        for column_cells in worksheet.columns:
-            length = max(len(str(cell.value)) for cell in column_cells)
-            worksheet.column_dimensions[get_column_letter(column_cells[0].column)].width = length
+        self.export_stream(filepath, data)
+
+
+class ColumnWidths:
+    """Ширина столбцов по самому длинному значению, считается по мере поступления строк."""
+
+    def __init__(self, headers: Iterable[Any]):
+        self.widths = [len(str(header)) for header in headers]
+
+    def update(self, i: int, value: Any):
+        if value is not None:
+            self.widths[i] = max(self.widths[i], len(str(value)))
+
+    def update_row(self, values: Sequence[Any]):
+        for i, value in enumerate(values):
+            self.update(i, value)
 
+    def apply(self, worksheet: Worksheet | WriteOnlyWorksheet):
+        """В write-only режиме вызывается до записи первой строки."""
+        for i, width in enumerate(self.widths, start=1):
+            worksheet.column_dimensions[get_column_letter(i)].width = width
+
+
+class ExcelStreamWriter:
+    """
+    Пишет строки в write-only рабочую книгу, не держа лист в памяти.
+
+    В write-only режиме ширину столбцов нужно задать до первой строки,
+    поэтому строки сначала складываются во временный файл, а ширина считается по ходу записи.
+    """
+
+    def __init__(self, headers: Sequence[str], to_values: Callable[[Any], Sequence[Any]], *, title: str = None):
+        self.headers = list(headers)
+        self.to_values = to_values
+        self.title = title
+        self.count = 0
+        self._widths = ColumnWidths(self.headers)
+        self._spool = tempfile.TemporaryFile()
+
+    def write(self, row: Any):
+        values = self.to_values(row)
+        self._widths.update_row(values)
+        pickle.dump(values, self._spool)
+        self.count += 1
+
+    def save(self, filepath: Path):
+        workbook = Workbook(write_only=True)
+        worksheet = workbook.create_sheet(self.title)
+        self._widths.apply(worksheet)
+
+        worksheet.append(self.headers)
+        self._spool.seek(0)
+        while True:
+            try:
+                worksheet.append(pickle.load(self._spool))
+            except EOFError:
+                break
         workbook.save(filepath)
 
+    def close(self):
+        self._spool.close()
+
 
 def get_xlsx_filepaths(dirpath: Path) -> list[Path]:
     return list(dirpath.glob("*.xlsx"))
 
 
-def get_worksheets(filepath: Path) -> dict[str, Worksheet]:
+def count_worksheet_rows(filepath: Path) -> dict[str, int]:
     """
-    Загружает рабочую книгу из указанного файла и возвращает словарь её листов,
-    где ключи — это названия листов, а значения — объекты листов.
+    Количество строк с данными в каждом листе (без заголовков и описаний).
+    Берется из размеров листа, записанных в файле, поэтому ячейки обычно не читаются.
 
     :param filepath: Путь к файлу рабочей книги.
-    :return: Словарь, где ключи — названия листов, а значения — листы.
+    :return: Словарь, где ключи — названия листов, а значения — количество строк.
     """
-    workbook = load_workbook(filepath)
-    return {sheet.title: sheet for sheet in workbook.worksheets}
+    workbook = load_workbook(filepath, read_only=True)
+    try:
+        sizes = {}
+        for sheet in workbook.worksheets:
+            if sheet.max_row:
+                sizes[sheet.title] = max(sheet.max_row - DATA_FIRST_ROW + 1, 0)
+            else:
+                # Размер в файле не записан: строки приходится перебрать
+                sizes[sheet.title] = sum(1 for _ in sheet.iter_rows(min_row=DATA_FIRST_ROW, values_only=True))
+        return sizes
+    finally:
+        workbook.close()
@@ -11,12 +11,22 @@ def read_fields_from_file(
     """
     :param separator: Разделитель между данными в строке.
     :param fields: Кортеж, содержащий имена полей в порядке их появления в строке.
+        Последнее поле получает остаток строки, поэтому может содержать разделитель (например, прокси).
     """
     with open(filepath, 'r', encoding='utf-8') as file:
         for line in file:
-            line.strip()
-            if line == '\n':
+            line = line.strip()
+            if not line:
                 continue
-            data = dict(zip(fields, line.split(separator)))
+            data = dict(zip(fields, line.split(separator, len(fields) - 1)))
             data.update({key: None for key in data if not data[key]})
             yield data
+
+
+def count_lines(filepath: Path | str) -> int:
+    """Быстрый подсчет строк без декодирования файла."""
+    count = 0
+    with open(filepath, "rb") as file:
+        while chunk := file.read(1 << 20):
+            count += chunk.count(b"\n")
+    return count
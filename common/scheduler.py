@@ -0,0 +1,168 @@
+import asyncio
+from collections import Counter, deque
+from typing import Any, AsyncIterable, Awaitable, Callable, Generic, Hashable, TypeVar
+
+T = TypeVar("T")
+
+_EMPTY = object()
+
+
+class FairScheduler(Generic[T]):
+    """
+    Пул из max_workers воркеров, который раздает элементы по кругу между ключами
+    (например, прокси) и не допускает больше max_per_key одновременно
+    выполняющихся задач на один ключ.
+
+    Элементы забираются из источника лениво: в буфере держится не больше prefetch
+    элементов. Если все буферизованные элементы относятся к занятым ключам,
+    а воркеры простаивают, буфер дочитывается (но не больше max_buffer),
+    чтобы найти элемент со свободным ключом.
+
+    Если handler вернул число, элемент будет повторно поставлен в очередь через
+    указанное количество секунд. Ожидание не занимает воркера.
+    Ключ можно временно исключить из раздачи методом pause().
+    """
+
+    def __init__(
+            self,
+            handler: Callable[[T], Awaitable[Any]],
+            *,
+            max_workers: int,
+            key: Callable[[T], Hashable] = None,
+            max_per_key: int = 0,
+            prefetch: int = None,
+            max_buffer: int = None,
+    ):
+        """
+        :param handler: Корутина, которая обрабатывает один элемент.
+            Может вернуть задержку в секундах, после которой элемент нужно обработать повторно.
+        :param max_workers: Количество воркеров.
+        :param key: Функция, возвращающая ключ элемента. По умолчанию у всех элементов один ключ.
+        :param max_per_key: Максимум одновременных задач на ключ. 0 — без ограничения.
+        :param prefetch: Сколько элементов держать в буфере. По умолчанию 2 * max_workers.
+        :param max_buffer: Жесткий предел буфера. По умолчанию 10 * max_workers.
+        """
+        self.handler = handler
+        self.max_workers = max(max_workers, 1)
+        self.key = key or (lambda item: None)
+        self.max_per_key = max_per_key
+        self.prefetch = prefetch or self.max_workers * 2
+        self.max_buffer = max(max_buffer or self.max_workers * 10, self.prefetch)
+
+        self._condition = asyncio.Condition()
+        self._pending: dict[Hashable, deque[T]] = {}
+        self._round_robin: deque[Hashable] = deque()
+        self._in_flight: Counter[Hashable] = Counter()
+        self._paused_until: dict[Hashable, float] = {}
+        self._buffered = 0
+        self._delayed = 0
+        self._waiting_workers = 0
+        self._exhausted = False
+        self._task_group: asyncio.TaskGroup | None = None
+
+    def _key_is_free(self, key: Hashable) -> bool:
+        if key in self._paused_until:
+            if asyncio.get_running_loop().time() < self._paused_until[key]:
+                return False
+            del self._paused_until[key]
+        return self.max_per_key <= 0 or self._in_flight[key] < self.max_per_key
+
+    def _is_done(self) -> bool:
+        return self._exhausted and not self._buffered and not self._delayed
+
+    def _has_dispatchable(self) -> bool:
+        return any(self._key_is_free(key) for key in self._round_robin)
+
+    def _wants_more(self) -> bool:
+        if self._buffered < self.prefetch:
+            return True
+        return (self._waiting_workers > 0
+                and self._buffered < self.max_buffer
+                and not self._has_dispatchable())
+
+    def _push(self, item: T):
+        key = self.key(item)
+        if key not in self._pending:
+            self._pending[key] = deque()
+            self._round_robin.append(key)
+        self._pending[key].append(item)
+        self._buffered += 1
+
+    def _pop(self) -> T | object:
+        for _ in range(len(self._round_robin)):
+            key = self._round_robin[0]
+            self._round_robin.rotate(-1)
+            if not self._key_is_free(key):
+                continue
+
+            items = self._pending[key]
+            item = items.popleft()
+            if not items:
+                del self._pending[key]
+                self._round_robin.pop()
+            self._buffered -= 1
+            self._in_flight[key] += 1
+            return item
+
+        return _EMPTY
+
+    async def _feed(self, items: AsyncIterable[T]):
+        async for item in items:
+            async with self._condition:
+                await self._condition.wait_for(self._wants_more)
+                self._push(item)
+                self._condition.notify_all()
+
+        async with self._condition:
+            self._exhausted = True
+            self._condition.notify_all()
+
+    async def _notify_after(self, delay: float):
+        await asyncio.sleep(delay)
+        async with self._condition:
+            self._condition.notify_all()
+
+    async def _requeue_after(self, item: T, delay: float):
+        await asyncio.sleep(delay)
+        async with self._condition:
+            self._delayed -= 1
+            self._push(item)
+            self._condition.notify_all()
+
+    def pause(self, key: Hashable, seconds: float):
+        """Не раздает элементы с этим ключом указанное количество секунд."""
+        until = asyncio.get_running_loop().time() + seconds
+        if until > self._paused_until.get(key, 0):
+            self._paused_until[key] = until
+            self._task_group.create_task(self._notify_after(seconds))
+
+    async def _work(self):
+        while True:
+            async with self._condition:
+                while (item := self._pop()) is _EMPTY:
+                    if self._is_done():
+                        return
+                    self._waiting_workers += 1
+                    self._condition.notify_all()
+                    await self._condition.wait()
+                    self._waiting_workers -= 1
+                self._condition.notify_all()
+
+            key = self.key(item)
+            delay = None
+            try:
+                delay = await self.handler(item)
+            finally:
+                async with self._condition:
+                    self._in_flight[key] -= 1
+                    if delay is not None:
+                        self._delayed += 1
+                        self._task_group.create_task(self._requeue_after(item, delay))
+                    self._condition.notify_all()
+
+    async def run(self, items: AsyncIterable[T]):
+        async with asyncio.TaskGroup() as task_group:
+            self._task_group = task_group
+            task_group.create_task(self._feed(items))
+            for _ in range(self.max_workers):
+                task_group.create_task(self._work())
@@ -1,6 +1,7 @@
-from typing import Type, TypeVar
+from typing import Any, Hashable, Iterable, Sequence, Type, TypeVar
 
-from sqlalchemy import select
+from sqlalchemy import select, inspect, tuple_
+from sqlalchemy.dialects import postgresql, sqlite
 from sqlalchemy.ext.asyncio import AsyncSession
 
 
@@ -52,3 +53,129 @@ async def update_or_create(session: AsyncSession, model: Type[T], defaults: dict
         created = True
 
     return instance, created
+
+
+DEFAULT_CHUNK_SIZE = 1000
+# Максимум параметров в одном запросе у psycopg / PostgreSQL
+MAX_QUERY_PARAMETERS = 65535
+
+
+def max_rows_per_query(chunk_size: int, parameters_per_row: int) -> int:
+    """
+    Сколько строк передать в одном запросе с параметрами на каждую строку (VALUES, IN (...)),
+    чтобы не превысить MAX_QUERY_PARAMETERS. INSERT с executemany SQLAlchemy делит на страницы сам.
+    """
+    return max(min(chunk_size, MAX_QUERY_PARAMETERS // max(parameters_per_row, 1)), 1)
+
+
+def _insert_for(session: AsyncSession, model: Type[T]):
+    # Core-конструкция для таблицы модели: при executemany SQLAlchemy сам собирает
+    # многострочный INSERT (insertmanyvalues), не компилируя запрос заново для каждой пачки
+    dialect = session.get_bind().dialect.name
+    if dialect == "postgresql":
+        return postgresql.insert(model.__table__)
+    if dialect == "sqlite":
+        return sqlite.insert(model.__table__)
+    raise NotImplementedError(f"Bulk upsert is not supported for {dialect}")
+
+
+def _key(row: dict, columns: Sequence[str]) -> Hashable:
+    return row[columns[0]] if len(columns) == 1 else tuple(row[column] for column in columns)
+
+
+def _pk(row, pk_count: int) -> Any:
+    return row[0] if pk_count == 1 else tuple(row[:pk_count])
+
+
+def _dedupe(rows: Iterable[dict], conflict_cols: Sequence[str]) -> list[dict]:
+    # Одна и та же запись не может быть изменена дважды одним INSERT ... ON CONFLICT
+    return list({_key(row, conflict_cols): row for row in rows}.values())
+
+
+def _chunks(rows: list[dict], chunk_size: int) -> Iterable[list[dict]]:
+    for start in range(0, len(rows), chunk_size):
+        yield rows[start:start + chunk_size]
+
+
+async def bulk_upsert(
+        session: AsyncSession,
+        model: Type[T],
+        rows: Iterable[dict],
+        conflict_cols: Sequence[str],
+        update_cols: Sequence[str] = None,
+        *,
+        chunk_size: int = DEFAULT_CHUNK_SIZE,
+) -> dict[Hashable, Any]:
+    """
+    Массовый аналог update_or_create: один INSERT ... ON CONFLICT DO UPDATE на пачку строк.
+    Поддерживаются PostgreSQL и SQLite.
+
+    :param session: Экземпляр асинхронной сессии SQLAlchemy.
+    :param model: Класс модели, с которым будет проводиться операция.
+    :param rows: Словари со значениями полей. У всех строк должен быть одинаковый набор ключей.
+        Если строки совпадают по conflict_cols, сохраняется последняя.
+    :param conflict_cols: Поля уникального ограничения, по которому ищется существующая запись.
+    :param update_cols: Поля, которые обновляются у существующей записи.
+        По умолчанию все поля строки, кроме conflict_cols. Если обновлять нечего, работает как bulk_get_or_create.
+    :param chunk_size: Сколько строк вставлять одним запросом.
+    :return: Первичные ключи записей по значению conflict_cols (кортеж, если полей несколько).
+    """
+    rows = _dedupe(rows, conflict_cols)
+    if not rows:
+        return {}
+
+    if update_cols is None:
+        update_cols = [column for column in rows[0] if column not in conflict_cols]
+    if not update_cols:
+        primary_keys, _ = await bulk_get_or_create(session, model, rows, conflict_cols, chunk_size=chunk_size)
+        return primary_keys
+
+    pk_columns = inspect(model).primary_key
+    primary_keys = {}
+    for chunk in _chunks(rows, chunk_size):
+        query = _insert_for(session, model)
+        query = query.on_conflict_do_update(
+            index_elements=conflict_cols,
+            set_={column: query.excluded[column] for column in update_cols},
+        ).returning(*pk_columns, *(getattr(model, column) for column in conflict_cols))
+        for row in (await session.execute(query, chunk)).all():
+            primary_keys[_key(row._mapping, conflict_cols)] = _pk(row, len(pk_columns))
+    return primary_keys
+
+
+async def bulk_get_or_create(
+        session: AsyncSession,
+        model: Type[T],
+        rows: Iterable[dict],
+        conflict_cols: Sequence[str],
+        *,
+        chunk_size: int = DEFAULT_CHUNK_SIZE,
+) -> tuple[dict[Hashable, Any], set[Hashable]]:
+    """
+    Массовый аналог get_or_create: INSERT ... ON CONFLICT DO NOTHING на пачку строк,
+    затем один SELECT первичных ключей уже существовавших записей.
+
+    :return: Первичные ключи записей по значению conflict_cols и множество значений conflict_cols созданных записей.
+    """
+    rows = _dedupe(rows, conflict_cols)
+    pk_columns = inspect(model).primary_key
+    key_columns = [getattr(model, column) for column in conflict_cols]
+    primary_keys = {}
+    for chunk in _chunks(rows, chunk_size):
+        query = _insert_for(session, model).on_conflict_do_nothing(
+            index_elements=conflict_cols,
+        ).returning(*pk_columns, *key_columns)
+        for row in (await session.execute(query, chunk)).all():
+            primary_keys[_key(row._mapping, conflict_cols)] = _pk(row, len(pk_columns))
+
+    created = set(primary_keys)
+    missing = [_key(row, conflict_cols) for row in rows if _key(row, conflict_cols) not in created]
+    select_chunk_size = max_rows_per_query(chunk_size, len(key_columns))
+    for start in range(0, len(missing), select_chunk_size):
+        keys = missing[start:start + select_chunk_size]
+        condition = key_columns[0].in_(keys) if len(key_columns) == 1 else tuple_(*key_columns).in_(keys)
+        query = select(*pk_columns, *key_columns).where(condition)
+        for row in (await session.execute(query)).all():
+            primary_keys[_key(row._mapping, conflict_cols)] = _pk(row, len(pk_columns))
+
+    return primary_keys, created
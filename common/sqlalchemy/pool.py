@@ -0,0 +1,72 @@
+import time
+from dataclasses import dataclass
+
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+
+@dataclass
+class PoolMetrics:
+    checkouts: int = 0
+    wait_time: float = 0  # sec. Суммарное ожидание соединения
+    max_wait_time: float = 0
+    overflow_events: int = 0  # Сколько раз открывалось соединение сверх pool_size
+    timeouts: int = 0
+    peak_checked_out: int = 0
+
+    @property
+    def avg_wait_time(self) -> float:
+        return self.wait_time / self.checkouts if self.checkouts else 0
+
+    def reset(self) -> "PoolMetrics":
+        """
+        :return: Снимок метрик до сброса.
+        """
+        snapshot = PoolMetrics(**vars(self))
+        self.__init__()
+        return snapshot
+
+    def __str__(self):
+        return (f"checkouts={self.checkouts}"
+                f" peak_checked_out={self.peak_checked_out}"
+                f" avg_wait={self.avg_wait_time:.3f}s"
+                f" max_wait={self.max_wait_time:.3f}s"
+                f" overflow_events={self.overflow_events}"
+                f" timeouts={self.timeouts}")
+
+
+class MeteredAsyncAdaptedQueuePool(AsyncAdaptedQueuePool):
+    """
+    AsyncAdaptedQueuePool, который считает время ожидания соединения,
+    открытия соединений сверх pool_size и таймауты.
+
+    Метрики доступны через engine.pool.metrics и переживают engine.dispose().
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.metrics = PoolMetrics()
+
+    def recreate(self) -> "MeteredAsyncAdaptedQueuePool":
+        pool = super().recreate()
+        pool.metrics = self.metrics
+        return pool
+
+    def _do_get(self):
+        overflow = self._overflow
+        started_at = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except PoolTimeoutError:
+            self.metrics.timeouts += 1
+            raise
+        finally:
+            wait_time = time.perf_counter() - started_at
+            self.metrics.wait_time += wait_time
+            self.metrics.max_wait_time = max(self.metrics.max_wait_time, wait_time)
+
+        self.metrics.checkouts += 1
+        if self._overflow > overflow and self._overflow > 0:
+            self.metrics.overflow_events += 1
+        self.metrics.peak_checked_out = max(self.metrics.peak_checked_out, self.checkedout())
+        return connection
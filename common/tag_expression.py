@@ -0,0 +1,130 @@
+"""
+Выражения над тегами: "vip and (us or uk) and not banned".
+
+Операторы по убыванию приоритета: not (!), and (&), or (|, запятая). Скобки группируют.
+Список тегов через запятую — это "любой из тегов": "a, b" == "a or b".
+
+Выражение разбирается в дерево из кортежей:
+    ("tag", "vip"), ("not", node), ("and", [node, ...]), ("or", [node, ...])
+и вычисляется функцией evaluate с операциями, заданными вызывающим кодом (SQL, битовые маски и т.д.).
+"""
+import re
+from typing import Callable, Iterable, TypeVar
+
+T = TypeVar("T")
+
+TagExpression = tuple
+
+_TOKEN_RE = re.compile(r"\s*(?:(?P<op>[()!&|,])|(?P<word>[^\s()!&|,]+))")
+_KEYWORDS = {"and": "&", "or": "|", "not": "!"}
+_OPERATORS = {"(", ")", "!", "&", "|"}
+
+
+def _tokenize(text: str) -> list[str]:
+    tokens = []
+    position = 0
+    text = text.rstrip()
+    while position < len(text):
+        match = _TOKEN_RE.match(text, position)
+        if not match:
+            raise ValueError(f"Unexpected character at {position}: {text[position:]!r}")
+        position = match.end()
+        if op := match["op"]:
+            tokens.append("|" if op == "," else op)
+        else:
+            word = match["word"]
+            tokens.append(_KEYWORDS.get(word.lower(), word))
+    return tokens
+
+
+class _Parser:
+
+    def __init__(self, tokens: list[str]):
+        self.tokens = tokens
+        self.position = 0
+
+    def _peek(self) -> str | None:
+        return self.tokens[self.position] if self.position < len(self.tokens) else None
+
+    def _next(self) -> str | None:
+        token = self._peek()
+        self.position += 1
+        return token
+
+    def parse(self) -> TagExpression:
+        node = self._or()
+        if self._peek() is not None:
+            raise ValueError(f"Unexpected {self._peek()!r}")
+        return node
+
+    def _binary(self, operator: str, name: str, operand: Callable[[], TagExpression]) -> TagExpression:
+        nodes = [operand()]
+        while self._peek() == operator:
+            self._next()
+            nodes.append(operand())
+        return nodes[0] if len(nodes) == 1 else (name, nodes)
+
+    def _or(self) -> TagExpression:
+        return self._binary("|", "or", self._and)
+
+    def _and(self) -> TagExpression:
+        return self._binary("&", "and", self._not)
+
+    def _not(self) -> TagExpression:
+        if self._peek() == "!":
+            self._next()
+            return "not", self._not()
+        return self._atom()
+
+    def _atom(self) -> TagExpression:
+        token = self._next()
+        if token == "(":
+            node = self._or()
+            if self._next() != ")":
+                raise ValueError("Missing ')'")
+            return node
+        if token is None or token in _OPERATORS:
+            raise ValueError(f"Expected tag, got {token or 'end of expression'!r}")
+        return "tag", token
+
+
+def parse_tag_expression(expression: str | Iterable[str]) -> TagExpression:
+    """
+    :param expression: Строка выражения или список тегов (любой из них).
+    """
+    if not isinstance(expression, str):
+        tags = list(expression)
+        if not tags:
+            raise ValueError("Empty tag expression")
+        return ("or", [("tag", tag) for tag in tags]) if len(tags) > 1 else ("tag", tags[0])
+    tokens = _tokenize(expression)
+    if not tokens:
+        raise ValueError("Empty tag expression")
+    return _Parser(tokens).parse()
+
+
+def expression_tags(node: TagExpression) -> set[str]:
+    """Все теги, упомянутые в выражении."""
+    kind, value = node
+    if kind == "tag":
+        return {value}
+    if kind == "not":
+        return expression_tags(value)
+    return set().union(*(expression_tags(child) for child in value))
+
+
+def evaluate(
+        node: TagExpression,
+        *,
+        tag: Callable[[str], T],
+        not_: Callable[[T], T],
+        and_: Callable[[list[T]], T],
+        or_: Callable[[list[T]], T],
+) -> T:
+    kind, value = node
+    if kind == "tag":
+        return tag(value)
+    if kind == "not":
+        return not_(evaluate(value, tag=tag, not_=not_, and_=and_, or_=or_))
+    children = [evaluate(child, tag=tag, not_=not_, and_=and_, or_=or_) for child in value]
+    return and_(children) if kind == "and" else or_(children)
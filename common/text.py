@@ -0,0 +1,162 @@
+"""
+Генерация коротких текстов (например, для цитат) по подключаемым стратегиям:
+- WordsGenerator — случайные слова из списка;
+- TemplateGenerator — шаблоны со слотами: "Wow, {word}!";
+- MarkovGenerator — цепь Маркова, обученная на корпусе текстов.
+
+Тексты генерируются заранее в TextPool, из которого каждый ключ (аккаунт) получает тексты без повторов за O(1).
+"""
+from abc import ABC, abstractmethod
+from math import gcd
+from string import Formatter
+from typing import Hashable, Iterable, Sequence
+import random
+
+
+class TextGenerator(ABC):
+
+    @abstractmethod
+    def generate(self, rng: random.Random) -> str:
+        ...
+
+
+class WordsGenerator(TextGenerator):
+
+    def __init__(self, words: Sequence[str], words_count: tuple[int, int] = (1, 1)):
+        """
+        :param words: Любая последовательность с доступом по индексу, например WordList.
+        :param words_count: Сколько слов в тексте: от и до.
+        """
+        if not words:
+            raise ValueError("Words list is empty")
+        self.words = words
+        self.words_count = words_count
+
+    def generate(self, rng: random.Random) -> str:
+        count = rng.randint(*self.words_count)
+        return " ".join(self.words[rng.randrange(len(self.words))] for _ in range(count))
+
+
+class TemplateGenerator(TextGenerator):
+
+    def __init__(self, templates: Iterable[str], slots: dict[str, Sequence[str]]):
+        """
+        :param templates: Строки вида "Wow, {word} {emoji}!". Каждый слот заменяется случайным значением.
+        :param slots: Значения по имени слота.
+        """
+        # Шаблоны разбираются один раз: (текст, имя слота или None)
+        self._templates: list[list[tuple[str, str | None]]] = []
+        for template in templates:
+            parts = [(literal, field_name or None) for literal, field_name, _, _ in Formatter().parse(template)]
+            if unknown_slots := {slot for _, slot in parts if slot and not slots.get(slot)}:
+                raise ValueError(f"No values for slots {', '.join(sorted(unknown_slots))} in template: {template}")
+            self._templates.append(parts)
+        if not self._templates:
+            raise ValueError("No templates")
+        self.slots = slots
+
+    def generate(self, rng: random.Random) -> str:
+        parts = self._templates[rng.randrange(len(self._templates))]
+        text = []
+        for literal, slot in parts:
+            text.append(literal)
+            if slot:
+                values = self.slots[slot]
+                text.append(values[rng.randrange(len(values))])
+        return "".join(text)
+
+
+class MarkovGenerator(TextGenerator):
+    _END = None
+
+    def __init__(self, corpus: Iterable[str], order: int = 2, max_words: int = 20):
+        """
+        :param corpus: Тексты для обучения: одна строка — один текст.
+        :param order: Сколько предыдущих слов определяют следующее.
+        :param max_words: Максимальная длина текста в словах.
+        """
+        self.order = order
+        self.max_words = max_words
+        # Переходы хранятся списками с повторами: выбор следующего слова с учетом частоты за O(1)
+        self._transitions: dict[tuple[str, ...], list[str | None]] = {}
+        self._starts: list[tuple[str, ...]] = []
+        for line in corpus:
+            words = line.split()
+            if len(words) < order:
+                continue
+            self._starts.append(tuple(words[:order]))
+            for index in range(len(words) - order + 1):
+                state = tuple(words[index:index + order])
+                next_word = words[index + order] if index + order < len(words) else self._END
+                self._transitions.setdefault(state, []).append(next_word)
+        if not self._starts:
+            raise ValueError(f"Corpus has no texts of at least {order} words")
+
+    def generate(self, rng: random.Random) -> str:
+        state = self._starts[rng.randrange(len(self._starts))]
+        words = list(state)
+        while len(words) < self.max_words:
+            next_words = self._transitions[state]
+            next_word = next_words[rng.randrange(len(next_words))]
+            if next_word is self._END:
+                break
+            words.append(next_word)
+            state = (*state[1:], next_word)
+        return " ".join(words)
+
+
+class TextPool:
+    """
+    Заранее подготовленные уникальные тексты.
+
+    Каждый ключ (например, аккаунт) обходит пул в своем случайном порядке: начало и шаг выбираются один раз,
+    шаг взаимно прост с размером пула, поэтому первые len(pool) текстов ключа не повторяются.
+    Выдача текста — O(1), на ключ хранится три числа. После исчерпания пула тексты ключа начинают повторяться.
+    """
+
+    def __init__(self, texts: Sequence[str], rng: random.Random = None):
+        if not texts:
+            raise ValueError("Text pool is empty")
+        self.texts = texts
+        self.rng = rng or random.Random()
+        # ключ: (начало, шаг, сколько выдано)
+        self._cursors: dict[Hashable, tuple[int, int, int]] = {}
+
+    @classmethod
+    def generate(
+            cls,
+            generator: TextGenerator,
+            size: int,
+            rng: random.Random = None,
+            *,
+            max_attempts_factor: int = 10,
+    ) -> "TextPool":
+        """
+        Генерирует до size уникальных текстов. Генерация прекращается раньше,
+        если генератор выдает в основном повторы (более size * max_attempts_factor попыток).
+        """
+        rng = rng or random.Random()
+        texts = {}
+        for _ in range(size * max_attempts_factor):
+            if len(texts) >= size:
+                break
+            texts[generator.generate(rng)] = None
+        return cls(list(texts), rng)
+
+    def __len__(self) -> int:
+        return len(self.texts)
+
+    def _new_cursor(self) -> tuple[int, int, int]:
+        size = len(self.texts)
+        step = self.rng.randrange(1, size) if size > 1 else 1
+        while gcd(step, size) != 1:
+            step = self.rng.randrange(1, size)
+        return self.rng.randrange(size), step, 0
+
+    def take(self, key: Hashable, count: int) -> list[str]:
+        """Следующие count текстов для ключа, без повторов в пределах размера пула."""
+        start, step, taken = self._cursors.get(key) or self._new_cursor()
+        size = len(self.texts)
+        texts = [self.texts[(start + (taken + index) * step) % size] for index in range(count)]
+        self._cursors[key] = (start, step, taken + count)
+        return texts
@@ -9,6 +9,7 @@ from .file import (
 )
 from .other import (
     hidden_value,
+    chunked,
 )
 
 
@@ -21,4 +22,5 @@ __all__ = [
     "write_json",
     "to_json",
     "hidden_value",
+    "chunked",
 ]
@@ -1,4 +1,17 @@
+from itertools import islice
+from typing import Iterable, Iterator, TypeVar
+
+T = TypeVar("T")
+
+
 def hidden_value(value: str) -> str:
     start = value[:3]
     end = value[-3:]
     return f"{start}**{end}"
+
+
+def chunked(iterable: Iterable[T], size: int) -> Iterator[list[T]]:
+    """Разбивает итерируемый объект на списки по size элементов, не загружая его целиком."""
+    iterator = iter(iterable)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
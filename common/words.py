@@ -0,0 +1,83 @@
+from array import array
+from collections.abc import Sequence
+from pathlib import Path
+from typing import Iterable
+import mmap
+
+
+class WordList(Sequence):
+    """
+    Список слов на диске: слова хранятся в одном файле через перевод строки (.txt),
+    рядом лежит индекс смещений начала каждого слова (.idx, uint32).
+
+    Файл отображается в память (mmap), поэтому открытие мгновенное, а память не зависит от размера списка.
+    Слово читается по индексу только при обращении, например random.sample(words, 10).
+    """
+
+    def __init__(self, filepath: Path):
+        self.filepath = filepath
+        self._offsets = array("I")
+        with open(index_path(filepath), "rb") as file:
+            self._offsets.frombytes(file.read())
+        with open(filepath, "rb") as file:
+            self._mmap = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) if len(self._offsets) > 1 else b""
+
+    def __len__(self) -> int:
+        return max(len(self._offsets) - 1, 0)
+
+    def __getitem__(self, index: int) -> str:
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("WordList index out of range")
+        # Смещение следующего слова включает перевод строки
+        return self._mmap[self._offsets[index]:self._offsets[index + 1] - 1].decode("utf-8")
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}({self.filepath.name}, words={len(self)})"
+
+    @classmethod
+    def build(cls, filepath: Path, words: Iterable[str]) -> "WordList":
+        """
+        Записывает слова (без пустых и повторов, порядок сохраняется) и их индекс.
+        Файлы заменяются атомарно: прерванная запись не портит существующий кэш.
+        """
+        offsets = array("I", [0])
+        tmp_filepath = filepath.with_suffix(filepath.suffix + ".tmp")
+        tmp_index_path = index_path(filepath).with_suffix(".idx.tmp")
+        seen = set()
+        with open(tmp_filepath, "wb") as file:
+            for word in words:
+                word = word.strip()
+                if not word or word in seen:
+                    continue
+                seen.add(word)
+                data = word.encode("utf-8") + b"\n"
+                file.write(data)
+                offsets.append(offsets[-1] + len(data))
+        with open(tmp_index_path, "wb") as file:
+            file.write(offsets.tobytes())
+        tmp_filepath.replace(filepath)
+        tmp_index_path.replace(index_path(filepath))
+        return cls(filepath)
+
+    @classmethod
+    def is_built(cls, filepath: Path, newer_than: Iterable[Path] = ()) -> bool:
+        """Есть ли готовый список с индексом, и не старше ли он исходных файлов."""
+        if not filepath.exists() or not index_path(filepath).exists():
+            return False
+        built_at = min(filepath.stat().st_mtime, index_path(filepath).stat().st_mtime)
+        return all(source.stat().st_mtime <= built_at for source in newer_than)
+
+
+def index_path(filepath: Path) -> Path:
+    return filepath.with_suffix(".idx")
+
+
+def read_words(filepaths: Iterable[Path]) -> Iterable[str]:
+    """Слова из текстовых файлов: одна строка — одно слово."""
+    for filepath in filepaths:
+        with open(filepath, "r", encoding="utf-8") as file:
+            yield from file
@@ -10,24 +10,24 @@ from common.author import print_author_info, open_channel
 from common.logger import setup_logger
 from tweepy_manager.paths import LOG_DIR
 from tweepy_manager.config import CONFIG
-from tweepy_manager.database import update_database_or_quite
+from tweepy_manager.database import update_database_or_quite, engine_lifespan
 
 # Модули
-from tweepy_manager.modules.import_ import select_and_import_xlsx
-from tweepy_manager.modules.export import export_to_xlsx
+from tweepy_manager.modules.import_ import select_and_import
+from tweepy_manager.modules.export import select_and_export
 from tweepy_manager.modules.request_accounts_info import update_accounts_info
 from tweepy_manager.modules.follow import follow
 from tweepy_manager.modules.quote_tweet import quote
-from tweepy_manager.modules.tags import add_tag
+from tweepy_manager.modules.tags import manage_tags
 from tweepy_manager.modules.enable_totp import enable_totp
 from tweepy_manager.modules.follow_each_other import follow_each_other
 
 
 MODULES = {
     '❤️ Channel': open_channel,
-    '➡️ Import accounts from .xlsx table': select_and_import_xlsx,
-    '➡️ Export accounts to .xlsx table': export_to_xlsx,
-    '➡️ Add tag': add_tag,
+    '➡️ Import accounts (.xlsx, .csv, .tsv, .txt)': select_and_import,
+    '➡️ Export accounts (.xlsx, .csv, .tsv, .txt)': select_and_export,
+    '➡️ Tags (add, remove, replace, rename)': manage_tags,
     '➡️ Update accounts info': update_accounts_info,
     '➡️ Follow': follow,
     '➡️ Quote Tweet (random word)': quote,
@@ -37,15 +37,34 @@ MODULES = {
 }
 
 
-def select_module(modules: dict[str: Callable]) -> Callable:
-    module_name = questionary.select("Select module:", choices=modules).ask()
+async def select_module(modules: dict[str: Callable]) -> Callable:
+    module_name = await questionary.select("Select module:", choices=modules).ask_async()
     return modules[module_name]
 
 
-def main():
-    asyncio.run(update_database_or_quite())
-    setup_logger(LOG_DIR, CONFIG.LOGGING.LEVEL)
-    logger.enable("twitter")
+async def run_modules():
+    """
+    Все модули выполняются в одном event loop'е, поэтому пул соединений
+    с базой данных переиспользуется между запусками модулей.
+    """
+    async with engine_lifespan():
+        await update_database_or_quite()
+        print_greeting()
+        while True:
+            fn = await select_module(MODULES)
+            if fn is quit:
+                break
+
+            try:
+                if inspect.iscoroutinefunction(fn):
+                    await fn()
+                else:
+                    fn()
+            except Exception:
+                logger.exception(f"Module {fn.__name__} failed")
+
+
+def print_greeting():
     print_project_info()
     print(">>>")
     print("Спасибо, что используете tweepy-manager!")
@@ -55,12 +74,12 @@ def main():
     print("Я рассчитываю на поддержку сообщества, давайте развивать этот инструмент вместе!")
     print_author_info()
     print("<<<")
-    while True:
-        fn = select_module(MODULES)
-        if inspect.iscoroutinefunction(fn):
-            asyncio.run(fn())
-        else:
-            fn()
+
+
+def main():
+    setup_logger(LOG_DIR, CONFIG.LOGGING.LEVEL)
+    logger.enable("twitter")
+    asyncio.run(run_modules())
 
 
 if __name__ == "__main__":
@@ -0,0 +1,81 @@
+import unittest
+from unittest.mock import patch, MagicMock, AsyncMock
+
+from sqlalchemy import select
+from sqlalchemy.dialects import postgresql
+
+from tweepy_manager.database.crud import AccountSelection, ask_selection
+from tweepy_manager.database.models import TwitterAccount
+
+
+def _sql(selection: AccountSelection) -> str:
+    query = selection.apply(select(TwitterAccount.database_id))
+    return str(query.compile(dialect=postgresql.dialect(), compile_kwargs={"literal_binds": True}))
+
+
+class TestAccountSelection(unittest.TestCase):
+
+    def test_all(self):
+        selection = AccountSelection()
+        self.assertIsNone(selection.limit)
+        self.assertEqual(selection.offset, 0)
+        sql = _sql(selection)
+        self.assertIn("ORDER BY twitter_account.database_id", sql)
+        self.assertNotRegex(sql, r"LIMIT \d")
+
+    def test_first(self):
+        selection = AccountSelection("first", count=10)
+        self.assertEqual(selection.limit, 10)
+        self.assertEqual(selection.offset, 0)
+        self.assertIn("LIMIT 10", _sql(selection))
+
+    def test_range_is_inclusive_and_one_based(self):
+        selection = AccountSelection("range", start=3, end=5)
+        self.assertEqual(selection.limit, 3)
+        self.assertEqual(selection.offset, 2)
+        sql = _sql(selection)
+        self.assertIn("LIMIT 3", sql)
+        self.assertIn("OFFSET 2", sql)
+
+    def test_single_position_range(self):
+        selection = AccountSelection("range", start=1, end=1)
+        self.assertEqual(selection.limit, 1)
+        self.assertEqual(selection.offset, 0)
+
+    def test_random(self):
+        selection = AccountSelection("random", count=5)
+        self.assertEqual(selection.limit, 5)
+        self.assertEqual(selection.offset, 0)
+        sql = _sql(selection)
+        self.assertIn("ORDER BY random()", sql)
+        self.assertIn("LIMIT 5", sql)
+
+
+
+def _answers(*answers) -> MagicMock:
+    """Подменяет questionary.select / questionary.text: вопросы по очереди получают answers (None — отмена)."""
+    prompt = MagicMock()
+    prompt.return_value.ask_async = AsyncMock(side_effect=answers)
+    return prompt
+
+
+class TestAskSelection(unittest.IsolatedAsyncioTestCase):
+
+    async def ask(self, mode: str | None, *answers) -> AccountSelection | str | None:
+        with patch("questionary.select", _answers(mode)), patch("questionary.text", _answers(*answers)):
+            return await ask_selection(50)
+
+    async def test_answers(self):
+        self.assertEqual(await self.ask("all"), AccountSelection())
+        self.assertEqual(await self.ask("first", "10"), AccountSelection("first", count=10))
+        self.assertEqual(await self.ask("range", "3-5"), AccountSelection("range", start=3, end=5))
+
+    async def test_cancelled(self):
+        self.assertIsNone(await self.ask(None))
+        self.assertIsNone(await self.ask("first", None))
+        self.assertIsNone(await self.ask("random", None))
+        self.assertIsNone(await self.ask("range", None))
+
+
+if __name__ == "__main__":
+    unittest.main()
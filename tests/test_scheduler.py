@@ -0,0 +1,108 @@
+import asyncio
+import unittest
+from collections import Counter
+from typing import AsyncIterator, Iterable
+
+from common.scheduler import FairScheduler
+
+
+async def _aiter(items: Iterable) -> AsyncIterator:
+    for item in items:
+        yield item
+
+
+class TestFairScheduler(unittest.IsolatedAsyncioTestCase):
+
+    async def test_processes_every_item_once(self):
+        processed = []
+
+        async def handler(item: int):
+            await asyncio.sleep(0)
+            processed.append(item)
+
+        await FairScheduler(handler, max_workers=4).run(_aiter(range(100)))
+        self.assertEqual(sorted(processed), list(range(100)))
+
+    async def test_round_robin_between_keys(self):
+        processed = []
+
+        async def handler(item: tuple[str, int]):
+            processed.append(item)
+
+        items = [("a", 1), ("a", 2), ("a", 3), ("b", 1), ("b", 2)]
+        scheduler = FairScheduler(handler, max_workers=1, key=lambda item: item[0], prefetch=len(items))
+        await scheduler.run(_aiter(items))
+        self.assertEqual(processed, [("a", 1), ("b", 1), ("a", 2), ("b", 2), ("a", 3)])
+
+    async def test_max_per_key(self):
+        in_flight = Counter()
+        max_in_flight = Counter()
+
+        async def handler(item: tuple[str, int]):
+            key = item[0]
+            in_flight[key] += 1
+            max_in_flight[key] = max(max_in_flight[key], in_flight[key])
+            await asyncio.sleep(0.001)
+            in_flight[key] -= 1
+
+        items = [(key, i) for i in range(20) for key in "ab"]
+        scheduler = FairScheduler(handler, max_workers=8, key=lambda item: item[0], max_per_key=2)
+        await scheduler.run(_aiter(items))
+        self.assertEqual(max_in_flight, Counter({"a": 2, "b": 2}))
+
+    async def test_skips_busy_key(self):
+        # Все элементы ключа a в буфере раньше b: свободный воркер берет b, не дожидаясь a
+        processed = []
+        release_a = asyncio.Event()
+
+        async def handler(item: tuple[str, int]):
+            if item == ("a", 1):
+                await release_a.wait()
+            processed.append(item)
+            if item[0] == "b":
+                release_a.set()
+
+        items = [("a", 1), ("a", 2), ("a", 3), ("b", 1)]
+        scheduler = FairScheduler(handler, max_workers=2, key=lambda item: item[0], max_per_key=1)
+        await asyncio.wait_for(scheduler.run(_aiter(items)), timeout=5)
+        self.assertEqual(processed[0], ("b", 1))
+        self.assertEqual(sorted(processed), sorted(items))
+
+    async def test_retry_after_delay(self):
+        attempts = Counter()
+
+        async def handler(item: int) -> float | None:
+            attempts[item] += 1
+            if attempts[item] < 3:
+                return 0.001
+            return None
+
+        await FairScheduler(handler, max_workers=2).run(_aiter(range(5)))
+        self.assertEqual(attempts, Counter({item: 3 for item in range(5)}))
+
+    async def test_paused_key_waits(self):
+        loop = asyncio.get_running_loop()
+        started = {}
+
+        async def handler(item: tuple[str, int]):
+            started[item] = loop.time()
+            if item == ("a", 1):
+                scheduler.pause("a", 0.05)
+
+        items = [("a", 1), ("a", 2)]
+        scheduler = FairScheduler(handler, max_workers=1, key=lambda item: item[0], prefetch=len(items))
+        await scheduler.run(_aiter(items))
+        self.assertGreaterEqual(started[("a", 2)] - started[("a", 1)], 0.04)
+
+    async def test_handler_error_propagates(self):
+        async def handler(item: int):
+            if item == 3:
+                raise RuntimeError("boom")
+
+        with self.assertRaises(ExceptionGroup) as context:
+            await FairScheduler(handler, max_workers=2).run(_aiter(range(10)))
+        self.assertIsInstance(context.exception.exceptions[0], RuntimeError)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,84 @@
+import unittest
+
+from common.tag_expression import parse_tag_expression, expression_tags, evaluate
+
+
+class TestParseTagExpression(unittest.TestCase):
+
+    def test_single_tag(self):
+        self.assertEqual(parse_tag_expression("vip"), ("tag", "vip"))
+
+    def test_comma_is_or(self):
+        self.assertEqual(parse_tag_expression("a, b"), parse_tag_expression("a or b"))
+        self.assertEqual(parse_tag_expression("a,b"), ("or", [("tag", "a"), ("tag", "b")]))
+
+    def test_symbols_and_keywords(self):
+        self.assertEqual(parse_tag_expression("!a & b | c"), parse_tag_expression("not a and b or c"))
+        self.assertEqual(parse_tag_expression("a AND NOT b"), ("and", [("tag", "a"), ("not", ("tag", "b"))]))
+
+    def test_and_binds_tighter_than_or(self):
+        self.assertEqual(
+            parse_tag_expression("a or b and c"),
+            ("or", [("tag", "a"), ("and", [("tag", "b"), ("tag", "c")])]),
+        )
+        self.assertEqual(
+            parse_tag_expression("a and b or c"),
+            ("or", [("and", [("tag", "a"), ("tag", "b")]), ("tag", "c")]),
+        )
+
+    def test_not_binds_tighter_than_and(self):
+        self.assertEqual(
+            parse_tag_expression("not a and b"),
+            ("and", [("not", ("tag", "a")), ("tag", "b")]),
+        )
+        self.assertEqual(parse_tag_expression("not not a"), ("not", ("not", ("tag", "a"))))
+
+    def test_parentheses(self):
+        self.assertEqual(
+            parse_tag_expression("vip and (us or uk) and not banned"),
+            ("and", [
+                ("tag", "vip"),
+                ("or", [("tag", "us"), ("tag", "uk")]),
+                ("not", ("tag", "banned")),
+            ]),
+        )
+        self.assertEqual(
+            parse_tag_expression("not (a or b)"),
+            ("not", ("or", [("tag", "a"), ("tag", "b")])),
+        )
+
+    def test_list_of_tags(self):
+        self.assertEqual(parse_tag_expression(["a"]), ("tag", "a"))
+        self.assertEqual(parse_tag_expression(["a", "b"]), ("or", [("tag", "a"), ("tag", "b")]))
+
+    def test_errors(self):
+        for expression in ("", "   ", [], "a and", "and a", "a or or b", "(a or b", "a or b)", "()", "a b", "not"):
+            with self.subTest(expression=expression):
+                with self.assertRaises(ValueError):
+                    parse_tag_expression(expression)
+
+    def test_expression_tags(self):
+        self.assertEqual(expression_tags(parse_tag_expression("vip and (us or uk) and not vip")), {"vip", "us", "uk"})
+
+    def test_evaluate(self):
+        accounts = {"a": {1, 2, 3}, "b": {3, 4}, "c": {5}}
+        all_accounts = {1, 2, 3, 4, 5, 6}
+
+        def ids(expression: str) -> set[int]:
+            return evaluate(
+                parse_tag_expression(expression),
+                tag=lambda tag: accounts.get(tag, set()),
+                not_=lambda value: all_accounts - value,
+                and_=lambda values: set.intersection(*values),
+                or_=lambda values: set.union(*values),
+            )
+
+        self.assertEqual(ids("a and b"), {3})
+        self.assertEqual(ids("a or b and c"), {1, 2, 3})
+        self.assertEqual(ids("(a or b) and not b"), {1, 2})
+        self.assertEqual(ids("not (a, b, c)"), {6})
+        self.assertEqual(ids("unknown"), set())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,61 @@
+import unittest
+
+from common.tag_expression import parse_tag_expression
+
+from tweepy_manager.database.tag_index import TagIndex, _bitmap
+
+
+def _ids(bitmap: int) -> set[int]:
+    return {database_id for database_id in range(bitmap.bit_length()) if bitmap >> database_id & 1}
+
+
+class TestBitmap(unittest.TestCase):
+
+    def test_bits(self):
+        database_ids = [1, 7, 8, 9, 64, 1000]
+        self.assertEqual(_bitmap(database_ids), sum(1 << database_id for database_id in database_ids))
+
+    def test_unordered_and_duplicates(self):
+        self.assertEqual(_bitmap([9, 3, 9, 0, 3]), _bitmap([0, 3, 9]))
+
+    def test_empty(self):
+        self.assertEqual(_bitmap([]), 0)
+
+
+class TestTagIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.index = TagIndex(
+            {"a": _bitmap([1, 2, 3]), "b": _bitmap([3, 4]), "c": _bitmap([5, 100])},
+            _bitmap([1, 2, 3, 4, 5, 6, 100]),
+        )
+
+    def evaluate(self, expression: str) -> set[int]:
+        return _ids(self.index.evaluate(parse_tag_expression(expression)))
+
+    def test_tags_and_counts(self):
+        self.assertEqual(self.index.tags, ["a", "b", "c"])
+        self.assertEqual(self.index.count("a"), 3)
+        self.assertEqual(self.index.count("unknown"), 0)
+
+    def test_and_or(self):
+        self.assertEqual(self.evaluate("a and b"), {3})
+        self.assertEqual(self.evaluate("a or b"), {1, 2, 3, 4})
+        self.assertEqual(self.evaluate("a, c"), {1, 2, 3, 5, 100})
+
+    def test_not_is_limited_to_existing_accounts(self):
+        self.assertEqual(self.evaluate("not a"), {4, 5, 6, 100})
+        self.assertEqual(self.evaluate("not (a or b or c)"), {6})
+        self.assertEqual(self.evaluate("not unknown"), {1, 2, 3, 4, 5, 6, 100})
+
+    def test_unknown_tag(self):
+        self.assertEqual(self.evaluate("unknown"), set())
+        self.assertEqual(self.evaluate("a and unknown"), set())
+
+    def test_no_duplicates(self):
+        # Аккаунт 3 с обоими тегами считается один раз
+        self.assertEqual(self.index.evaluate(parse_tag_expression("a or b")).bit_count(), 4)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,284 @@
+"""
+Неинтерактивный запуск модулей, например из cron.
+
+    tweepy-manager follow --tags a,b --status GOOD --targets usernames.txt
+    tweepy-manager quote --random 500 --tweet-ids 1234567890
+    tweepy-manager update-info --status GOOD,UNKNOWN + follow --targets usernames.txt
+
+Команды, разделенные "+", выполняются по очереди в одном event loop с одним пулом соединений.
+"""
+import argparse
+import asyncio
+import random
+import sys
+from pathlib import Path
+from typing import Sequence
+
+from loguru import logger
+from sqlalchemy import Select
+
+from common.logger import setup_logger
+from common.tag_expression import parse_tag_expression
+from common.utils import load_lines
+
+from .paths import LOG_DIR
+from .config import CONFIG
+from .database import AsyncSessionmaker, check_database_revision, engine_lifespan
+from .database.crud import (
+    get_accounts,
+    get_account_ids,
+    count_accounts,
+    accounts_query,
+    iter_selected_accounts,
+    AccountSelection,
+)
+from .database.records import AccountRecord
+from .jobs import get_unfinished_job
+from .modules.import_ import import_file
+from .modules.export import export_accounts, EXPORT_FORMATS
+from .modules.tags import add_tag_to_accounts, remove_tag_from_accounts, rename_account_tag, ALL_STATUSES, validate_tag
+from .modules.request_accounts_info import request_accounts_info, resume_request_accounts_info
+from .modules.follow import follow_users, resume_follow
+from .modules.quote_tweet import quote_by_accounts, resume_quote
+from .modules.enable_totp import enable_totp_for_accounts
+from .modules.process_utils import request_users, request_tweets
+
+COMMAND_SEPARATOR = "+"
+
+
+def _comma_separated(value: str) -> list[str]:
+    return [item.strip() for item in value.split(",") if item.strip()]
+
+
+def _tag_expression(value: str) -> str:
+    try:
+        parse_tag_expression(value)
+    except ValueError as exc:
+        raise argparse.ArgumentTypeError(str(exc))
+    return value
+
+
+def _tag(value: str) -> str:
+    if (error := validate_tag(value)) is not True:
+        raise argparse.ArgumentTypeError(error)
+    return value.strip()
+
+
+def _range(value: str) -> tuple[int, int]:
+    try:
+        start, end = map(int, value.split("-"))
+    except ValueError:
+        raise argparse.ArgumentTypeError("expected FROM-TO, for example 1-100")
+    if not 1 <= start <= end:
+        raise argparse.ArgumentTypeError("expected 1 <= FROM <= TO")
+    return start, end
+
+
+def _add_account_filters(parser: argparse.ArgumentParser, default_statuses: Sequence[str]):
+    parser.add_argument("--tags", type=_tag_expression, default=None,
+                        help="Any of comma separated tags or a tag expression with and, or, not and parentheses."
+                             " Example: tag1,tag2 or 'vip and (us or uk) and not banned'")
+    parser.add_argument("--status", type=_comma_separated, default=list(default_statuses),
+                        help=f"Comma separated account statuses. Default: {','.join(default_statuses)}")
+    parser.add_argument("--search", default=None,
+                        help="Username, email or id (* - any characters)")
+    selection = parser.add_mutually_exclusive_group()
+    selection.add_argument("--first", type=int, metavar="N", help="First N matching accounts")
+    selection.add_argument("--range", type=_range, metavar="FROM-TO",
+                           help="Matching accounts from position FROM to TO (from 1, ordered by id)")
+    selection.add_argument("--random", type=int, metavar="N", help="N random matching accounts")
+
+
+def _add_resume(parser: argparse.ArgumentParser):
+    parser.add_argument("--resume", action="store_true",
+                        help="Resume the latest unfinished job of this module if there is one")
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog="tweepy-manager",
+        description="Twitter accounts manager (non-interactive mode)",
+        epilog=f"Chain commands with '{COMMAND_SEPARATOR}': "
+               f"tweepy-manager update-info {COMMAND_SEPARATOR} follow --targets usernames.txt",
+    )
+    parser.add_argument("--upgrade", action="store_true", help="Upgrade the database if it is outdated")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    command = commands.add_parser("import", help="Import accounts from .xlsx, .csv, .tsv or .txt file")
+    command.add_argument("--file", type=Path, required=True)
+    command.add_argument("--sheet", default=None, help=".xlsx worksheet name. Default: first worksheet")
+    command.add_argument("--fields", default=None,
+                         help=".txt fields order. Example: username:password:auth_token")
+
+    command = commands.add_parser("export", help="Export accounts to .xlsx, .csv, .tsv or .txt file")
+    command.add_argument("--format", choices=EXPORT_FORMATS, default=".xlsx")
+    command.add_argument("--fields", default=None,
+                         help="Fields to export and their order. Example: username:password:auth_token")
+
+    command = commands.add_parser("add-tag", help="Add tag to accounts")
+    command.add_argument("--tag", type=_tag, required=True)
+    _add_account_filters(command, ALL_STATUSES)
+
+    command = commands.add_parser("remove-tag", help="Remove tag from accounts")
+    command.add_argument("--tag", type=_tag, required=True)
+    _add_account_filters(command, ALL_STATUSES)
+
+    command = commands.add_parser("rename-tag", help="Rename tag. Merges tags if the new one already exists")
+    command.add_argument("--tag", type=_tag, required=True)
+    command.add_argument("--new-name", type=_tag, required=True)
+
+    command = commands.add_parser("update-info", help="Update accounts info")
+    _add_account_filters(command, ("UNKNOWN", "GOOD", "LOCKED", "BAD_TOKEN"))
+    _add_resume(command)
+
+    command = commands.add_parser("follow", help="Follow users")
+    targets = command.add_mutually_exclusive_group()
+    targets.add_argument("--targets", type=Path, help="File with usernames, one per line")
+    targets.add_argument("--usernames", nargs="+")
+    _add_account_filters(command, ("GOOD", ))
+    _add_resume(command)
+
+    command = commands.add_parser("quote", help="Quote tweets (random word)")
+    tweets = command.add_mutually_exclusive_group()
+    tweets.add_argument("--tweets", type=Path, help="File with tweet IDs, one per line")
+    tweets.add_argument("--tweet-ids", nargs="+")
+    _add_account_filters(command, ("GOOD", ))
+    _add_resume(command)
+
+    command = commands.add_parser("enable-totp", help="Enable TOTP (2FA)")
+    _add_account_filters(command, ("UNKNOWN", "GOOD", "LOCKED"))
+
+    return parser
+
+
+def split_commands(argv: Sequence[str]) -> list[list[str]]:
+    commands = [[]]
+    for arg in argv:
+        if arg == COMMAND_SEPARATOR:
+            commands.append([])
+        else:
+            commands[-1].append(arg)
+    return [command for command in commands if command]
+
+
+def _filters(args: argparse.Namespace) -> dict:
+    return {"statuses": args.status, "tags": args.tags, "search": args.search, "selection": _selection(args)}
+
+
+def _accounts_query(args: argparse.Namespace) -> Select:
+    return _selection(args).apply(accounts_query(args.status, args.tags, args.search))
+
+
+async def _get_accounts(args: argparse.Namespace) -> list[AccountRecord]:
+    async with AsyncSessionmaker() as session:
+        return await get_accounts(session, **_filters(args))
+
+
+async def _get_account_ids(args: argparse.Namespace) -> list[int]:
+    async with AsyncSessionmaker() as session:
+        return await get_account_ids(session, **_filters(args))
+
+
+def _selection(args: argparse.Namespace) -> AccountSelection:
+    if args.first:
+        return AccountSelection("first", count=args.first)
+    if args.range:
+        start, end = args.range
+        return AccountSelection("range", start=start, end=end)
+    if args.random:
+        return AccountSelection("random", count=args.random)
+    return AccountSelection()
+
+
+async def _resume(args: argparse.Namespace, module: str, resume_fn) -> bool:
+    if not args.resume:
+        return False
+    if not (job := await get_unfinished_job(module)):
+        logger.info(f"No unfinished {module} job. Starting a new one")
+        return False
+    await resume_fn(job)
+    return True
+
+
+async def run_command(args: argparse.Namespace):
+    if args.command == "import":
+        await import_file(args.file, worksheet_name=args.sheet, fields=args.fields)
+
+    elif args.command == "export":
+        await export_accounts(args.format, args.fields)
+
+    elif args.command == "add-tag":
+        # Аккаунты не загружаются: запрос выборки выполняется внутри INSERT
+        await add_tag_to_accounts(_accounts_query(args), args.tag)
+
+    elif args.command == "remove-tag":
+        await remove_tag_from_accounts(_accounts_query(args), args.tag)
+
+    elif args.command == "rename-tag":
+        await rename_account_tag(args.tag, args.new_name)
+
+    elif args.command == "update-info":
+        if await _resume(args, "update_accounts_info", resume_request_accounts_info):
+            return
+        if database_ids := await _get_account_ids(args):
+            await request_accounts_info(database_ids)
+
+    elif args.command == "follow":
+        if await _resume(args, "follow", resume_follow):
+            return
+        usernames = load_lines(args.targets) if args.targets else args.usernames
+        if not usernames:
+            raise SystemExit("follow: --targets or --usernames is required")
+        if twitter_accounts := await _get_accounts(args):
+            users = await request_users(random.choice(twitter_accounts), usernames)
+            await follow_users(twitter_accounts, users)
+
+    elif args.command == "quote":
+        if await _resume(args, "quote", resume_quote):
+            return
+        tweet_ids = load_lines(args.tweets) if args.tweets else args.tweet_ids
+        if not tweet_ids:
+            raise SystemExit("quote: --tweets or --tweet-ids is required")
+        if twitter_accounts := await _get_accounts(args):
+            tweets_to_quote = await request_tweets(random.choice(twitter_accounts), tweet_ids)
+            await quote_by_accounts(twitter_accounts, tweets_to_quote)
+
+    elif args.command == "enable-totp":
+        async with AsyncSessionmaker() as session:
+            accounts_count = await count_accounts(session, _accounts_query(args))
+        if accounts_count:
+            await enable_totp_for_accounts(iter_selected_accounts(**_filters(args)), total=accounts_count)
+        else:
+            logger.warning("No accounts match the filter")
+
+
+async def run(commands: Sequence[argparse.Namespace]) -> int:
+    async with engine_lifespan():
+        if not await check_database_revision(upgrade=any(args.upgrade for args in commands)):
+            return 1
+
+        for args in commands:
+            logger.info(f"Running command: {args.command}")
+            await run_command(args)
+
+    return 0
+
+
+def main(argv: Sequence[str] = None) -> int:
+    parser = build_parser()
+    argv = sys.argv[1:] if argv is None else argv
+    commands = [parser.parse_args(command) for command in split_commands(argv)]
+    for args in commands:
+        if args.command == "rename-tag" and args.tag == args.new_name:
+            parser.error("rename-tag: --new-name must differ from --tag")
+    if not commands:
+        parser.print_help()
+        return 2
+
+    setup_logger(LOG_DIR, CONFIG.LOGGING.LEVEL)
+    logger.enable("twitter")
+    return asyncio.run(run(commands))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
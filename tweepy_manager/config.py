@@ -5,8 +5,11 @@ from common.utils import load_toml
 from common.config import (
     LoggingConfig,
     TwitterConfig,
+    RateLimitsConfig,
     CaptchaConfig,
+    TextConfig,
     ConcurrencyConfig,
+    RetryConfig,
     RequestsConfig,
     DatabaseConfig,
 )
@@ -16,8 +19,11 @@ from .paths import CONFIG_TOML
 class Config(BaseModel):
     LOGGING: LoggingConfig
     CONCURRENCY: ConcurrencyConfig
+    RETRY: RetryConfig = RetryConfig()
     TWITTER: TwitterConfig
+    RATE_LIMITS: RateLimitsConfig = RateLimitsConfig()
     CAPTCHA: CaptchaConfig
+    TEXT: TextConfig = TextConfig()
     REQUESTS: RequestsConfig
     DATABASE: DatabaseConfig
 
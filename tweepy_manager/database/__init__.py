@@ -1,15 +1,23 @@
 from .database import (
     AsyncSessionmaker,
     alembic_utils,
+    engine_lifespan,
+    pool_metrics,
+    write_buffer,
 )
 from .utils import (
     update_database_or_quite,
+    check_database_revision,
 )
 from . import models
 
 __all__ = [
     "AsyncSessionmaker",
     "alembic_utils",
+    "engine_lifespan",
+    "pool_metrics",
+    "write_buffer",
     "update_database_or_quite",
+    "check_database_revision",
     "models",
 ]
@@ -1,33 +1,167 @@
-from typing import Sequence
+from dataclasses import dataclass
+from typing import AsyncIterator, Iterable, Literal, Sequence
 
 import questionary
-from sqlalchemy import select
+from sqlalchemy import select, func, or_, and_, exists, literal, any_, Select, ColumnElement, Integer
+from sqlalchemy.dialects.postgresql import ARRAY
 from sqlalchemy.orm import joinedload
 from sqlalchemy.ext.asyncio import AsyncSession
 from loguru import logger
 import twitter
 
-from .models import TwitterAccount, Tag
+from common.ask import ask_int, ask_nonempty_text
+from common.tag_expression import TagExpression, parse_tag_expression, expression_tags
+from common.utils import chunked
+
+from .models import TwitterAccount, Tag, AccountTag, Tweet, Following
+from .records import AccountRecord, load_account_records
+from .tag_index import get_tag_index
+from .database import AsyncSessionmaker
 from ..config import CONFIG
 
 
-async def get_accounts(
-        session: AsyncSession,
+# Больше аккаунтов в questionary.checkbox рисуется слишком долго
+CHECKBOX_LIMIT = 100
+
+
+def search_filter(search: str) -> ColumnElement[bool]:
+    """
+    Поиск по username и email без учета регистра (* — любые символы, без * — вхождение подстроки),
+    а для чисел также по database_id и twitter_id.
+    """
+    search = search.strip()
+    pattern = search.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_").replace("*", "%")
+    if "%" not in pattern:
+        pattern = f"%{pattern}%"
+    conditions = [TwitterAccount.username.ilike(pattern), TwitterAccount.email.ilike(pattern)]
+    if search.isdigit():
+        conditions += [TwitterAccount.database_id == int(search), TwitterAccount.twitter_id == int(search)]
+    return or_(*conditions)
+
+
+def _has_any_tag(tags: Sequence[str]) -> ColumnElement[bool]:
+    # EXISTS — полусоединение: аккаунт с несколькими подходящими тегами не повторяется
+    tag_ids = select(Tag.id).filter(Tag.name.in_(tags) if len(tags) > 1 else Tag.name == tags[0])
+    return exists().where(
+        AccountTag.twitter_account_id == TwitterAccount.database_id,
+        AccountTag.tag_id.in_(tag_ids),
+    )
+
+
+def tag_filter(expression: TagExpression) -> ColumnElement[bool]:
+    """
+    Условие на аккаунт по выражению над тегами (см. common.tag_expression):
+    каждый тег — EXISTS по индексу (tag_id, twitter_account_id), not — NOT EXISTS.
+    """
+    kind, value = expression
+    if kind == "tag":
+        return _has_any_tag([value])
+    if kind == "not":
+        return ~tag_filter(value)
+    if kind == "and":
+        return and_(*(tag_filter(child) for child in value))
+    # Теги под or объединяются в один EXISTS ... IN (...)
+    tags = [child[1] for child in value if child[0] == "tag"]
+    conditions = [tag_filter(child) for child in value if child[0] != "tag"]
+    if tags:
+        conditions.insert(0, _has_any_tag(tags))
+    return or_(*conditions)
+
+
+def accounts_query(
         statuses: Sequence[twitter.AccountStatus] = None,
-        tags: Sequence[str] = None,
-) -> list[TwitterAccount]:
-    query = select(TwitterAccount).options(
-        joinedload(TwitterAccount.proxy),
-        joinedload(TwitterAccount.user),
-    ).order_by(TwitterAccount.database_id)
+        tags: str | Sequence[str] = None,
+        search: str = None,
+        *,
+        require_proxy: bool = None,
+) -> Select:
+    """
+    Аккаунты с любым из статусов, подходящие под теги. Без загрузки связей и без сортировки.
+
+    :param tags: Выражение над тегами ("vip and not banned") или список тегов (любой из них).
+    :param require_proxy: Только аккаунты с прокси. По умолчанию CONFIG.REQUESTS.REQUIRE_PROXY.
+    """
+    query = select(TwitterAccount)
 
     if statuses:
         query = query.filter(TwitterAccount.status.in_(statuses))
 
     if tags:
-        query = query.join(TwitterAccount.tags).filter(Tag.tag.in_(tags))
+        query = query.filter(tag_filter(parse_tag_expression(tags)))
+
+    if search:
+        query = query.filter(search_filter(search))
+
+    if CONFIG.REQUESTS.REQUIRE_PROXY if require_proxy is None else require_proxy:
+        query = query.filter(TwitterAccount.proxy_database_id.is_not(None))
+
+    return query
+
+
+async def count_accounts(session: AsyncSession, query: Select) -> int:
+    return await session.scalar(select(func.count()).select_from(query.order_by(None).subquery()))
+
+
+async def _warn_accounts_without_proxy(
+        session: AsyncSession,
+        statuses: Sequence[twitter.AccountStatus] = None,
+        tags: str | Sequence[str] = None,
+        search: str = None,
+):
+    if not CONFIG.REQUESTS.REQUIRE_PROXY:
+        return
+    query = accounts_query(statuses=statuses, tags=tags, search=search, require_proxy=False)
+    query = query.filter(TwitterAccount.proxy_database_id.is_(None))
+    if accounts_without_proxy := await count_accounts(session, query):
+        logger.warning(f"{accounts_without_proxy} accounts have no proxy!")
+
+
+@dataclass
+class AccountSelection:
+    """
+    Какую часть подходящих под фильтр аккаунтов выбрать. Отбор выполняется в SQL.
+    Позиции считаются от 1 в порядке database_id.
+
+    - all: все;
+    - first: первые count;
+    - range: с позиции start по позицию end включительно;
+    - random: случайные count.
+    """
+    mode: Literal["all", "first", "range", "random"] = "all"
+    count: int = None
+    start: int = 1
+    end: int = None
+
+    @property
+    def limit(self) -> int | None:
+        if self.mode == "range":
+            return self.end - self.start + 1
+        return self.count
 
-    accounts = list(await session.scalars(query))
+    @property
+    def offset(self) -> int:
+        return self.start - 1 if self.mode == "range" else 0
+
+    def apply(self, query: Select) -> Select:
+        if self.mode == "random":
+            return query.order_by(func.random()).limit(self.count)
+        return query.order_by(TwitterAccount.database_id).offset(self.offset).limit(self.limit)
+
+
+async def load_accounts(session: AsyncSession, query: Select) -> list[AccountRecord]:
+    """Аккаунты по запросу (см. accounts_query) в виде AccountRecord, в порядке database_id."""
+    return sorted(await load_account_records(session, query), key=lambda account: account.database_id)
+
+
+async def get_accounts(
+        session: AsyncSession,
+        statuses: Sequence[twitter.AccountStatus] = None,
+        tags: str | Sequence[str] = None,
+        search: str = None,
+        selection: AccountSelection = None,
+) -> list[AccountRecord]:
+    query = accounts_query(statuses=statuses, tags=tags, search=search)
+    accounts = await load_accounts(session, (selection or AccountSelection()).apply(query))
 
     accounts_count = len(accounts)
 
@@ -40,28 +174,186 @@ async def get_accounts(
         log_message += f"\n\tЗапрашиваемые статусы: {statuses}"
     if tags:
         log_message += f"\n\tЗапрашиваемые теги: {tags}"
+    if search:
+        log_message += f"\n\tПоиск: {search}"
     logger.log(level, log_message)
 
-    if CONFIG.REQUESTS.REQUIRE_PROXY:
-        if accounts_without_proxy := [account for account in accounts if not account.proxy]:
-            logger.warning(f"{len(accounts_without_proxy)} accounts have no proxy!")
+    await _warn_accounts_without_proxy(session, statuses, tags, search)
+    return accounts
 
-        return [account for account in accounts if account.proxy]
 
-    return accounts
+async def get_account_ids(
+        session: AsyncSession,
+        statuses: Sequence[twitter.AccountStatus] = None,
+        tags: str | Sequence[str] = None,
+        search: str = None,
+        selection: AccountSelection = None,
+) -> list[int]:
+    """database_id подходящих аккаунтов одним легким запросом, без загрузки самих аккаунтов."""
+    query = accounts_query(statuses=statuses, tags=tags, search=search)
+    query = (selection or AccountSelection()).apply(query).with_only_columns(TwitterAccount.database_id)
+    database_ids = sorted(await session.scalars(query))
+    logger.log("INFO" if database_ids else "WARNING", f"Выбрано {len(database_ids)} аккаунтов")
+    await _warn_accounts_without_proxy(session, statuses, tags, search)
+    return database_ids
+
+
+async def get_accounts_by_ids(session: AsyncSession, database_ids: Sequence[int]) -> list[AccountRecord]:
+    query = select(TwitterAccount).filter(TwitterAccount.database_id.in_(database_ids))
+    return await load_accounts(session, query)
+
+
+async def iter_accounts(
+        query: Select = None,
+        *,
+        limit: int = None,
+        offset: int = 0,
+        page_size: int = None,
+) -> AsyncIterator[AccountRecord]:
+    """
+    Аккаунты по запросу (см. accounts_query) в виде AccountRecord, в порядке database_id, страницами:
+    WHERE database_id > последний_с_прошлой_страницы ORDER BY database_id LIMIT page_size.
+    В памяти одновременно одна страница, обработка начинается после первой.
+
+    Каждая страница читается целиком в своей короткой сессии: курсор, открытый на все время обработки,
+    занимал бы соединение из пула, пока генератор ждет потребителя.
+
+    :param limit: Сколько аккаунтов выдать всего. По умолчанию все.
+    :param offset: Сколько аккаунтов пропустить в начале.
+    :param page_size: По умолчанию CONFIG.DATABASE.BULK_CHUNK_SIZE.
+    """
+    query = query if query is not None else accounts_query()
+    query = query.order_by(None).order_by(TwitterAccount.database_id)
+    page_size = page_size or CONFIG.DATABASE.BULK_CHUNK_SIZE
+    proxies = {}
+    last_database_id = None
+    while limit is None or limit > 0:
+        size = page_size if limit is None else min(page_size, limit)
+        if last_database_id is None:
+            page_query = query.offset(offset).limit(size)
+        else:
+            page_query = query.filter(TwitterAccount.database_id > last_database_id).limit(size)
+
+        async with AsyncSessionmaker() as session:
+            page = await load_account_records(session, page_query, proxies)
+
+        for account in page:
+            yield account
+
+        if len(page) < size:
+            return
+        last_database_id = page[-1].database_id
+        if limit is not None:
+            limit -= len(page)
+
+
+def accounts_by_ids_query(database_ids: Iterable[int]) -> Select:
+    """
+    Аккаунты по database_id с фильтром по прокси (см. accounts_query).
+    Идентификаторы передаются массивом в одном параметре.
+    """
+    database_ids = literal(sorted(set(database_ids)), ARRAY(Integer))
+    return accounts_query().filter(TwitterAccount.database_id == any_(database_ids))
+
+
+async def iter_accounts_by_ids(database_ids: Iterable[int], *, page_size: int = None) -> AsyncIterator[AccountRecord]:
+    """Аккаунты по database_id страницами (см. iter_accounts). Учитывается CONFIG.REQUESTS.REQUIRE_PROXY."""
+    for chunk in chunked(sorted(set(database_ids)), page_size or CONFIG.DATABASE.BULK_CHUNK_SIZE):
+        query = accounts_by_ids_query(chunk)
+        async for account in iter_accounts(query, page_size=len(chunk)):
+            yield account
+
+
+async def iter_selected_accounts(
+        statuses: Sequence[twitter.AccountStatus] = None,
+        tags: str | Sequence[str] = None,
+        search: str = None,
+        selection: AccountSelection = None,
+) -> AsyncIterator[AccountRecord]:
+    """Подходящие аккаунты страницами (см. iter_accounts). Случайная выборка сначала определяет database_id."""
+    selection = selection or AccountSelection()
+    if selection.mode == "random":
+        async with AsyncSessionmaker() as session:
+            database_ids = await get_account_ids(session, statuses, tags, search, selection)
+        async for account in iter_accounts_by_ids(database_ids):
+            yield account
+        return
+
+    async with AsyncSessionmaker() as session:
+        await _warn_accounts_without_proxy(session, statuses, tags, search)
+    query = accounts_query(statuses=statuses, tags=tags, search=search)
+    async for account in iter_accounts(query, limit=selection.limit, offset=selection.offset):
+        yield account
+
+
+async def get_quoted_pairs(
+        session: AsyncSession,
+        user_ids: Iterable[int],
+        quote_tweet_ids: Iterable[int],
+) -> set[tuple[int, int]]:
+    """
+    Одним запросом: какие из пользователей уже процитировали какие из твитов.
+
+    :return: Пары (user_id, quote_tweet_id).
+    """
+    query = select(Tweet.user_id, Tweet.quote_tweet_id).filter(
+        Tweet.user_id.in_(set(user_ids)),
+        Tweet.quote_tweet_id.in_(set(quote_tweet_ids)),
+    )
+    return set((await session.execute(query)).tuples())
+
+
+async def get_quote_tweets(
+        session: AsyncSession,
+        user_ids: Iterable[int],
+        quote_tweet_ids: Iterable[int],
+) -> dict[tuple[int, int], Tweet]:
+    """
+    Одним запросом: уже существующие цитаты твитов с загруженными авторами и процитированными твитами.
+
+    :return: Цитаты по парам (user_id, quote_tweet_id).
+    """
+    query = select(Tweet).options(
+        joinedload(Tweet.quoted_tweet).joinedload(Tweet.user),
+        joinedload(Tweet.user),
+    ).filter(
+        Tweet.user_id.in_(set(user_ids)),
+        Tweet.quote_tweet_id.in_(set(quote_tweet_ids)),
+    )
+    return {(tweet.user_id, tweet.quote_tweet_id): tweet for tweet in await session.scalars(query)}
+
+
+async def get_following_pairs(
+        session: AsyncSession,
+        user_ids: Iterable[int],
+        followed_to_user_ids: Iterable[int],
+) -> set[tuple[int, int]]:
+    """
+    Одним запросом: какие из пользователей уже подписаны на каких из пользователей.
+
+    :return: Пары (user_id, followed_to_user_id).
+    """
+    query = select(Following.user_id, Following.followed_to_user_id).filter(
+        Following.user_id.in_(set(user_ids)),
+        Following.followed_to_user_id.in_(set(followed_to_user_ids)),
+    )
+    return set((await session.execute(query)).tuples())
 
 
 async def get_tags(session: AsyncSession) -> list[str]:
-    return list(await session.scalars(select(Tag.tag).distinct()))
+    """Теги, которые есть хотя бы у одного аккаунта."""
+    query = select(Tag.name).filter(exists().where(AccountTag.tag_id == Tag.id))
+    return list(await session.scalars(query))
 
 
-async def choose_accounts(twitter_accounts_dict: dict[str: TwitterAccount]) -> list[TwitterAccount]:
+async def choose_accounts(twitter_accounts_dict: dict[str: AccountRecord]) -> list[AccountRecord]:
+    """При отмене ввода возвращает пустой список."""
     choices = await questionary.checkbox(
         "Choose accounts:",
         choices=twitter_accounts_dict,
         validate=lambda choices: True if choices else "Select at least one account!"
     ).ask_async()
-    return [twitter_accounts_dict[choice] for choice in choices]
+    return [twitter_accounts_dict[choice] for choice in choices or ()]
 
 
 async def choose_statuses(
@@ -74,27 +366,174 @@ async def choose_statuses(
     ).ask_async()
 
 
-async def choose_tags(tags: Sequence[str]) -> list[str]:
+async def choose_tags(tags: Sequence[str], counts: dict[str, int] = None) -> list[str]:
+    """
+    :param counts: Число аккаунтов по тегам, выводится рядом с тегом.
+    """
+    choices = [questionary.Choice(f"{tag} ({counts[tag]})" if counts else tag, value=tag) for tag in tags]
     return await questionary.checkbox(
         "Choose tags:",
-        choices=tags,
+        choices=choices,
         validate=lambda choices: True if choices else "Select at least one tag!"
     ).ask_async()
 
 
+def _validate_tag_expression(text: str) -> bool | str:
+    try:
+        parse_tag_expression(text)
+    except ValueError as exc:
+        return str(exc)
+    return True
+
+
+async def ask_tags(session: AsyncSession) -> str | list[str] | None:
+    """
+    Все аккаунты, любой из выбранных тегов или выражение над тегами.
+    С CONFIG.DATABASE.TAG_INDEX число аккаунтов по тегам считается в памяти по индексу тегов.
+
+    :return: Выражение, список тегов или None (без фильтра по тегам, в том числе при отмене ввода). См. accounts_query.
+    """
+    tag_index = await get_tag_index(session) if CONFIG.DATABASE.TAG_INDEX else None
+    tags = tag_index.tags if tag_index else sorted(await get_tags(session))
+    if not tags:
+        return None
+
+    mode = await questionary.select("Filter by tags?", choices=[
+        questionary.Choice("All accounts", value="all"),
+        questionary.Choice("Any of tags", value="any"),
+        questionary.Choice("Tag expression. Example: vip and (us or uk) and not banned", value="expression"),
+    ]).ask_async()
+
+    if mode in ("all", None):
+        return None
+
+    if mode == "any":
+        counts = {tag: tag_index.count(tag) for tag in tags} if tag_index else None
+        return await choose_tags(tags, counts)
+
+    print(f"Existing tags: {', '.join(tags)}")
+    expression = await questionary.text("Tag expression:", validate=_validate_tag_expression).ask_async()
+    if expression is None:
+        return None
+    parsed_expression = parse_tag_expression(expression)
+    if unknown_tags := expression_tags(parsed_expression) - set(tags):
+        logger.warning(f"Unknown tags: {', '.join(sorted(unknown_tags))}")
+    if tag_index:
+        print(f"Accounts matching the tag expression: {tag_index.evaluate(parsed_expression).bit_count()}")
+    return expression
+
+
+async def ask_selection(accounts_count: int) -> AccountSelection | Literal["search", "choose"] | None:
+    """
+    :return: Способ выбора или None при отмене ввода.
+    """
+    choices = [questionary.Choice(f"All matching ({accounts_count})", value="all")]
+    if accounts_count <= CHECKBOX_LIMIT:
+        choices.append(questionary.Choice("Choose manually", value="choose"))
+    choices += [
+        questionary.Choice("First N", value="first"),
+        questionary.Choice("Range (positions from-to)", value="range"),
+        questionary.Choice("Random N", value="random"),
+        questionary.Choice("Search (username, email, id)", value="search"),
+    ]
+    mode = await questionary.select("Which accounts?", choices=choices).ask_async()
+
+    if mode is None:
+        return None
+
+    if mode in ("all", "search", "choose"):
+        return AccountSelection() if mode == "all" else mode
+
+    if mode in ("first", "random"):
+        count = await ask_int("How many accounts:", min=1, max=accounts_count)
+        return AccountSelection(mode, count=count) if count is not None else None
+
+    positions = await questionary.text(
+        f"Positions from-to (1-{accounts_count}):",
+        validate=lambda text: _validate_range(text, accounts_count),
+    ).ask_async()
+    if positions is None:
+        return None
+    start, end = positions.split("-")
+    return AccountSelection("range", start=int(start), end=int(end))
+
+
+def _validate_range(text: str, max_position: int) -> bool | str:
+    try:
+        start, end = map(int, text.split("-"))
+    except ValueError:
+        return "Enter two numbers separated by '-'. Example: 1-100"
+    if not 1 <= start <= end <= max_position:
+        return f"Range must be within 1-{max_position}!"
+    return True
+
+
+async def _ask_filters(
+        session: AsyncSession,
+        statuses: Sequence[twitter.AccountStatus | str] | None,
+) -> tuple[Sequence[str] | None, str | list[str] | None, str | None, AccountSelection | Literal["choose"]] | None:
+    """
+    :return: Статусы, теги, поиск и способ выбора или None, если подходящих аккаунтов нет или ввод отменен.
+    """
+    tags = await ask_tags(session)
+
+    if statuses and len(statuses) > 1:
+        statuses = await choose_statuses(statuses)
+        if statuses is None:
+            return None
+
+    search = None
+    while True:
+        accounts_count = await count_accounts(session, accounts_query(statuses=statuses, tags=tags, search=search))
+        if accounts_count == 0:
+            logger.warning("No accounts match the filter")
+            if not search:
+                return None
+            search = None
+            continue
+
+        selection = await ask_selection(accounts_count)
+        if selection is None:
+            return None
+        if selection == "search":
+            search = await ask_nonempty_text("Search (* - any characters):")
+            continue
+        return statuses, tags, search, selection
+
+
 async def ask_and_get_accounts(
         session: AsyncSession,
         statuses: Sequence[twitter.AccountStatus | str] | None = ("UNKNOWN", "GOOD"),
-) -> list[TwitterAccount]:
-    tags = await get_tags(session)
+) -> list[AccountRecord]:
+    """
+    Фильтры (теги, статусы, поиск) и способ выбора задаются интерактивно, аккаунты отбираются в SQL.
+    Выбор галочками предлагается, только если подходящих аккаунтов не больше CHECKBOX_LIMIT.
+    """
+    if not (filters := await _ask_filters(session, statuses)):
+        return []
+    statuses, tags, search, selection = filters
 
-    if tags:
-        tags = await choose_tags(tags)
+    if selection == "choose":
+        twitter_accounts = await get_accounts(session, statuses=statuses, tags=tags, search=search)
+        # TODO           Выводить также: proxy, tags, status, id
+        accounts_dict = {str(account): account for account in twitter_accounts}
+        return await choose_accounts(accounts_dict)
 
-    if statuses and len(statuses) > 1:
-        statuses = await choose_statuses(statuses)
+    return await get_accounts(session, statuses=statuses, tags=tags, search=search, selection=selection)
+
+
+async def ask_and_get_account_ids(
+        session: AsyncSession,
+        statuses: Sequence[twitter.AccountStatus | str] | None = ("UNKNOWN", "GOOD"),
+) -> list[int]:
+    """Как ask_and_get_accounts, но загружает только database_id (см. get_account_ids)."""
+    if not (filters := await _ask_filters(session, statuses)):
+        return []
+    statuses, tags, search, selection = filters
+
+    if selection == "choose":
+        twitter_accounts = await get_accounts(session, statuses=statuses, tags=tags, search=search)
+        accounts_dict = {str(account): account for account in twitter_accounts}
+        return [account.database_id for account in await choose_accounts(accounts_dict)]
 
-    twitter_accounts = await get_accounts(session, statuses=statuses, tags=tags)
-    # TODO           Выводить также: proxy, tags, status, id
-    accounts_dict = {str(account): account for account in twitter_accounts}
-    return await choose_accounts(accounts_dict)
+    return await get_account_ids(session, statuses=statuses, tags=tags, search=search, selection=selection)
@@ -1,11 +1,16 @@
-from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine, AsyncSession
-from sqlalchemy import URL
+from contextlib import asynccontextmanager
+from typing import AsyncIterator
+
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine, AsyncSession, AsyncEngine
+from sqlalchemy import URL, text
 
 from common.asyncio import set_windows_selector_event_loop_policy
 from common.sqlalchemy.alembic import AsyncAlembicUtils
+from common.sqlalchemy.pool import MeteredAsyncAdaptedQueuePool, PoolMetrics
 
 from ..paths import BASE_DIR, INPUT_DIR
 from ..config import CONFIG
+from .write_buffer import WriteBehindBuffer
 
 set_windows_selector_event_loop_policy()
 
@@ -18,7 +23,17 @@ DATABASE_URL = URL.create(
     host=CONFIG.DATABASE.HOST,
     port=CONFIG.DATABASE.PORT,
 )
-async_engine = create_async_engine(DATABASE_URL, echo=False)
+async_engine = create_async_engine(
+    DATABASE_URL,
+    echo=False,
+    poolclass=MeteredAsyncAdaptedQueuePool,
+    pool_size=CONFIG.DATABASE.POOL_SIZE,
+    max_overflow=CONFIG.DATABASE.MAX_OVERFLOW,
+    pool_timeout=CONFIG.DATABASE.POOL_TIMEOUT,
+    pool_pre_ping=CONFIG.DATABASE.POOL_PRE_PING,
+    pool_recycle=CONFIG.DATABASE.POOL_RECYCLE,
+    query_cache_size=CONFIG.DATABASE.STATEMENT_CACHE_SIZE,
+)
 # async_engine = create_async_engine(f"sqlite+aiosqlite:///{INPUT_DIR}/.db/twitter.db", echo=False)
 AsyncSessionmaker = async_sessionmaker(
     bind=async_engine,
@@ -27,3 +42,31 @@ AsyncSessionmaker = async_sessionmaker(
     autoflush=False,
 )
 alembic_utils = AsyncAlembicUtils(async_engine, AsyncSessionmaker, ALEMBIC_INI)
+write_buffer = WriteBehindBuffer(
+    AsyncSessionmaker,
+    max_size=CONFIG.DATABASE.WRITE_BUFFER_SIZE,
+    flush_interval=CONFIG.DATABASE.WRITE_BUFFER_INTERVAL,
+    chunk_size=CONFIG.DATABASE.BULK_CHUNK_SIZE,
+)
+
+
+@asynccontextmanager
+async def engine_lifespan() -> AsyncIterator[AsyncEngine]:
+    """
+    Жизненный цикл пула соединений. Все модули должны выполняться внутри
+    одного event loop'а и одного lifespan'а: соединения пула привязаны к loop'у,
+    в котором были созданы.
+    """
+    async with async_engine.connect() as connection:
+        await connection.execute(text("SELECT 1"))
+    try:
+        yield async_engine
+    finally:
+        try:
+            await write_buffer.close()
+        finally:
+            await async_engine.dispose()
+
+
+def pool_metrics() -> PoolMetrics:
+    return async_engine.pool.metrics
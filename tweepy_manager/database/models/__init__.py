@@ -1,8 +1,9 @@
 from .user import TwitterUser, Following
 from .account import TwitterAccount
 from .tweet import Tweet
-from .tag import Tag
+from .tag import Tag, AccountTag
 from .proxy import Proxy
+from .job import Job, JobItem, JobItemState
 from .base import Base
 
 __all__ = [
@@ -11,6 +12,10 @@ __all__ = [
     "TwitterAccount",
     "Tweet",
     "Tag",
+    "AccountTag",
     "Proxy",
+    "Job",
+    "JobItem",
+    "JobItemState",
     "Base",
 ]
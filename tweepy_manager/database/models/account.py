@@ -3,7 +3,7 @@ from typing import TYPE_CHECKING
 from twitter.utils import hidden_value
 import twitter
 
-from sqlalchemy import String, ForeignKey
+from sqlalchemy import String, ForeignKey, Index
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from .base import Base, Int_PK
@@ -16,6 +16,11 @@ if TYPE_CHECKING:
 
 class TwitterAccount(Base):
     __tablename__ = "twitter_account"
+    __table_args__ = (
+        # Фильтр по статусу с сортировкой по database_id (см. crud.accounts_query)
+        Index("ix_twitter_account_status_database_id", "status", "database_id"),
+        Index("ix_twitter_account_proxy_database_id", "proxy_database_id"),
+    )
 
     # fmt: off
     database_id: Mapped[Int_PK]
@@ -38,7 +43,8 @@ class TwitterAccount(Base):
     proxy_database_id: Mapped[int      | None] = mapped_column(ForeignKey("proxy.database_id"))
     proxy:             Mapped["Proxy" or None] = relationship(back_populates="twitter_accounts")
 
-    tags: Mapped[list["Tag"]] = relationship(back_populates="twitter_account")
+    tags: Mapped[list["Tag"]] = relationship(
+        secondary="account_tag", back_populates="twitter_accounts", viewonly=True)
     # fmt: on
 
     def __repr__(self):
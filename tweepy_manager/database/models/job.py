@@ -0,0 +1,65 @@
+from typing import TYPE_CHECKING, Any
+from datetime import datetime
+import enum
+
+from sqlalchemy import String, JSON, PrimaryKeyConstraint, ForeignKey
+from sqlalchemy.orm import Mapped, mapped_column, relationship
+
+from .base import Base, Int_PK
+
+if TYPE_CHECKING:
+    from .account import TwitterAccount
+
+
+class JobItemState(enum.StrEnum):
+    DONE = "DONE"
+    FAILED = "FAILED"  # Неустранимая ошибка: при продолжении задачи не повторяется
+
+
+class Job(Base):
+    """
+    Запуск модуля над множеством аккаунтов.
+    Позволяет после сбоя продолжить работу с того места, где она была прервана.
+    """
+    __tablename__ = "job"
+
+    # fmt: off
+    id:          Mapped[Int_PK]
+    module:      Mapped[str]             = mapped_column(String(64))
+    parameters:  Mapped[dict[str, Any]]  = mapped_column(JSON, default=dict)
+    created_at:  Mapped[datetime]        = mapped_column(default=datetime.now)
+    finished_at: Mapped[datetime | None]
+
+    items: Mapped[list["JobItem"]] = relationship(back_populates="job", cascade="all, delete-orphan")
+    # fmt: on
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}(id={self.id}, module={self.module}, created_at={self.created_at})"
+
+    def __str__(self):
+        return repr(self)
+
+
+class JobItem(Base):
+    """
+    Состояние обработки аккаунта (target="") или пары (аккаунт, цель) в рамках задачи.
+    """
+    __tablename__ = "job_item"
+    __table_args__ = (PrimaryKeyConstraint("job_id", "twitter_account_id", "target"),)
+
+    # fmt: off
+    job_id:             Mapped[int]          = mapped_column(ForeignKey("job.id", ondelete="CASCADE"))
+    twitter_account_id: Mapped[int]          = mapped_column(ForeignKey("twitter_account.database_id", ondelete="CASCADE"))
+    target:             Mapped[str]          = mapped_column(String(64), default="")
+    state:              Mapped[JobItemState] = mapped_column(default=JobItemState.DONE)
+
+    job:             Mapped["Job"]            = relationship(back_populates="items")
+    twitter_account: Mapped["TwitterAccount"] = relationship()
+    # fmt: on
+
+    def __repr__(self):
+        return (f"{self.__class__.__name__}(job_id={self.job_id}, twitter_account_id={self.twitter_account_id},"
+                f" target={self.target}, state={self.state})")
+
+    def __str__(self):
+        return repr(self)
@@ -1,8 +1,8 @@
 from typing import TYPE_CHECKING
 
-from sqlalchemy import String, PrimaryKeyConstraint, ForeignKey
+from sqlalchemy import String, PrimaryKeyConstraint, ForeignKey, Index
 from sqlalchemy.orm import Mapped, mapped_column, relationship
-from .base import Base
+from .base import Base, Int_PK
 
 if TYPE_CHECKING:
     from .account import TwitterAccount
@@ -10,9 +10,37 @@ if TYPE_CHECKING:
 
 class Tag(Base):
     __tablename__ = "tag"
-    __table_args__ = (PrimaryKeyConstraint("twitter_account_id", "tag"),)
 
+    # fmt: off
+    id:   Mapped[Int_PK]
+    name: Mapped[str] = mapped_column(String(16), unique=True)
+
+    twitter_accounts: Mapped[list["TwitterAccount"]] = relationship(
+        secondary="account_tag", back_populates="tags", viewonly=True)
+    # fmt: on
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}(id={self.id}, name={self.name})"
+
+    def __str__(self):
+        return repr(self)
+
+
+class AccountTag(Base):
+    __tablename__ = "account_tag"
+    __table_args__ = (
+        PrimaryKeyConstraint("twitter_account_id", "tag_id"),
+        # Аккаунты по тегу: обратный порядок первичного ключа
+        Index("ix_account_tag_tag_id_twitter_account_id", "tag_id", "twitter_account_id"),
+    )
+
+    # fmt: off
     twitter_account_id: Mapped[int] = mapped_column(ForeignKey("twitter_account.database_id"))
-    tag: Mapped[str] = mapped_column(String(16))
+    tag_id:             Mapped[int] = mapped_column(ForeignKey("tag.id"))
+    # fmt: on
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}(twitter_account_id={self.twitter_account_id}, tag_id={self.tag_id})"
 
-    twitter_account: Mapped["TwitterAccount"] = relationship(back_populates="tags")
+    def __str__(self):
+        return repr(self)
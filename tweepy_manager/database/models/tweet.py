@@ -3,7 +3,7 @@ from datetime import datetime
 
 import twitter
 
-from sqlalchemy import ForeignKey, BigInteger
+from sqlalchemy import ForeignKey, BigInteger, Index, text
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from .base import Base
@@ -13,6 +13,11 @@ if TYPE_CHECKING:
 
 class Tweet(Base):
     __tablename__ = "tweet"
+    __table_args__ = (
+        # Есть ли у пользователей цитаты твитов (см. crud.get_quoted_pairs)
+        Index("ix_tweet_user_id_quote_tweet_id", "user_id", "quote_tweet_id",
+              postgresql_where=text("quote_tweet_id IS NOT NULL")),
+    )
 
     # fmt: off
     id:              Mapped[int] = mapped_column(BigInteger, primary_key=True)
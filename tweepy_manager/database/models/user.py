@@ -1,7 +1,7 @@
 from typing import TYPE_CHECKING
 from datetime import datetime
 
-from sqlalchemy import String, PrimaryKeyConstraint, ForeignKey, BigInteger
+from sqlalchemy import String, PrimaryKeyConstraint, ForeignKey, BigInteger, Index
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 from sqlalchemy.ext.asyncio import AsyncSession
 
@@ -58,7 +58,11 @@ class TwitterUser(Base):
 
 class Following(Base):
     __tablename__ = "following"
-    __table_args__ = (PrimaryKeyConstraint("user_id", "followed_to_user_id"),)
+    __table_args__ = (
+        PrimaryKeyConstraint("user_id", "followed_to_user_id"),
+        # Подписчики пользователя: обратный порядок первичного ключа
+        Index("ix_following_followed_to_user_id_user_id", "followed_to_user_id", "user_id"),
+    )
 
     # fmt: off
     user_id:        Mapped[int] = mapped_column(ForeignKey("twitter_user.id"))
@@ -0,0 +1,98 @@
+from dataclasses import dataclass
+
+from better_proxy import Proxy as BetterProxy
+from sqlalchemy import Select
+from sqlalchemy.ext.asyncio import AsyncSession
+from twitter.utils import hidden_value
+import twitter
+
+from .models import TwitterAccount, TwitterUser, Proxy
+
+
+@dataclass(slots=True, repr=False)
+class AccountRecord:
+    """
+    Легкая модель аккаунта для выбора и обработки: только поля, нужные TwitterClient и меню.
+    Строится из выборки отдельных столбцов, без ORM-объектов аккаунта, прокси и пользователя.
+    Изменения сохраняются через буфер отложенной записи (см. write_buffer.py), а не через этот объект.
+    """
+    database_id: int
+    auth_token: str | None
+    ct0: str | None
+    username: str | None
+    password: str | None
+    email: str | None
+    totp_secret: str | None
+    backup_code: str | None
+    status: twitter.AccountStatus
+    twitter_id: int | None
+    proxy_database_id: int | None
+    # Один объект на прокси, общий для всех его аккаунтов
+    proxy: BetterProxy | None
+    followers_count: int | None
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}(database_id={self.database_id}, auth_token={self.hidden_auth_token}, username={self.username})"
+
+    def __str__(self):
+        return repr(self)
+
+    @property
+    def hidden_auth_token(self) -> str | None:
+        return hidden_value(self.auth_token) if self.auth_token else None
+
+
+_ACCOUNT_COLUMNS = (
+    TwitterAccount.database_id,
+    TwitterAccount.auth_token,
+    TwitterAccount.ct0,
+    TwitterAccount.username,
+    TwitterAccount.password,
+    TwitterAccount.email,
+    TwitterAccount.totp_secret,
+    TwitterAccount.backup_code,
+    TwitterAccount.status,
+    TwitterAccount.twitter_id,
+    TwitterAccount.proxy_database_id,
+)
+_PROXY_COLUMNS = (Proxy.host, Proxy.port, Proxy.login, Proxy.password, Proxy.protocol)
+
+
+def account_records_query(query: Select) -> Select:
+    """
+    Запрос аккаунтов (см. crud.accounts_query) с теми же фильтрами и сортировкой,
+    но возвращающий только столбцы AccountRecord.
+    """
+    return query.with_only_columns(
+        *_ACCOUNT_COLUMNS, *_PROXY_COLUMNS, TwitterUser.followers_count,
+        maintain_column_froms=False,
+    ).select_from(TwitterAccount).outerjoin(
+        Proxy, TwitterAccount.proxy_database_id == Proxy.database_id,
+    ).outerjoin(
+        TwitterUser, TwitterAccount.twitter_id == TwitterUser.id,
+    )
+
+
+async def load_account_records(
+        session: AsyncSession,
+        query: Select,
+        proxies: dict[int, BetterProxy] = None,
+) -> list[AccountRecord]:
+    """
+    :param query: Запрос аккаунтов (см. crud.accounts_query).
+    :param proxies: Уже созданные прокси по database_id. Пополняется, чтобы страницы одной выборки делили объекты.
+    """
+    proxies = {} if proxies is None else proxies
+    account_columns_count = len(_ACCOUNT_COLUMNS)
+    records = []
+    for row in (await session.execute(account_records_query(query))).tuples():
+        proxy_database_id = row[account_columns_count - 1]
+        proxy = None
+        if proxy_database_id is not None:
+            proxy = proxies.get(proxy_database_id)
+            if proxy is None:
+                host, port, login, password, protocol = row[account_columns_count:account_columns_count + 5]
+                proxy = proxies[proxy_database_id] = BetterProxy(
+                    host=host, port=port, login=login, password=password, protocol=protocol)
+        records.append(AccountRecord(*row[:account_columns_count], proxy, row[-1]))
+    return records
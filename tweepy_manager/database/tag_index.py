@@ -0,0 +1,75 @@
+from functools import reduce
+from operator import and_, or_
+from typing import Iterable
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from common.tag_expression import TagExpression, evaluate
+
+from .models import TwitterAccount, Tag, AccountTag
+
+
+def _bitmap(database_ids: Iterable[int]) -> int:
+    # Биты выставляются в bytearray: сборка int через |= 1 << id на каждом шаге квадратична
+    data = bytearray()
+    for database_id in database_ids:
+        byte_index = database_id >> 3
+        if byte_index >= len(data):
+            data.extend(bytes(byte_index - len(data) + 1))
+        data[byte_index] |= 1 << (database_id & 7)
+    return int.from_bytes(data, "little")
+
+
+class TagIndex:
+    """
+    Индекс тег → множество database_id аккаунтов в виде битовой маски (int, бит N — аккаунт с database_id N).
+    Загружается из бд один раз, после чего число аккаунтов по тегам и выражениям над тегами считается в памяти
+    побитовыми операциями. Сами аккаунты отбираются в SQL (см. crud.tag_filter).
+    """
+
+    def __init__(self, bitmaps: dict[str, int], all_accounts: int):
+        self.bitmaps = bitmaps
+        self.all_accounts = all_accounts
+
+    @classmethod
+    async def load(cls, session: AsyncSession) -> "TagIndex":
+        tag_ids: dict[str, list[int]] = {}
+        query = select(Tag.name, AccountTag.twitter_account_id).join(AccountTag, AccountTag.tag_id == Tag.id)
+        for tag, database_id in (await session.execute(query)).tuples():
+            tag_ids.setdefault(tag, []).append(database_id)
+        all_accounts = _bitmap(await session.scalars(select(TwitterAccount.database_id)))
+        return cls({tag: _bitmap(database_ids) for tag, database_ids in tag_ids.items()}, all_accounts)
+
+    @property
+    def tags(self) -> list[str]:
+        return sorted(self.bitmaps)
+
+    def count(self, tag: str) -> int:
+        return self.bitmaps.get(tag, 0).bit_count()
+
+    def evaluate(self, expression: TagExpression) -> int:
+        return evaluate(
+            expression,
+            tag=lambda tag: self.bitmaps.get(tag, 0),
+            not_=lambda bitmap: self.all_accounts & ~bitmap,
+            and_=lambda bitmaps: reduce(and_, bitmaps),
+            or_=lambda bitmaps: reduce(or_, bitmaps),
+        )
+
+
+_tag_index: TagIndex | None = None
+
+
+async def get_tag_index(session: AsyncSession) -> TagIndex:
+    """Индекс загружается при первом обращении и используется до invalidate_tag_index."""
+    global _tag_index
+    if _tag_index is None:
+        _tag_index = await TagIndex.load(session)
+    return _tag_index
+
+
+def invalidate_tag_index():
+    """Вызывается после изменения тегов или аккаунтов."""
+    global _tag_index
+    _tag_index = None
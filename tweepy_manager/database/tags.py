@@ -0,0 +1,141 @@
+"""
+Массовые операции с тегами. Каждая операция — один-два SQL запроса на любое число аккаунтов:
+аккаунты передаются списком database_id (массив в одном параметре) или запросом (см. crud.accounts_query),
+который выполняется внутри того же запроса.
+"""
+from typing import Iterable, Sequence
+
+from sqlalchemy import select, update, delete, func, literal, true, union_all, Select, Integer, String, CTE
+from sqlalchemy.dialects.postgresql import insert, ARRAY
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .models import TwitterAccount, Tag, AccountTag
+from .tag_index import invalidate_tag_index
+
+
+def _account_ids(accounts: Select | Iterable[int]) -> Select:
+    if isinstance(accounts, Select):
+        return accounts.with_only_columns(TwitterAccount.database_id, maintain_column_froms=True)
+    return select(func.unnest(literal(sorted(set(accounts)), ARRAY(Integer))))
+
+
+def _tag_ids(names: Sequence[str]) -> tuple[CTE, CTE]:
+    """
+    id тегов по именам. Недостающие теги создаются в том же запросе:
+    INSERT ... ON CONFLICT DO NOTHING RETURNING возвращает только новые теги, существующие выбираются отдельно.
+
+    :return: CTE с созданием тегов (добавляется к внешнему запросу) и CTE (id, name).
+    """
+    names = sorted(set(names))
+    inserted = insert(Tag).values([{"name": name} for name in names]).on_conflict_do_nothing(
+    ).returning(Tag.id, Tag.name).cte("inserted_tag")
+    tag_ids = union_all(
+        select(inserted.c.id, inserted.c.name),
+        select(Tag.id, Tag.name).filter(Tag.name.in_(names)),
+    ).cte("tag_ids")
+    return inserted, tag_ids
+
+
+async def add_tags(session: AsyncSession, accounts: Select | Iterable[int], tags: Sequence[str]) -> int:
+    """
+    Добавляет теги аккаунтам одним запросом INSERT ... SELECT ... ON CONFLICT DO NOTHING.
+    Для INSERT ... SELECT число строк возвращается только с preserve_rowcount.
+
+    :return: Сколько тегов добавлено (без уже существовавших).
+    """
+    inserted, tag_ids = _tag_ids(tags)
+    account_ids = _account_ids(accounts).subquery()
+    query = insert(AccountTag).from_select(
+        ["twitter_account_id", "tag_id"],
+        select(account_ids.c[0], tag_ids.c.id).join(tag_ids, true()),
+    ).on_conflict_do_nothing().add_cte(inserted).execution_options(preserve_rowcount=True)
+    result = await session.execute(query)
+    invalidate_tag_index()
+    return result.rowcount
+
+
+async def add_account_tags(session: AsyncSession, account_tags: Iterable[tuple[int, str]]) -> int:
+    """
+    Добавляет пары (database_id, тег) одним запросом: пары передаются двумя массивами.
+
+    :return: Сколько тегов добавлено (без уже существовавших).
+    """
+    database_ids, names = zip(*account_tags)
+    inserted, tag_ids = _tag_ids(names)
+    pairs = func.unnest(
+        literal(list(database_ids), ARRAY(Integer)),
+        literal(list(names), ARRAY(String)),
+    ).table_valued("database_id", "name").render_derived("account_tag_pairs")
+    query = insert(AccountTag).from_select(
+        ["twitter_account_id", "tag_id"],
+        select(pairs.c.database_id, tag_ids.c.id).join(tag_ids, tag_ids.c.name == pairs.c.name),
+    ).on_conflict_do_nothing().add_cte(inserted).execution_options(preserve_rowcount=True)
+    result = await session.execute(query)
+    invalidate_tag_index()
+    return result.rowcount
+
+
+async def remove_tags(session: AsyncSession, accounts: Select | Iterable[int], tags: Sequence[str]) -> int:
+    """
+    Удаляет теги у аккаунтов одним запросом DELETE ... USING tag.
+
+    :return: Сколько тегов удалено.
+    """
+    query = delete(AccountTag).filter(
+        AccountTag.tag_id == Tag.id,
+        Tag.name.in_(tags),
+        AccountTag.twitter_account_id.in_(_account_ids(accounts)),
+    )
+    result = await session.execute(query)
+    invalidate_tag_index()
+    return result.rowcount
+
+
+async def replace_tags(session: AsyncSession, accounts: Select | Iterable[int], tags: Sequence[str]) -> int:
+    """
+    Заменяет все теги аккаунтов на tags: удаляет остальные теги (DELETE ... USING), затем добавляет недостающие.
+    Выполнять в одной транзакции.
+
+    :return: Сколько тегов добавлено.
+    """
+    query = delete(AccountTag).filter(
+        AccountTag.tag_id == Tag.id,
+        Tag.name.not_in(tags),
+        AccountTag.twitter_account_id.in_(_account_ids(accounts)),
+    )
+    await session.execute(query)
+    return await add_tags(session, accounts, tags)
+
+
+async def rename_tag(session: AsyncSession, old_name: str, new_name: str) -> int:
+    """
+    Переименовывает тег у всех аккаунтов. Если тег new_name уже есть, теги объединяются.
+    Переименование тега в самого себя ничего не меняет.
+
+    :return: Сколько аккаунтов получили тег new_name.
+    """
+    if old_name == new_name:
+        return 0
+
+    old_id = await session.scalar(select(Tag.id).filter_by(name=old_name))
+    if old_id is None:
+        return 0
+
+    new_id = await session.scalar(select(Tag.id).filter_by(name=new_name))
+    if new_id == old_id:
+        return 0
+    if new_id is None:
+        await session.execute(update(Tag).filter_by(id=old_id).values(name=new_name))
+        accounts_count = await session.scalar(select(func.count()).filter(AccountTag.tag_id == old_id))
+        invalidate_tag_index()
+        return accounts_count
+
+    query = insert(AccountTag).from_select(
+        ["twitter_account_id", "tag_id"],
+        select(AccountTag.twitter_account_id, literal(new_id)).filter(AccountTag.tag_id == old_id),
+    ).on_conflict_do_nothing().execution_options(preserve_rowcount=True)
+    result = await session.execute(query)
+    await session.execute(delete(AccountTag).filter_by(tag_id=old_id))
+    await session.execute(delete(Tag).filter_by(id=old_id))
+    invalidate_tag_index()
+    return result.rowcount
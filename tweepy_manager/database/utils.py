@@ -19,3 +19,24 @@ async def update_database_or_quite():
             quit()
 
         await alembic_utils.upgrade()
+
+
+async def check_database_revision(upgrade: bool = False) -> bool:
+    """
+    Неинтерактивная проверка ревизии базы данных.
+
+    :param upgrade: Обновить базу данных, если она устарела.
+    :return: Актуальна ли база данных.
+    """
+    current_revision = await alembic_utils.get_current_revision()
+    latest_revision = alembic_utils.get_latest_revision()
+    if current_revision == latest_revision:
+        return True
+
+    if not upgrade:
+        print(f"Current revision is {current_revision}, but the latest revision is {latest_revision}."
+              f" Run with --upgrade or `alembic upgrade head`.")
+        return False
+
+    await alembic_utils.upgrade()
+    return True
@@ -0,0 +1,173 @@
+import asyncio
+from typing import Any
+
+from loguru import logger
+from sqlalchemy import update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from common.sqlalchemy.crud import bulk_upsert, bulk_get_or_create, DEFAULT_CHUNK_SIZE
+
+from .models import TwitterAccount, TwitterUser, Following
+
+
+class WriteBehindBuffer:
+    """
+    Накапливает изменения аккаунтов и пользователей от многих TwitterClient
+    и сохраняет их пачками: пользователи — через INSERT ... ON CONFLICT DO UPDATE,
+    аккаунты — через UPDATE по первичному ключу, подписки — через INSERT ... ON CONFLICT DO NOTHING.
+
+    Изменения одной записи схлопываются, сохраняется последнее состояние.
+    Буфер сбрасывается при накоплении max_size записей, раз в flush_interval секунд
+    и при закрытии (close).
+    """
+
+    def __init__(
+            self,
+            sessionmaker: async_sessionmaker,
+            *,
+            max_size: int,
+            flush_interval: float,
+            chunk_size: int = DEFAULT_CHUNK_SIZE,
+    ):
+        self.sessionmaker = sessionmaker
+        self.max_size = max_size
+        self.flush_interval = flush_interval
+        self.chunk_size = chunk_size
+        self._users: dict[int, dict[str, Any]] = {}
+        self._accounts: dict[int, dict[str, Any]] = {}
+        self._followings: set[tuple[int, int]] = set()
+        self._lock = asyncio.Lock()
+        self._flush_task: asyncio.Task | None = None
+
+    def __len__(self):
+        return len(self._users) + len(self._accounts) + len(self._followings)
+
+    async def add_user(self, user_data: dict[str, Any]):
+        self._users.setdefault(user_data["id"], {}).update(user_data)
+        await self._after_add()
+
+    async def add_account(self, database_id: int, account_data: dict[str, Any]):
+        self._accounts.setdefault(database_id, {"database_id": database_id}).update(account_data)
+        await self._after_add()
+
+    async def add_following(self, user_id: int, followed_to_user_id: int):
+        self._followings.add((user_id, followed_to_user_id))
+        await self._after_add()
+
+    def discard_following(self, user_id: int, followed_to_user_id: int):
+        self._followings.discard((user_id, followed_to_user_id))
+
+    async def _after_add(self):
+        if len(self) >= self.max_size:
+            await self.flush()
+        elif self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.create_task(self._flush_later())
+
+    async def _flush_later(self):
+        await asyncio.sleep(self.flush_interval)
+        try:
+            # shield: отмена таймера в close() не должна прерывать начатое сохранение
+            await asyncio.shield(self.flush())
+        except Exception:
+            logger.exception("Failed to flush write buffer. Changes are kept until the next flush")
+
+    def _restore(
+            self,
+            users: dict[int, dict[str, Any]],
+            accounts: dict[int, dict[str, Any]],
+            followings: set[tuple[int, int]],
+    ):
+        """Возвращает несохраненную пачку в буфер. Изменения, добавленные после нее, новее и имеют приоритет."""
+        for buffer, batch in ((self._users, users), (self._accounts, accounts)):
+            for key, data in batch.items():
+                buffer[key] = data | buffer.get(key, {})
+        self._followings |= followings
+
+    async def flush(self):
+        """
+        Нарушение ограничений бд — пачка сохраняется по одной записи, записи с ошибками пропускаются.
+        Любая другая ошибка (соединение, таймаут) — пачка возвращается в буфер, исключение пробрасывается.
+        """
+        async with self._lock:
+            users_batch, self._users = self._users, {}
+            accounts_batch, self._accounts = self._accounts, {}
+            followings_batch, self._followings = self._followings, set()
+            users = list(users_batch.values())
+            accounts = list(accounts_batch.values())
+            followings = [
+                {"user_id": user_id, "followed_to_user_id": followed_to_user_id}
+                for user_id, followed_to_user_id in followings_batch
+            ]
+            if not users and not accounts and not followings:
+                return
+
+            # Пользователи сохраняются раньше аккаунтов и подписок: на twitter_user.id ссылаются
+            # twitter_account.twitter_id и обе стороны following
+            try:
+                async with self.sessionmaker() as session:
+                    await self._save(session, users, accounts, followings)
+                    await session.commit()
+            except IntegrityError:
+                logger.warning(f"Batch of {len(users)} users, {len(accounts)} accounts"
+                               f" and {len(followings)} followings violates constraints. Saving one by one")
+                await self._save_one_by_one(users, accounts, followings)
+            except BaseException:
+                self._restore(users_batch, accounts_batch, followings_batch)
+                raise
+
+            logger.debug(f"Write buffer flushed: {len(users)} users, {len(accounts)} accounts,"
+                         f" {len(followings)} followings")
+
+    async def _save(
+            self,
+            session,
+            users: list[dict[str, Any]],
+            accounts: list[dict[str, Any]],
+            followings: list[dict[str, Any]] = (),
+    ):
+        await bulk_upsert(session, TwitterUser, users, conflict_cols=["id"], chunk_size=self.chunk_size)
+        if accounts:
+            # ORM bulk UPDATE по первичному ключу (executemany)
+            await session.execute(update(TwitterAccount), accounts)
+        await bulk_get_or_create(
+            session, Following, followings, conflict_cols=["user_id", "followed_to_user_id"],
+            chunk_size=self.chunk_size,
+        )
+
+    async def _save_one_by_one(
+            self,
+            users: list[dict[str, Any]],
+            accounts: list[dict[str, Any]],
+            followings: list[dict[str, Any]],
+    ):
+        for user_data in users:
+            try:
+                async with self.sessionmaker() as session:
+                    await self._save(session, [user_data], [])
+                    await session.commit()
+            except IntegrityError as exc:
+                logger.error(f"Failed to save TwitterUser(id={user_data['id']}): {exc.orig}")
+
+        for account_data in accounts:
+            try:
+                async with self.sessionmaker() as session:
+                    await self._save(session, [], [account_data])
+                    await session.commit()
+            except IntegrityError as exc:
+                logger.error(f"Failed to save TwitterAccount(database_id={account_data['database_id']}): {exc.orig}")
+
+        for following_data in followings:
+            try:
+                async with self.sessionmaker() as session:
+                    await self._save(session, [], [], [following_data])
+                    await session.commit()
+            except IntegrityError as exc:
+                logger.error(f"Failed to save Following(user_id={following_data['user_id']},"
+                             f" followed_to_user_id={following_data['followed_to_user_id']}): {exc.orig}")
+
+    async def close(self):
+        if self._flush_task and not self._flush_task.done():
+            self._flush_task.cancel()
+        self._flush_task = None
+        await self.flush()
@@ -1,4 +1,5 @@
 from common.excel import Excel, Column
+from common.delimited import DelimitedText
 
 # fmt: off
 COLUMNS = [
@@ -18,3 +19,4 @@ COLUMNS = [
 # fmt: on
 
 excel = Excel(COLUMNS)
+delimited_text = DelimitedText(COLUMNS)
@@ -0,0 +1,146 @@
+from datetime import datetime
+from typing import Any
+
+import questionary
+from loguru import logger
+from sqlalchemy import select, update, func, literal, Integer, String
+from sqlalchemy.dialects.postgresql import insert, ARRAY
+
+from .database.models import Job, JobItem, JobItemState, TwitterAccount
+from .database import AsyncSessionmaker
+from .config import CONFIG
+
+
+class JobTracker:
+    """
+    Контрольные точки задачи: какие аккаунты и пары (аккаунт, цель) уже обработаны
+    успешно (DONE) или с неустранимой ошибкой (FAILED).
+    После сбоя задачу можно продолжить, пропустив выполненную работу.
+
+    Отметки копятся в памяти и сохраняются пачками по buffer_size одним INSERT ... ON CONFLICT DO NOTHING,
+    а также при вызове flush (см. process_utils.process_twitter_accounts).
+    """
+
+    def __init__(
+            self,
+            job: Job,
+            states: dict[tuple[int, str], JobItemState] = None,
+            *,
+            buffer_size: int = CONFIG.DATABASE.WRITE_BUFFER_SIZE,
+    ):
+        self.job = job
+        self.buffer_size = buffer_size
+        self._states = states or {}
+        self._pending: dict[tuple[int, str], JobItemState] = {}
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}(job={self.job!r}, items={len(self._states)})"
+
+    @property
+    def parameters(self) -> dict[str, Any]:
+        return self.job.parameters
+
+    @classmethod
+    async def create(cls, module: str, parameters: dict[str, Any]) -> "JobTracker":
+        async with AsyncSessionmaker() as session:
+            job = Job(module=module, parameters=parameters)
+            session.add(job)
+            await session.commit()
+        return cls(job)
+
+    @classmethod
+    async def load(cls, job: Job) -> "JobTracker":
+        async with AsyncSessionmaker() as session:
+            query = select(JobItem.twitter_account_id, JobItem.target, JobItem.state).filter_by(job_id=job.id)
+            states = {(twitter_account_id, target): state
+                      for twitter_account_id, target, state in (await session.execute(query)).tuples()}
+        return cls(job, states)
+
+    def is_done(self, twitter_account_id: int, target: str | int = "") -> bool:
+        """Обработан ли аккаунт или пара (аккаунт, цель): успешно или с неустранимой ошибкой."""
+        return (twitter_account_id, str(target)) in self._states
+
+    async def mark_done(self, twitter_account_id: int, target: str | int = ""):
+        await self._mark(twitter_account_id, target, JobItemState.DONE)
+
+    async def mark_failed(self, twitter_account_id: int, target: str | int = ""):
+        """Повторять не нужно: например, аккаунт заблокирован или удален."""
+        await self._mark(twitter_account_id, target, JobItemState.FAILED)
+
+    async def _mark(self, twitter_account_id: int, target: str | int, state: JobItemState):
+        key = (twitter_account_id, str(target))
+        if key in self._states:
+            return
+        self._states[key] = state
+        self._pending[key] = state
+        if len(self._pending) >= self.buffer_size:
+            await self.flush()
+
+    async def flush(self):
+        """
+        Сохраняет накопленные отметки одним запросом: отметки передаются массивами.
+        Отметки удаленных тем временем аккаунтов отбрасываются соединением с twitter_account.
+        При ошибке отметки возвращаются в буфер.
+        """
+        if not self._pending:
+            return
+
+        pending, self._pending = self._pending, {}
+        items = func.unnest(
+            literal([twitter_account_id for twitter_account_id, _ in pending], ARRAY(Integer)),
+            literal([target for _, target in pending], ARRAY(String)),
+            literal([str(state) for state in pending.values()], ARRAY(String)),
+        ).table_valued("twitter_account_id", "target", "state").render_derived("job_items")
+        query = insert(JobItem).from_select(
+            ["job_id", "twitter_account_id", "target", "state"],
+            select(
+                literal(self.job.id),
+                items.c.twitter_account_id,
+                items.c.target,
+                items.c.state.cast(JobItem.state.type),
+            ).join(TwitterAccount, TwitterAccount.database_id == items.c.twitter_account_id),
+        ).on_conflict_do_nothing()
+        try:
+            async with AsyncSessionmaker() as session:
+                await session.execute(query)
+                await session.commit()
+        except Exception:
+            self._pending = pending | self._pending
+            raise
+
+    async def finish(self):
+        self.job.finished_at = datetime.now()
+        async with AsyncSessionmaker() as session:
+            query = update(Job).filter_by(id=self.job.id).values(finished_at=self.job.finished_at)
+            await session.execute(query)
+            await session.commit()
+
+
+async def get_unfinished_job(module: str) -> JobTracker | None:
+    """Последняя незавершенная задача модуля."""
+    async with AsyncSessionmaker() as session:
+        query = select(Job).filter_by(module=module, finished_at=None).order_by(Job.id.desc())
+        job = await session.scalar(query)
+    return await JobTracker.load(job) if job else None
+
+
+async def ask_and_resume_job(module: str) -> JobTracker | None:
+    """
+    Предлагает продолжить последнюю незавершенную задачу модуля.
+    Если пользователь отказался, задача помечается завершенной.
+    """
+    async with AsyncSessionmaker() as session:
+        query = select(Job).filter_by(module=module, finished_at=None).order_by(Job.id.desc())
+        job = await session.scalar(query)
+        if not job:
+            return None
+        done_count = await session.scalar(select(func.count()).select_from(JobItem).filter_by(job_id=job.id))
+
+    print(f"Unfinished job: {job}. Done items: {done_count}")
+    if await questionary.confirm("Resume it?").ask_async():
+        tracker = await JobTracker.load(job)
+        logger.info(f"Resuming {tracker}")
+        return tracker
+
+    await JobTracker(job).finish()
+    return None
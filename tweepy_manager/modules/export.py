@@ -1,58 +1,122 @@
 from datetime import datetime
+from pathlib import Path
 
-from sqlalchemy import select
-from sqlalchemy.orm import joinedload
+from better_proxy import Proxy as BetterProxy
+from sqlalchemy import select, func, Select
+from sqlalchemy.dialects.postgresql import aggregate_order_by
+from sqlalchemy.engine import Row
+import questionary
 
-from ..database.models import TwitterAccount, Tag
+from common.delimited import DELIMITERS, FIELDS_SEPARATOR
+
+from ..database.models import TwitterAccount, Proxy, Tag, AccountTag
 from ..database import AsyncSessionmaker
+from ..config import CONFIG
 from ..paths import OUTPUT_DIR
-from ..excel import excel
+from ..excel import excel, delimited_text
 
+from .import_ import ask_fields, DEFAULT_FIELDS
 
-async def get_tags(session, account_id: int) -> str:
-    tags = await session.scalars(select(Tag).where(Tag.twitter_account_id == account_id))
-    return ", ".join([tag.tag for tag in tags])
+EXPORT_FORMATS = (".xlsx", *DELIMITERS)
 
 
-async def export_to_xlsx():
-    """
-    Экспортирует все аккаунты из базы данных в Excel-таблицу.
-    """
-    async with AsyncSessionmaker() as session:
-        accounts = await session.scalars(select(TwitterAccount).options(
-            joinedload(TwitterAccount.proxy),
-            joinedload(TwitterAccount.user),
+def accounts_export_query() -> Select:
+    """Аккаунты с прокси и тегами одним запросом: теги склеиваются в строку по алфавиту на стороне бд."""
+    tags = select(
+        AccountTag.twitter_account_id,
+        func.string_agg(aggregate_order_by(Tag.name, Tag.name), ", ").label("tags"),
+    ).join(Tag, AccountTag.tag_id == Tag.id).group_by(AccountTag.twitter_account_id).subquery()
+
+    return select(
+        TwitterAccount.twitter_id,
+        TwitterAccount.username,
+        TwitterAccount.password,
+        TwitterAccount.email,
+        TwitterAccount.email_password,
+        TwitterAccount.totp_secret,
+        TwitterAccount.backup_code,
+        TwitterAccount.auth_token,
+        TwitterAccount.status,
+        TwitterAccount.country_code,
+        Proxy.host.label("proxy_host"),
+        Proxy.port.label("proxy_port"),
+        Proxy.login.label("proxy_login"),
+        Proxy.password.label("proxy_password"),
+        Proxy.protocol.label("proxy_protocol"),
+        tags.c.tags,
+    ).outerjoin(
+        Proxy, TwitterAccount.proxy_database_id == Proxy.database_id,
+    ).outerjoin(
+        tags, TwitterAccount.database_id == tags.c.twitter_account_id,
+    ).order_by(TwitterAccount.status, TwitterAccount.database_id)
+
+
+def _row_data(row: Row) -> dict:
+    proxy = ""
+    if row.proxy_host:
+        proxy = str(BetterProxy(
+            host=row.proxy_host,
+            port=row.proxy_port,
+            login=row.proxy_login,
+            password=row.proxy_password,
+            protocol=row.proxy_protocol,
         ))
-        accounts = list(accounts)
-
-    if not accounts:
-        print(f"No accounts to export")
-
-    accounts = sorted(accounts, key=lambda account: account.status)
-
-    data = []
-    for account in accounts:
-        row = {
-            "tags": await get_tags(session, account.database_id),
-            "proxy": str(account.proxy.better_proxy()) if account.proxy else "",
-            "country_code": account.country_code,
-            "twitter": {
-                "id": account.twitter_id,
-                "username": account.username,
-                "password": account.password,
-                "email": account.email,
-                "email_password": account.email_password,
-                "totp_secret": account.totp_secret,
-                "backup_code": account.backup_code,
-                "auth_token": account.auth_token,
-                "status": account.status,
-            },
-        }
-        data.append(row)
+    return {
+        "tags": row.tags or "",
+        "proxy": proxy,
+        "country_code": row.country_code,
+        "twitter": {
+            "twitter_id": row.twitter_id,
+            "username": row.username,
+            "password": row.password,
+            "email": row.email,
+            "email_password": row.email_password,
+            "totp_secret": row.totp_secret,
+            "backup_code": row.backup_code,
+            "auth_token": row.auth_token,
+            "status": row.status,
+        },
+    }
+
+
+async def export_accounts(export_format: str = ".xlsx", fields: str = None) -> Path | None:
+    """
+    Экспортирует все аккаунты из базы данных в Excel-таблицу или текстовый файл.
+    Строки читаются из бд и пишутся в файл потоком, память не зависит от количества аккаунтов.
 
+    :param export_format: Расширение файла: .xlsx, .csv, .tsv или .txt
+    :param fields: Какие поля и в каком порядке выгрузить в текстовый файл.
+        По умолчанию все, для .txt — DEFAULT_FIELDS.
+    """
     export_dir = OUTPUT_DIR / "accounts"
     export_dir.mkdir(exist_ok=True)
-    filename = f"twitter_accounts.{datetime.now().strftime('date_%d_%m_%Y.time_%H_%M_%S')}.xlsx"
+    filename = f"twitter_accounts.{datetime.now().strftime('date_%d_%m_%Y.time_%H_%M_%S')}{export_format}"
     filepath = export_dir / filename
-    excel.export(filepath, data)
-    print(f"Success! {filepath}")
+
+    if export_format in DELIMITERS:
+        if DELIMITERS[export_format] == FIELDS_SEPARATOR:
+            fields = fields or DEFAULT_FIELDS
+        stream_writer = delimited_text.stream_writer(filepath, fields=fields)
+    else:
+        stream_writer = excel.stream_writer(filepath)
+
+    async with AsyncSessionmaker() as session:
+        if not await session.scalar(select(func.count()).select_from(TwitterAccount)):
+            print(f"No accounts to export")
+            return None
+
+        query = accounts_export_query().execution_options(yield_per=CONFIG.DATABASE.BULK_CHUNK_SIZE)
+        with stream_writer as writer:
+            async for row in await session.stream(query):
+                writer.write(_row_data(row))
+
+    print(f"Success! Exported {writer.count} accounts: {filepath}")
+    return filepath
+
+
+async def select_and_export():
+    export_format = await questionary.select("Format:", choices=EXPORT_FORMATS).ask_async()
+    fields = None
+    if DELIMITERS.get(export_format) == FIELDS_SEPARATOR:
+        fields = await ask_fields()
+    await export_accounts(export_format, fields)
@@ -1,15 +1,82 @@
 import random
+from typing import Sequence
 
+from loguru import logger
 import questionary
+import twitter
 
-from ..database.models import TwitterAccount
-from ..database.crud import ask_and_get_accounts
+from common.sqlalchemy.crud import bulk_upsert
+
+from ..database.models import TwitterUser
+from ..database.records import AccountRecord
+from ..database.crud import ask_and_get_accounts, get_accounts_by_ids, get_following_pairs
 from ..database import AsyncSessionmaker
-from ..twitter import TwitterClient
+from ..twitter import TwitterClient, dump_user
+from ..config import CONFIG
+from ..jobs import JobTracker, ask_and_resume_job
 from .process_utils import process_twitter_accounts, ask_and_request_users
 
 
+async def follow_users(
+        twitter_accounts: Sequence[AccountRecord],
+        users: Sequence[twitter.User],
+        job: JobTracker = None,
+):
+    """
+    Подписывает каждый аккаунт на всех пользователей.
+    Пользователи сохраняются и уже существующие подписки загружаются одним разом до начала работы,
+    новые подписки сохраняются пачками через буфер отложенной записи.
+    """
+    if not twitter_accounts or not users:
+        logger.warning("No accounts or users to follow")
+        return
+
+    if job is None:
+        job = await JobTracker.create("follow", {
+            "account_ids": [account.database_id for account in twitter_accounts],
+            "users": [user.model_dump(mode="json", exclude={"raw_data"}) for user in users],
+        })
+
+    async with AsyncSessionmaker() as session:
+        await bulk_upsert(
+            session, TwitterUser, [dump_user(user) for user in users], conflict_cols=["id"],
+            chunk_size=CONFIG.DATABASE.BULK_CHUNK_SIZE,
+        )
+        await session.commit()
+        following_pairs = await get_following_pairs(
+            session,
+            [account.twitter_id for account in twitter_accounts if account.twitter_id],
+            [user.id for user in users],
+        )
+
+    async def _follow(twitter_account: AccountRecord):
+        async with TwitterClient(twitter_account) as twitter_client:  # type: TwitterClient
+            for user in users:
+                if job.is_done(twitter_account.database_id, user.id):
+                    continue
+                if (twitter_account.twitter_id, user.id) in following_pairs:
+                    logger.warning(f"@{twitter_account.username} (id={twitter_account.twitter_id})"
+                                   f" User (id={user.id}) already followed")
+                    await job.mark_done(twitter_account.database_id, user.id)
+                    continue
+                if await twitter_client.follow_and_buffer(user):
+                    await job.mark_done(twitter_account.database_id, user.id)
+
+    await process_twitter_accounts(_follow, twitter_accounts, job)
+
+
+async def resume_follow(job: JobTracker):
+    async with AsyncSessionmaker() as session:
+        twitter_accounts = await get_accounts_by_ids(session, job.parameters["account_ids"])
+    users = [twitter.User(**user_data) for user_data in job.parameters["users"]]
+    await follow_users(twitter_accounts, users, job)
+
+
 async def follow():
+    if job := await ask_and_resume_job("follow"):
+        await resume_follow(job)
+        return
+
     async with AsyncSessionmaker() as session:
         twitter_accounts = await ask_and_get_accounts(session, statuses=("GOOD", ))
 
@@ -21,9 +88,4 @@ async def follow():
     if not await questionary.confirm("Resume?").ask_async():
         return
 
-    async def _follow(twitter_account: TwitterAccount):
-        async with TwitterClient(twitter_account) as twitter_client:  # type: TwitterClient
-            for user in users:
-                await twitter_client.follow_and_save(user)
-
-    await process_twitter_accounts(_follow, twitter_accounts)
+    await follow_users(twitter_accounts, users)
@@ -3,7 +3,7 @@ import random
 import twitter
 from loguru import logger
 
-from ..database.models import TwitterAccount, TwitterUser
+from ..database.records import AccountRecord
 from ..database.crud import ask_and_get_accounts, choose_accounts
 from ..database import AsyncSessionmaker
 from ..twitter import TwitterClient
@@ -11,7 +11,7 @@ from common.ask import ask_int
 from .process_utils import process_account
 
 
-async def _follow(twitter_account: TwitterAccount, user: twitter.User | TwitterUser):
+async def _follow(twitter_account: AccountRecord, user: twitter.User):
     async with TwitterClient(twitter_account) as twitter_client:  # type: TwitterClient
         await twitter_client.follow_and_save(user)
 
@@ -23,13 +23,17 @@ async def follow_each_other():
     async with AsyncSessionmaker() as session:
         twitter_accounts = await ask_and_get_accounts(session, statuses=("GOOD",))
 
+    if not twitter_accounts:
+        return
+
     while True:
         max_followers = await ask_int("Enter max followers:", min=0, max=len(twitter_accounts))
-        accounts_dict = {f"{account}\nFollowers: {account.user.followers_count if account.user else 'UNKNOWN USER'}": account
+        if max_followers is None:
+            return
+        accounts_dict = {f"{account}\nFollowers: {account.followers_count if account.twitter_id else 'UNKNOWN USER'}": account
                          for account in twitter_accounts
-                         if not account.user
-                         or account.user.followers_count is None
-                         or account.user.followers_count < max_followers}
+                         if account.followers_count is None
+                         or account.followers_count < max_followers}
 
         if not accounts_dict:
             logger.warning(f"No accounts. Change max followers count!")
@@ -51,7 +55,8 @@ async def follow_each_other():
                             f" Followers count: {twitter_client.account.followers_count}")
 
                 if twitter_client.account.followers_count < max_followers:
-                    await _follow(random.choice(twitter_accounts), twitter_account.user)
+                    user = twitter.User(id=twitter_account.twitter_id, username=twitter_account.username)
+                    await _follow(random.choice(twitter_accounts), user)
                     twitter_accounts_to_follow.append(twitter_account)
 
         await process_account(try_follow, twitter_account)
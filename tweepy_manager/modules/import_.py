@@ -1,18 +1,286 @@
+from dataclasses import dataclass, field, fields
+from pathlib import Path
+from typing import Any, Iterable
+
 from better_proxy import parse_proxy_str
+from loguru import logger
+from sqlalchemy import select, insert, update, func, tuple_
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.ext.asyncio import AsyncSession
+from tqdm import tqdm
 
 import questionary
 
-from common.excel import get_xlsx_filepaths, get_worksheets
-from common.sqlalchemy.crud import update_or_create
+from common.excel import get_xlsx_filepaths, count_worksheet_rows
+from common.delimited import get_delimited_filepaths, DELIMITERS, FIELDS_SEPARATOR
+from common.files import count_lines
+from common.sqlalchemy.crud import bulk_upsert, max_rows_per_query
+from common.utils import chunked
 
-from ..database.models import TwitterAccount, Proxy, Tag
+from ..database.models import TwitterAccount, Proxy
 from ..database import AsyncSessionmaker
-from ..paths import INPUT_DIR
-from ..excel import excel
+from ..database.tag_index import invalidate_tag_index
+from ..database.tags import add_account_tags
+from ..config import CONFIG
+from ..paths import INPUT_DIR, ACCOUNTS_DIR
+from ..excel import excel, delimited_text
+
+ACCOUNT_FIELDS = (
+    "auth_token", "username", "password", "email", "email_password", "totp_secret", "backup_code", "status",
+)
+PROXY_KEY = ("host", "port", "login", "password")
+# Порядок полей в .txt по умолчанию. Прокси в конце: последнее поле может содержать разделитель
+DEFAULT_FIELDS = "username:password:email:email_password:auth_token:proxy"
+
+
+@dataclass
+class ImportSummary:
+    rows: int = 0
+    created: int = 0
+    updated: int = 0
+    failed: int = 0
+    proxies: int = 0
+    tags: int = 0
+
+    def add(self, other: "ImportSummary"):
+        for summary_field in fields(self):
+            setattr(self, summary_field.name, getattr(self, summary_field.name) + getattr(other, summary_field.name))
+
+    def __str__(self):
+        return (f"Rows: {self.rows}"
+                f"\n\tNew accounts: {self.created}"
+                f"\n\tUpdated accounts: {self.updated}"
+                f"\n\tFailed rows: {self.failed}"
+                f"\n\tNew or updated proxies: {self.proxies}"
+                f"\n\tNew tags: {self.tags}")
+
+
+@dataclass
+class ImportRow:
+    account: dict[str, Any]
+    twitter_id: int | None = None
+    proxy: dict[str, Any] | None = None
+    tags: list[str] = field(default_factory=list)
+    database_id: int | None = None
+
+    @property
+    def proxy_key(self) -> tuple | None:
+        return tuple(self.proxy[key] for key in PROXY_KEY) if self.proxy else None
+
+
+def _str_or_none(value) -> str | None:
+    if value is None:
+        return None
+    return str(value).strip() or None
+
+
+def parse_row(data: dict[str, Any]) -> ImportRow:
+    """
+    В аккаунт попадают только заполненные поля источника: при повторном импорте
+    файла с частью полей (например, auth_token:proxy) остальные поля аккаунта не меняются.
+    Статус по умолчанию (UNKNOWN) задается только новым аккаунтам.
+    """
+    twitter_data = data.get("twitter", {})
+    account = {}
+    for key in ACCOUNT_FIELDS:
+        if (value := _str_or_none(twitter_data.get(key))) is not None:
+            account[key] = value
+    if country_code := _str_or_none(data.get("country_code")):
+        account["country_code"] = country_code.lower()
+    row = ImportRow(account)
+
+    if twitter_id := twitter_data.get("twitter_id"):
+        row.twitter_id = int(twitter_id)
+
+    if raw_proxy := _str_or_none(data.get("proxy")):
+        row.proxy = parse_proxy_str(raw_proxy)
+        row.proxy["protocol"] = row.proxy["protocol"] or "http"
+
+    if raw_tags := _str_or_none(data.get("tags")):
+        row.tags = [tag.strip() for tag in raw_tags.split(",") if tag.strip()]
+
+    return row
+
+
+def _group_by_keys(rows: Iterable[ImportRow]) -> list[list[ImportRow]]:
+    # Для многострочного INSERT / UPDATE у всех строк должен быть одинаковый набор полей
+    groups: dict[frozenset, list[ImportRow]] = {}
+    for row in rows:
+        groups.setdefault(frozenset(row.account), []).append(row)
+    return list(groups.values())
+
+
+async def _get_or_create_proxies(session: AsyncSession, proxies: dict[tuple, dict[str, Any]]) -> dict[tuple, int]:
+    """
+    database_id прокси по (host, port, login, password). Существующие прокси ищутся пачками,
+    у найденных обновляется protocol, недостающие вставляются одним INSERT ... RETURNING.
+    Если в бд уже есть одинаковые прокси, используется прокси с наименьшим database_id.
+    """
+    key_columns = [getattr(Proxy, column) for column in PROXY_KEY]
+    keys = list(proxies)
+    proxy_ids = {}
+    for chunk in chunked(keys, max_rows_per_query(CONFIG.DATABASE.BULK_CHUNK_SIZE, len(key_columns))):
+        query = select(Proxy.database_id, *key_columns).where(
+            tuple_(*key_columns).in_(chunk)).order_by(Proxy.database_id.desc())
+        for database_id, *key in (await session.execute(query)).tuples():
+            proxy_ids[tuple(key)] = database_id
+
+    if proxy_ids:
+        await session.execute(update(Proxy), [
+            {"database_id": database_id, "protocol": proxies[key]["protocol"]}
+            for key, database_id in proxy_ids.items()
+        ])
+
+    if missing := [key for key in keys if key not in proxy_ids]:
+        query = insert(Proxy).returning(Proxy.database_id, sort_by_parameter_order=True)
+        database_ids = await session.scalars(query, [proxies[key] for key in missing])
+        proxy_ids.update(zip(missing, database_ids))
+
+    return proxy_ids
+
+
+async def _import_rows(
+        session: AsyncSession,
+        rows: list[ImportRow],
+        proxy_ids: dict[tuple, int],
+) -> ImportSummary:
+    summary = ImportSummary(rows=len(rows))
+
+    # Прокси: каждый уникальный прокси сохраняется один раз за весь импорт
+    new_proxies = {row.proxy_key: row.proxy for row in rows if row.proxy and row.proxy_key not in proxy_ids}
+    if new_proxies:
+        proxy_ids.update(await _get_or_create_proxies(session, new_proxies))
+        summary.proxies += len(new_proxies)
+    for row in rows:
+        if row.proxy:
+            row.account["proxy_database_id"] = proxy_ids[row.proxy_key]
+
+    # Аккаунты с известным twitter_id обновляются
+    if twitter_ids := {row.twitter_id for row in rows if row.twitter_id}:
+        query = select(TwitterAccount.twitter_id, TwitterAccount.database_id).where(
+            TwitterAccount.twitter_id.in_(twitter_ids))
+        database_ids = dict((await session.execute(query)).tuples().all())
+        for row in rows:
+            row.database_id = database_ids.get(row.twitter_id)
+        for group in _group_by_keys(row for row in rows if row.database_id):
+            if group[0].account:
+                await session.execute(
+                    update(TwitterAccount), [{**row.account, "database_id": row.database_id} for row in group])
+            summary.updated += len(group)
+
+    # Остальные ищутся по auth_token. Обновляются только поля, которые есть в строке
+    rows_with_token = [row for row in rows if not row.database_id and row.account.get("auth_token")]
+    if rows_with_token:
+        auth_tokens = {row.account["auth_token"] for row in rows_with_token}
+        existing_count = await session.scalar(
+            select(func.count()).where(TwitterAccount.auth_token.in_(auth_tokens)))
+        database_ids = {}
+        for group in _group_by_keys(rows_with_token):
+            database_ids.update(await bulk_upsert(
+                session, TwitterAccount, [row.account for row in group], conflict_cols=["auth_token"],
+                chunk_size=CONFIG.DATABASE.BULK_CHUNK_SIZE,
+            ))
+        for row in rows_with_token:
+            row.database_id = database_ids[row.account["auth_token"]]
+        summary.updated += existing_count
+        summary.created += len(auth_tokens) - existing_count
 
+    # Аккаунты без auth_token просто добавляются
+    for group in _group_by_keys(row for row in rows if not row.database_id):
+        query = insert(TwitterAccount).returning(TwitterAccount.database_id, sort_by_parameter_order=True)
+        database_ids = await session.scalars(query, [row.account for row in group])
+        for row, database_id in zip(group, database_ids):
+            row.database_id = database_id
+        summary.created += len(group)
 
-async def select_and_import_xlsx():
-    table_filepaths = get_xlsx_filepaths(INPUT_DIR)
+    # Теги
+    if tags := {(row.database_id, tag) for row in rows for tag in row.tags}:
+        summary.tags += await add_account_tags(session, tags)
+
+    return summary
+
+
+async def _import_rows_one_by_one(
+        rows: list[ImportRow],
+        proxy_ids: dict[tuple, int],
+) -> ImportSummary:
+    summary = ImportSummary()
+    async with AsyncSessionmaker() as session:
+        for row in rows:
+            row.database_id = None
+            row_proxy_ids = dict(proxy_ids)
+            try:
+                summary.add(await _import_rows(session, [row], row_proxy_ids))
+                await session.commit()
+                proxy_ids.update(row_proxy_ids)
+            except DBAPIError as exc:
+                await session.rollback()
+                summary.rows += 1
+                summary.failed += 1
+                logger.error(f"Failed to import account (username={row.account.get('username')}): {exc.orig}")
+    return summary
+
+
+async def import_rows(rows: Iterable[dict[str, Any]], total: int = None) -> ImportSummary:
+    """
+    Импортирует строки таблицы пачками по CONFIG.DATABASE.BULK_CHUNK_SIZE:
+    прокси, аккаунты и теги сохраняются несколькими запросами на пачку, каждая пачка — отдельная транзакция.
+    Если бд отклоняет пачку (нарушение ограничений, слишком длинное или неверное значение),
+    ее строки импортируются по одной, а отклоненные строки учитываются в сводке как неудачные.
+    """
+    summary = ImportSummary()
+    proxy_ids: dict[tuple, int] = {}
+
+    with tqdm(total=total, unit="row") as progress_bar:
+        for chunk in chunked(rows, CONFIG.DATABASE.BULK_CHUNK_SIZE):
+            parsed_rows = []
+            for data in chunk:
+                try:
+                    parsed_rows.append(parse_row(data))
+                except ValueError as exc:
+                    summary.rows += 1
+                    summary.failed += 1
+                    logger.error(f"Failed to parse row: {exc}")
+
+            chunk_proxy_ids = dict(proxy_ids)
+            try:
+                async with AsyncSessionmaker() as session:
+                    chunk_summary = await _import_rows(session, parsed_rows, chunk_proxy_ids)
+                    await session.commit()
+                proxy_ids.update(chunk_proxy_ids)
+            except DBAPIError as exc:
+                logger.warning(f"Chunk of {len(parsed_rows)} rows was rejected by the database ({exc.orig})."
+                               f" Importing one by one")
+                chunk_summary = await _import_rows_one_by_one(parsed_rows, proxy_ids)
+
+            summary.add(chunk_summary)
+            progress_bar.update(len(chunk))
+
+    invalidate_tag_index()
+    return summary
+
+
+async def ask_fields() -> str:
+    return await questionary.text(
+        "Fields order (one line = one account):",
+        default=DEFAULT_FIELDS,
+        validate=_validate_fields,
+    ).ask_async()
+
+
+def _validate_fields(fields: str) -> bool | str:
+    try:
+        delimited_text.parse_fields(fields)
+        return True
+    except ValueError as exc:
+        return str(exc)
+
+
+async def select_and_import():
+    # Текстовые файлы берутся только из ACCOUNTS_DIR: в INPUT_DIR лежат и другие .txt (списки слов, юзернеймов)
+    table_filepaths = (get_xlsx_filepaths(INPUT_DIR)
+                       + get_xlsx_filepaths(ACCOUNTS_DIR)
+                       + get_delimited_filepaths(ACCOUNTS_DIR))
 
     if len(table_filepaths) == 0:
         template_table_filepath = excel.create_empty_table(INPUT_DIR, "template")
@@ -21,62 +289,62 @@ async def select_and_import_xlsx():
     elif len(table_filepaths) == 1:
         selected_table_filepath = table_filepaths[0]
     else:
-        table_filenames = [filepath.name for filepath in table_filepaths]
-        selected_table_filename = await questionary.select("Which table?", choices=table_filenames).ask_async()
-        selected_table_filepath = INPUT_DIR / selected_table_filename
+        choices = [
+            questionary.Choice(str(filepath.relative_to(INPUT_DIR)), value=filepath)
+            for filepath in table_filepaths
+        ]
+        selected_table_filepath = await questionary.select("Which table?", choices=choices).ask_async()
 
-    worksheets = get_worksheets(selected_table_filepath)
+    if selected_table_filepath.suffix in DELIMITERS:
+        fields = None
+        if DELIMITERS[selected_table_filepath.suffix] == FIELDS_SEPARATOR:
+            fields = await ask_fields()
+        await import_delimited(selected_table_filepath, fields)
+        return
 
-    # TODO Показывать также количество строк в листах
-    selected_worksheet_name = await questionary.select("Which worksheet?", choices=worksheets).ask_async()
-    selected_worksheet = worksheets[selected_worksheet_name]
-    table = excel.read_worksheet(selected_worksheet)
+    worksheet_rows = count_worksheet_rows(selected_table_filepath)
+    choices = [
+        questionary.Choice(f"{name} ({rows} rows)", value=name)
+        for name, rows in worksheet_rows.items()
+    ]
+    selected_worksheet_name = await questionary.select("Which worksheet?", choices=choices).ask_async()
+    await import_xlsx(selected_table_filepath, selected_worksheet_name)
 
-    print(f"Loaded {len(table)} rows from {selected_table_filepath.name} ({selected_worksheet_name})")
-    async with AsyncSessionmaker() as session:
-        for data in table:
-            if data["country_code"]:  # type: str
-                data["country_code"] = data["country_code"].lower()
-
-            twitter_id = None
-            if data["twitter"]["twitter_id"]:
-                twitter_id = int(data["twitter"]["twitter_id"])
-                del data["twitter"]["twitter_id"]
-
-            # keys = await questionary.checkbox("What to import:", choices=data).ask_async()
-            # data = {key: data[key] for key in keys}
-
-            if twitter_id:
-                twitter_account, created = await update_or_create(
-                    session,
-                    TwitterAccount,
-                    data["twitter"],
-                    filter_by={"twitter_id": twitter_id},
-                )
-
-            else:
-                twitter_account = TwitterAccount(**data["twitter"])
-                session.add(twitter_account)
-                created = True
-
-            if created: print("(NEW!) ", end="")
-            print(repr(twitter_account))
-
-            if raw_tags := data["tags"]:  # type: str
-                print(f"\tTags: {raw_tags}")
-                for tag_name in raw_tags.split(","):  # type: str
-                    tag_name = tag_name.strip()
-                    await session.merge(Tag(twitter_account_id=twitter_account.database_id, tag=tag_name))
-
-            if data["proxy"]:
-                parsed_proxy = parse_proxy_str(data["proxy"])
-                parsed_proxy["protocol"] = parsed_proxy["protocol"] or "http"
-                # TODO Не фильтровать по протоколу
-                twitter_account.proxy, created = await update_or_create(session, Proxy, parsed_proxy, filter_by=parsed_proxy)
-                if created:
-                    print("\t(NEW!) ", end="")
-                else:
-                    print("\t")
-                print(repr(twitter_account.proxy))
-
-            await session.commit()
+
+async def import_file(filepath: Path, *, worksheet_name: str = None, fields: str = None):
+    """Импортирует таблицу .xlsx или текстовый файл (.csv, .tsv, .txt) в зависимости от расширения."""
+    if filepath.suffix in DELIMITERS:
+        await import_delimited(filepath, fields)
+    else:
+        await import_xlsx(filepath, worksheet_name)
+
+
+async def import_delimited(filepath: Path, fields: str = None):
+    """
+    Строки читаются потоково.
+
+    :param fields: Порядок полей для файлов .txt. По умолчанию DEFAULT_FIELDS
+    """
+    rows = delimited_text.read_rows(filepath, fields=fields or DEFAULT_FIELDS)
+    total = count_lines(filepath)
+    if DELIMITERS[filepath.suffix] != FIELDS_SEPARATOR:
+        total -= 1  # Заголовки
+
+    print(f"Importing ~{total} rows from {filepath.name}")
+    summary = await import_rows(rows, total)
+    print(f"Imported {filepath.name}\n\t{summary}")
+
+
+async def import_xlsx(table_filepath: Path, worksheet_name: str = None):
+    """
+    Строки читаются потоково: импорт начинается сразу, память не зависит от размера таблицы.
+
+    :param worksheet_name: По умолчанию первый лист.
+    """
+    worksheet_rows = count_worksheet_rows(table_filepath)
+    worksheet_name = worksheet_name or next(iter(worksheet_rows))
+    total = worksheet_rows[worksheet_name]
+
+    print(f"Importing {total} rows from {table_filepath.name} ({worksheet_name})")
+    summary = await import_rows(excel.read_rows(table_filepath, worksheet_name), total)
+    print(f"Imported {table_filepath.name} ({worksheet_name})\n\t{summary}")
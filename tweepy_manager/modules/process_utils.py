@@ -1,5 +1,5 @@
 import asyncio
-from typing import Callable, Iterable
+from typing import Callable, Iterable, AsyncIterable, AsyncIterator, Sized
 
 from loguru import logger
 from tqdm.asyncio import tqdm
@@ -7,91 +7,164 @@ import twitter
 import curl_cffi
 
 from common.ask import ask_values_with_separator
+from common.scheduler import FairScheduler
 
-from ..database.models import TwitterAccount
-from ..database import AsyncSessionmaker
+from ..database.records import AccountRecord
+from ..database import pool_metrics, write_buffer
 from ..twitter import TwitterClient
 from ..config import CONFIG
-
-
-async def sleep_between_retries(twitter_account: TwitterAccount, retries: int):
-    if not CONFIG.CONCURRENCY.DELAY_BETWEEN_RETRIES:
-        return
-
-    logger.info(f"@{twitter_account.username} (id={twitter_account.twitter_id})"
-                f" Sleep time: {CONFIG.CONCURRENCY.DELAY_BETWEEN_RETRIES} seconds."
-                f"\n\tОсталось попыток: {retries}")
-    await asyncio.sleep(CONFIG.CONCURRENCY.DELAY_BETWEEN_RETRIES)
-
-
-async def process_account(fn, twitter_account):
-    retries = CONFIG.CONCURRENCY.MAX_RETRIES
-    while retries > 0:
-        try:
-            # Функции будет вызываться повторно, если не произведен выход из цикла (break)
-            await fn(twitter_account)
+from ..jobs import JobTracker
+from ..retry import RetryPolicy, RetryState, ErrorClass, CircuitBreaker
+
+
+RETRY_POLICY = RetryPolicy()
+
+
+async def try_process_account(
+        fn: Callable,
+        twitter_account: AccountRecord,
+        retry_state: RetryState,
+) -> tuple[float | None, ErrorClass | None]:
+    """
+    Делает одну попытку обработать аккаунт.
+
+    :return: Задержка перед повторной попыткой (None — не повторять)
+        и класс возникшей ошибки (None — ошибки не было).
+    """
+    try:
+        await fn(twitter_account)
+        return None, None
+
+    except (twitter.errors.TwitterException, curl_cffi.requests.errors.RequestsError) as exc:
+        error_class = RETRY_POLICY.classify(exc)
+        if error_class is None:
+            raise
+
+        delay = RETRY_POLICY.next_delay(error_class, exc, retry_state)
+        if delay is None:
+            logger.warning(f"{twitter_account} ({error_class.name}) {exc}")
+        else:
+            logger.warning(f"{twitter_account} ({error_class.name}) {exc}"
+                           f"\n\tПовторная попытка через {delay:.1f} сек.")
+        return delay, error_class
+
+
+async def process_account(fn: Callable, twitter_account: AccountRecord):
+    retry_state = RetryState()
+    while True:
+        delay, _ = await try_process_account(fn, twitter_account, retry_state)
+        if delay is None:
             break
+        await asyncio.sleep(delay)
 
-        except (twitter.errors.BadAccount, twitter.errors.TwitterException) as exc:
-            logger.warning(f"{twitter_account} {exc}")
-            break
-
-        except twitter.errors.HTTPException as exc:
-            if exc.response.status_code >= 500:
-                logger.warning(f"{twitter_account} {exc}")
-                # повторная попытка
-            elif 398 in exc.api_codes:
-                logger.error(f"{twitter_account} Relogin failed! Try again later")
-                break
-            elif 399 in exc.api_codes:
-                logger.error(f"{twitter_account} Account deleted! Deleting from database...")
-                async with AsyncSessionmaker() as session:
-                    await session.delete(twitter_account)
-                    await session.commit()
-                break
-            else:
-                raise
 
-        except curl_cffi.requests.errors.RequestsError as exc:
-            if exc.code in (23, 28, 35, 56, 7, 18, 56):
-                logger.warning(f"{twitter_account} (May be bad or slow proxy) {exc}")
-                # повторная попытка
+async def aiter_accounts(
+        twitter_accounts: Iterable[AccountRecord] | AsyncIterable[AccountRecord],
+) -> AsyncIterator[AccountRecord]:
+    if isinstance(twitter_accounts, AsyncIterable):
+        async for twitter_account in twitter_accounts:
+            yield twitter_account
+    else:
+        for twitter_account in twitter_accounts:
+            yield twitter_account
+
+
+async def process_twitter_accounts(
+        fn: Callable,
+        twitter_accounts: Iterable[AccountRecord] | AsyncIterable[AccountRecord],
+        job: JobTracker = None,
+        total: int = None,
+):
+    """
+    Обрабатывает аккаунты фиксированным пулом из CONFIG.CONCURRENCY.MAX_TASKS воркеров.
+
+    Аккаунты забираются из источника лениво, по мере освобождения воркеров,
+    и раздаются по кругу между прокси. Если задан CONFIG.CONCURRENCY.MAX_TASKS_PER_PROXY,
+    то на одном прокси одновременно выполняется не больше указанного количества задач,
+    а свободный воркер берет аккаунт с незанятого прокси.
+
+    Повторные попытки планируются через очередь и не занимают воркера на время ожидания.
+    Прокси, на котором подряд случается много сетевых ошибок, временно исключается из раздачи.
+
+    Если передана задача (job), то уже обработанные в ней аккаунты пропускаются,
+    успешно обработанные отмечаются DONE, а аккаунты с неустранимой ошибкой (класс ошибки без повторных попыток,
+    например плохой или не найденный аккаунт) — FAILED. Задача завершается, если не осталось аккаунтов,
+    у которых закончились попытки после временных ошибок: их можно обработать, продолжив задачу.
+
+    :param twitter_accounts: Список или асинхронный источник, например crud.iter_accounts:
+        тогда аккаунты подгружаются из бд страницами по мере обработки.
+    :param total: Количество аккаунтов для индикатора прогресса, если источник не список.
+    """
+    if total is None and isinstance(twitter_accounts, Sized):
+        total = len(twitter_accounts)
+    retry_states: dict[int, RetryState] = {}
+    circuit_breaker = CircuitBreaker()
+    failed_count = 0
+    unresolved_count = 0
+    pool_metrics().reset()
+
+    with tqdm(total=total) as progress_bar:
+
+        async def pending_accounts() -> AsyncIterator[AccountRecord]:
+            async for twitter_account in aiter_accounts(twitter_accounts):
+                if job and job.is_done(twitter_account.database_id):
+                    progress_bar.update()
+                    continue
+                yield twitter_account
+
+        async def handler(twitter_account: AccountRecord) -> float | None:
+            retry_state = retry_states.setdefault(id(twitter_account), RetryState())
+            delay, error_class = await try_process_account(fn, twitter_account, retry_state)
+
+            proxy_id = twitter_account.proxy_database_id
+            if error_class and error_class.proxy_failure:
+                if cooldown := circuit_breaker.record_failure(proxy_id):
+                    logger.warning(f"Proxy (database_id={proxy_id}) paused for {cooldown} seconds")
+                    scheduler.pause(proxy_id, cooldown)
             else:
-                break
-
-        retries -= 1
-        if retries > 0:
-            await sleep_between_retries(twitter_account, retries)
-
-
-async def process_twitter_accounts(fn: Callable, twitter_accounts: Iterable[TwitterAccount]):
-
-    if CONFIG.CONCURRENCY.MAX_TASKS > 1:
-        # Create a semaphore with the specified max tasks
-        semaphore = asyncio.Semaphore(CONFIG.CONCURRENCY.MAX_TASKS)
-
-        async def wrapper(twitter_account):
-            async with semaphore:
-                await process_account(fn, twitter_account)
+                circuit_breaker.record_success(proxy_id)
+
+            if delay is None:
+                del retry_states[id(twitter_account)]
+                progress_bar.update()
+                if error_class:
+                    nonlocal failed_count, unresolved_count
+                    failed_count += 1
+                    if error_class.retries:
+                        unresolved_count += 1
+                    elif job:
+                        await job.mark_failed(twitter_account.database_id)
+                elif job:
+                    await job.mark_done(twitter_account.database_id)
+            return delay
+
+        scheduler = FairScheduler(
+            handler,
+            max_workers=CONFIG.CONCURRENCY.MAX_TASKS,
+            key=lambda twitter_account: twitter_account.proxy_database_id,
+            max_per_key=CONFIG.CONCURRENCY.MAX_TASKS_PER_PROXY,
+        )
+        try:
+            await scheduler.run(pending_accounts())
+        finally:
+            await write_buffer.flush()
+            if job:
+                await job.flush()
 
-        # Create a list of tasks to be executed concurrently
-        tasks = [wrapper(twitter_account) for twitter_account in twitter_accounts]
+    logger.info(f"Database pool: {pool_metrics()}")
 
-        # Wait for all tasks to complete
-        await tqdm.gather(*tasks)
-    else:
-        for twitter_account in tqdm(twitter_accounts):
-            await process_account(fn, twitter_account)
+    if failed_count:
+        logger.warning(f"{failed_count} accounts failed")
 
+    if job:
+        if unresolved_count:
+            logger.warning(f"{unresolved_count} accounts ran out of retries."
+                           f" Job (id={job.job.id}) can be resumed later")
+        else:
+            await job.finish()
 
-# TODO ask_and_get_users() - В первую очередь ищет твит в бд
-async def ask_and_request_users(twitter_account: TwitterAccount) -> list[twitter.User]:
-    usernames = await ask_values_with_separator(
-        "Usernames:",
-        f"Enter Twitter usernames (handles / screen_names) separated by spaces"
-        f"\nExample: elonmusk jeffbezos twitterdev"
-    )
 
+async def request_users(twitter_account: AccountRecord, usernames: Iterable[str]) -> list[twitter.User]:
     users = []
     async with TwitterClient(twitter_account) as twitter_client:  # type: TwitterClient
         for username in usernames:
@@ -108,14 +181,17 @@ async def ask_and_request_users(twitter_account: TwitterAccount) -> list[twitter
     return users
 
 
-# TODO ask_and_get_tweets() - В первую очередь ищет твит в бд
-async def ask_and_request_tweets(twitter_account: TwitterAccount) -> list[twitter.Tweet]:
-    tweet_ids = await ask_values_with_separator(
-        "Tweet IDs:",
-        f"Enter Tweet IDs separated by spaces"
-        f"\nExample: 1780204494640304336 1780506488701624699"
+# TODO ask_and_get_users() - В первую очередь ищет твит в бд
+async def ask_and_request_users(twitter_account: AccountRecord) -> list[twitter.User]:
+    usernames = await ask_values_with_separator(
+        "Usernames:",
+        f"Enter Twitter usernames (handles / screen_names) separated by spaces"
+        f"\nExample: elonmusk jeffbezos twitterdev"
     )
+    return await request_users(twitter_account, usernames)
+
 
+async def request_tweets(twitter_account: AccountRecord, tweet_ids: Iterable[int | str]) -> list[twitter.Tweet]:
     tweets = []
     print("Tweets:")
     async with TwitterClient(twitter_account) as twitter_client:  # type: TwitterClient
@@ -128,3 +204,13 @@ async def ask_and_request_tweets(twitter_account: TwitterAccount) -> list[twitte
                 print(f"Tweet (id={tweet_id}) not found")
 
     return tweets
+
+
+# TODO ask_and_get_tweets() - В первую очередь ищет твит в бд
+async def ask_and_request_tweets(twitter_account: AccountRecord) -> list[twitter.Tweet]:
+    tweet_ids = await ask_values_with_separator(
+        "Tweet IDs:",
+        f"Enter Tweet IDs separated by spaces"
+        f"\nExample: 1780204494640304336 1780506488701624699"
+    )
+    return await request_tweets(twitter_account, tweet_ids)
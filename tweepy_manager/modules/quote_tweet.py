@@ -1,48 +1,56 @@
 from collections import defaultdict
-from typing import Iterable
+from typing import Iterable, Sequence
 import datetime
 import random
 
-from sqlalchemy.orm import joinedload
-from sqlalchemy import select
 from loguru import logger
 import questionary
 import twitter
 
-from ..database.models import TwitterAccount, Tweet
-from ..database.crud import ask_and_get_accounts, choose_accounts
+from ..database.models import Tweet
+from ..database.records import AccountRecord
+from ..database.crud import (
+    ask_and_get_accounts,
+    choose_accounts,
+    CHECKBOX_LIMIT,
+    get_accounts_by_ids,
+    get_quoted_pairs,
+    get_quote_tweets,
+)
 from ..database import AsyncSessionmaker
 from ..twitter import TwitterClient
-from ..utils import request_english_words
+from ..text import create_text_pool
 from ..paths import OUTPUT_DIR
+from ..jobs import JobTracker, ask_and_resume_job
 
 from .process_utils import process_twitter_accounts, ask_and_request_tweets
 
 
-async def _quote(twitter_account: TwitterAccount, tweets: Iterable[twitter.Tweet], texts: Iterable[str]) -> list[Tweet]:
-    async with TwitterClient(twitter_account) as twitter_client, AsyncSessionmaker() as session:
+async def _quote(
+        twitter_account: AccountRecord,
+        tweets: Iterable[twitter.Tweet],
+        texts: Iterable[str],
+        job: JobTracker,
+        existing_quote_tweets: dict[tuple[int, int], Tweet],
+) -> list[Tweet]:
+    async with TwitterClient(twitter_account) as twitter_client:
         quote_tweets = []
         for tweet_to_quote, text in zip(tweets, texts):
-            query = select(Tweet).options(
-                joinedload(Tweet.quoted_tweet),
-                joinedload(Tweet.retweeted_tweet),
-                joinedload(Tweet.user),
-            ).filter_by(
-                user_id=twitter_account.twitter_id,
-                quote_tweet_id=tweet_to_quote.id,
-            )
-
-            if existing_quote_tweet := await session.scalar(query):
-                await session.refresh(existing_quote_tweet.quoted_tweet, ["user"])
+            if job.is_done(twitter_account.database_id, tweet_to_quote.id):
+                continue
+
+            if existing_quote_tweet := existing_quote_tweets.get((twitter_account.twitter_id, tweet_to_quote.id)):
                 quote_tweets.append(existing_quote_tweet)
-                logger.warning(f"@{twitter_account.username} (id={twitter_account.user.id})"
+                logger.warning(f"@{twitter_account.username} (id={twitter_account.twitter_id})"
                                f" Quote Tweet already existing"
                                f"\n\tTweet ID: {existing_quote_tweet.id}"
                                f"\n\tQuoted Tweet ID: {tweet_to_quote.id}"
                                f"\n\tText: {existing_quote_tweet.text}")
+                await job.mark_done(twitter_account.database_id, tweet_to_quote.id)
                 continue
 
             tweet = await twitter_client.quote_and_save(tweet_to_quote.url, text)
+            await job.mark_done(twitter_account.database_id, tweet_to_quote.id)
             quote_tweets.append(tweet)
             logger.success(f"@{twitter_account.username} (id={twitter_account.twitter_id})"
                            f" Tweet Quoted"
@@ -52,46 +60,41 @@ async def _quote(twitter_account: TwitterAccount, tweets: Iterable[twitter.Tweet
         return quote_tweets
 
 
-async def quote():
-    english_words = request_english_words()
-
-    async with AsyncSessionmaker() as session:
-        twitter_accounts = await ask_and_get_accounts(session, statuses=("GOOD",))
-
-    if not twitter_accounts:
+async def quote_by_accounts(
+        twitter_accounts: Sequence[AccountRecord],
+        tweets_to_quote: Sequence[twitter.Tweet],
+        job: JobTracker = None,
+):
+    """Каждый аккаунт цитирует каждый твит, тексты не повторяются у одного аккаунта (см. tweepy_manager/text.py)."""
+    if not twitter_accounts or not tweets_to_quote:
+        logger.warning("No accounts or tweets to quote")
         return
 
-    tweets_to_quote = await ask_and_request_tweets(random.choice(twitter_accounts))
+    text_pool = await create_text_pool()
 
-    accounts_dict = {}
-    for twitter_account in twitter_accounts:
-        key = str(twitter_account)
-        for tweet_to_quote in tweets_to_quote:
-            query = select(Tweet).options(
-                joinedload(Tweet.quoted_tweet),
-                joinedload(Tweet.retweeted_tweet),
-                joinedload(Tweet.user),
-            ).filter_by(
-                user_id=twitter_account.twitter_id,
-                quote_tweet_id=tweet_to_quote.id,
-            )
-            if existing_quote_tweet := await session.scalar(query):
-                key += f"\n✅      {tweet_to_quote.id} {tweet_to_quote.short_text}"
-            else:
-                key += f"\n❌      {tweet_to_quote.id} {tweet_to_quote.short_text}"
-        accounts_dict[key] = twitter_account
-
-    twitter_accounts = await choose_accounts(accounts_dict)
+    if job is None:
+        job = await JobTracker.create("quote", {
+            "account_ids": [account.database_id for account in twitter_accounts],
+            "tweets": [tweet.model_dump(mode="json") for tweet in tweets_to_quote],
+        })
 
-    if not await questionary.confirm("Resume?").ask_async():
-        return
+    # Уже существующие цитаты загружаются одним запросом, воркеры сверяются с ними в памяти
+    async with AsyncSessionmaker() as session:
+        existing_quote_tweets = await get_quote_tweets(
+            session,
+            [account.twitter_id for account in twitter_accounts if account.twitter_id],
+            [tweet.id for tweet in tweets_to_quote],
+        )
 
     quote_tweets = []
 
-    async def _custom_quote(twitter_account: TwitterAccount):
-        quote_tweets.extend(await _quote(twitter_account, tweets_to_quote, random.sample(english_words, len(tweets_to_quote))))
+    async def _custom_quote(twitter_account: AccountRecord):
+        quote_tweets.extend(await _quote(
+            twitter_account, tweets_to_quote, text_pool.take(twitter_account.database_id, len(tweets_to_quote)), job,
+            existing_quote_tweets,
+        ))
 
-    await process_twitter_accounts(_custom_quote, twitter_accounts)
+    await process_twitter_accounts(_custom_quote, twitter_accounts, job)
 
     #                         quoted_tweet: list[quote_tweet]
     sorted_quote_tweets: dict[Tweet: list[Tweet]] = defaultdict(list)
@@ -127,3 +130,53 @@ async def quote():
                     quote_tweet.text,
                 )))
                 file.write("\n")
+
+
+async def resume_quote(job: JobTracker):
+    async with AsyncSessionmaker() as session:
+        twitter_accounts = await get_accounts_by_ids(session, job.parameters["account_ids"])
+    tweets_to_quote = [twitter.Tweet.model_validate(tweet_data) for tweet_data in job.parameters["tweets"]]
+    await quote_by_accounts(twitter_accounts, tweets_to_quote, job)
+
+
+async def quote():
+    if job := await ask_and_resume_job("quote"):
+        await resume_quote(job)
+        return
+
+    async with AsyncSessionmaker() as session:
+        twitter_accounts = await ask_and_get_accounts(session, statuses=("GOOD",))
+
+    if not twitter_accounts:
+        return
+
+    tweets_to_quote = await ask_and_request_tweets(random.choice(twitter_accounts))
+
+    async with AsyncSessionmaker() as session:
+        quoted_pairs = await get_quoted_pairs(
+            session,
+            [account.twitter_id for account in twitter_accounts if account.twitter_id],
+            [tweet.id for tweet in tweets_to_quote],
+        )
+
+    # Статусы цитирования в подписях показываются, только если аккаунтов немного
+    if len(twitter_accounts) <= CHECKBOX_LIMIT:
+        accounts_dict = {}
+        for twitter_account in twitter_accounts:
+            key = str(twitter_account)
+            for tweet_to_quote in tweets_to_quote:
+                if (twitter_account.twitter_id, tweet_to_quote.id) in quoted_pairs:
+                    key += f"\n✅      {tweet_to_quote.id} {tweet_to_quote.short_text}"
+                else:
+                    key += f"\n❌      {tweet_to_quote.id} {tweet_to_quote.short_text}"
+            accounts_dict[key] = twitter_account
+
+        twitter_accounts = await choose_accounts(accounts_dict)
+    else:
+        print(f"{len(twitter_accounts)} accounts, {len(tweets_to_quote)} tweets:"
+              f" {len(quoted_pairs)} of {len(twitter_accounts) * len(tweets_to_quote)} quotes already exist")
+
+    if not await questionary.confirm("Resume?").ask_async():
+        return
+
+    await quote_by_accounts(twitter_accounts, tweets_to_quote)
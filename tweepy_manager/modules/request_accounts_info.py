@@ -1,19 +1,44 @@
-from ..database.models import TwitterAccount
-from ..database.crud import ask_and_get_accounts
+from typing import Sequence
+
+from ..database.records import AccountRecord
+from ..database.crud import ask_and_get_account_ids, accounts_by_ids_query, count_accounts, iter_accounts_by_ids
 from ..database import AsyncSessionmaker
 from ..twitter import TwitterClient
+from ..jobs import JobTracker, ask_and_resume_job
 
 from .process_utils import process_twitter_accounts
 
 
-async def _update_account_info(twitter_account: TwitterAccount):
+async def _update_account_info(twitter_account: AccountRecord):
     async with TwitterClient(twitter_account) as twitter_client:
         # Обновление информации об аккаунте по умолчанию отключено, так что делаем это вручную
         await twitter_client.update_account_info()
         await twitter_client.establish_status()
 
 
+async def request_accounts_info(database_ids: Sequence[int], job: JobTracker = None):
+    """Аккаунты подгружаются из бд страницами по мере обработки."""
+    if not database_ids:
+        return
+
+    if job is None:
+        job = await JobTracker.create("update_accounts_info", {"account_ids": list(database_ids)})
+    # Удаленные аккаунты и аккаунты без прокси (CONFIG.REQUESTS.REQUIRE_PROXY) не выдаются
+    async with AsyncSessionmaker() as session:
+        total = await count_accounts(session, accounts_by_ids_query(database_ids))
+    twitter_accounts = iter_accounts_by_ids(database_ids)
+    await process_twitter_accounts(_update_account_info, twitter_accounts, job, total=total)
+
+
+async def resume_request_accounts_info(job: JobTracker):
+    await request_accounts_info(job.parameters["account_ids"], job)
+
+
 async def update_accounts_info():
+    if job := await ask_and_resume_job("update_accounts_info"):
+        await resume_request_accounts_info(job)
+        return
+
     async with AsyncSessionmaker() as session:
-        twitter_accounts = await ask_and_get_accounts(session, statuses=("UNKNOWN", "GOOD", "LOCKED", "BAD_TOKEN"))
-    await process_twitter_accounts(_update_account_info, twitter_accounts)
+        database_ids = await ask_and_get_account_ids(session, statuses=("UNKNOWN", "GOOD", "LOCKED", "BAD_TOKEN"))
+    await request_accounts_info(database_ids)
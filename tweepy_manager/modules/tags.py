@@ -1,38 +1,119 @@
+from typing import Iterable
+
 import questionary
 from loguru import logger
+from sqlalchemy import Select
 
-from ..database.models import Tag
-from ..database.crud import ask_and_get_accounts, get_tags, choose_accounts
+from ..database.records import AccountRecord
+from ..database.crud import ask_and_get_accounts, get_tags
+from ..database.tags import add_tags, remove_tags, replace_tags, rename_tag
 from ..database import AsyncSessionmaker
 
+ALL_STATUSES = (
+    "GOOD",
+    "UNKNOWN",
+    "BAD_TOKEN",
+    "LOCKED",
+    "CONSENT_LOCKED",
+    "SUSPENDED",
+)
+
+
+def _database_ids(accounts: Select | Iterable[AccountRecord]) -> Select | list[int]:
+    if isinstance(accounts, Select):
+        return accounts
+    return [account.database_id for account in accounts]
 
-async def add_tag():
+
+async def add_tag_to_accounts(accounts: Select | Iterable[AccountRecord], tag: str):
+    """
+    :param accounts: Аккаунты или запрос аккаунтов (см. crud.accounts_query): теги добавляются одним запросом.
+    """
     async with AsyncSessionmaker() as session:
-        twitter_accounts = await ask_and_get_accounts(
-            session,
-            statuses=(
-                "GOOD",
-                "UNKNOWN",
-                "BAD_TOKEN",
-                "LOCKED",
-                "CONSENT_LOCKED",
-                "SUSPENDED",
-            ),
-        )
-
-    if not twitter_accounts:
-        return
-
-    twitter_accounts = await choose_accounts(twitter_accounts)
-
-    tags = await get_tags(session)
-    print(f"Existing tags: {', '.join(tags)}")
-    tag = await questionary.text("Enter tag:").ask_async()
-    tag = tag.strip()
+        added = await add_tags(session, _database_ids(accounts), [tag])
+        await session.commit()
+
+    logger.info(f"Tag '{tag}' added to {added} accounts")
 
+
+async def remove_tag_from_accounts(accounts: Select | Iterable[AccountRecord], tag: str):
     async with AsyncSessionmaker() as session:
-        for account in twitter_accounts:
-            await session.merge(Tag(twitter_account_id=account.database_id, tag=tag))
+        removed = await remove_tags(session, _database_ids(accounts), [tag])
         await session.commit()
 
-    logger.info("Tags added successfully to selected accounts.")
+    logger.info(f"Tag '{tag}' removed from {removed} accounts")
+
+
+async def replace_account_tags(accounts: Select | Iterable[AccountRecord], tags: list[str]):
+    async with AsyncSessionmaker() as session:
+        await replace_tags(session, _database_ids(accounts), tags)
+        await session.commit()
+
+    logger.info(f"Tags of selected accounts replaced with: {', '.join(tags)}")
+
+
+async def rename_account_tag(old_name: str, new_name: str):
+    async with AsyncSessionmaker() as session:
+        renamed = await rename_tag(session, old_name, new_name)
+        await session.commit()
+
+    logger.info(f"Tag '{old_name}' renamed to '{new_name}' for {renamed} accounts")
+
+
+def _split_tags(text: str) -> list[str]:
+    return [tag.strip() for tag in text.split(",") if tag.strip()]
+
+
+def _validate_tags(text: str) -> bool | str:
+    tags = _split_tags(text)
+    if not tags:
+        return "Enter at least one tag!"
+    if too_long := [tag for tag in tags if len(tag) > 16]:
+        return f"Tags must be at most 16 characters: {', '.join(too_long)}"
+    return True
+
+
+def validate_tag(text: str) -> bool | str:
+    if "," in text:
+        return "Enter one tag!"
+    return _validate_tags(text)
+
+
+async def manage_tags():
+    action = await questionary.select("Tags:", choices=[
+        questionary.Choice("Add tag to accounts", value="add"),
+        questionary.Choice("Remove tag from accounts", value="remove"),
+        questionary.Choice("Replace tags of accounts", value="replace"),
+        questionary.Choice("Rename tag", value="rename"),
+    ]).ask_async()
+
+    async with AsyncSessionmaker() as session:
+        tags = await get_tags(session)
+        if action != "rename":
+            twitter_accounts = await ask_and_get_accounts(session, statuses=ALL_STATUSES)
+            if not twitter_accounts:
+                return
+
+    print(f"Existing tags: {', '.join(tags)}")
+
+    if action == "rename":
+        if not tags:
+            logger.warning("No tags yet")
+            return
+        old_name = await questionary.select("Tag to rename:", choices=tags).ask_async()
+        new_name = (await questionary.text(
+            "New name:",
+            validate=lambda text: "Enter a different name!" if text.strip() == old_name else validate_tag(text),
+        ).ask_async()).strip()
+        await rename_account_tag(old_name, new_name)
+
+    elif action == "replace":
+        new_tags = _split_tags(await questionary.text("Comma separated tags:", validate=_validate_tags).ask_async())
+        await replace_account_tags(twitter_accounts, new_tags)
+
+    else:
+        tag = (await questionary.text("Enter tag:", validate=validate_tag).ask_async()).strip()
+        if action == "add":
+            await add_tag_to_accounts(twitter_accounts, tag)
+        else:
+            await remove_tag_from_accounts(twitter_accounts, tag)
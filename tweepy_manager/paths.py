@@ -15,9 +15,19 @@ DEFAULT_CONFIG_DIR = CONFIG_DIR / ".default"
 # In/Out
 INPUT_DIR = BASE_DIR / "input"
 OUTPUT_DIR = BASE_DIR / "output"
+# Текстовые файлы с аккаунтами (.csv, .tsv, .txt) для импорта. Таблицы .xlsx можно класть и в INPUT_DIR
+ACCOUNTS_DIR = INPUT_DIR / "accounts"
+# Свои списки слов (.txt, одно слово на строку) вместо загружаемого из сети
+WORDS_DIR = INPUT_DIR / "words"
+# Шаблоны (templates.txt), значения слотов шаблонов (slots/<slot>.txt) и корпус для цепи Маркова (corpus.txt)
+TEXT_DIR = INPUT_DIR / "text"
+TEXT_SLOTS_DIR = TEXT_DIR / "slots"
+
+# Cache
+CACHE_DIR = BASE_DIR / "cache"
 
 # Creating dirs and files
-for dirpath in (INPUT_DIR, OUTPUT_DIR, LOG_DIR):
+for dirpath in (INPUT_DIR, ACCOUNTS_DIR, OUTPUT_DIR, LOG_DIR, WORDS_DIR, TEXT_DIR, TEXT_SLOTS_DIR, CACHE_DIR):
     dirpath.mkdir(exist_ok=True)
 
 # Creating copies
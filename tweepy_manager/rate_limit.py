@@ -0,0 +1,134 @@
+import asyncio
+import time
+from typing import Hashable, Literal, Mapping
+
+from .config import CONFIG
+
+Action = Literal["follow", "quote", "lookup", "totp"]
+
+# Эндпоинты, по заголовкам x-rate-limit-* которых обновляются лимиты действия
+ACTION_ENDPOINTS: dict[Action, tuple[str, ...]] = {
+    "follow": ("/friendships/create.json", "/friendships/destroy.json"),
+    "quote": ("/CreateTweet",),
+    "lookup": ("/UserByScreenName", "/UsersByRestIds", "/TweetResultByRestId", "/TweetDetail"),
+    "totp": ("/twoFactorAuthSettings2",),
+}
+
+
+def url_to_action(url: str) -> Action | None:
+    for action, endpoints in ACTION_ENDPOINTS.items():
+        if any(endpoint in url for endpoint in endpoints):
+            return action
+    return None
+
+
+class TokenBucket:
+    """
+    capacity действий за period секунд.
+    Ожидание в acquire() длится ровно столько, сколько нужно для появления токена.
+    """
+
+    def __init__(self, capacity: int, period: float):
+        self.capacity = capacity
+        self.period = period
+        self.rate = capacity / period
+        self._tokens = float(capacity)
+        self._updated_at = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated_at) * self.rate)
+        self._updated_at = now
+
+    def is_idle(self) -> bool:
+        """Ведро полное и никто не ждет токен: его можно удалить и при необходимости создать заново."""
+        self._refill()
+        return self._tokens >= self.capacity and not self._lock.locked()
+
+    def delay(self) -> float:
+        self._refill()
+        return max(1 - self._tokens, 0) / self.rate
+
+    async def acquire(self) -> float:
+        """
+        :return: Сколько секунд пришлось ждать.
+        """
+        async with self._lock:
+            delay = self.delay()
+            if delay:
+                await asyncio.sleep(delay)
+                self._refill()
+            self._tokens -= 1
+            return delay
+
+    def update(self, limit: int, remaining: int, reset: float):
+        """
+        Подстраивает ведро под фактические лимиты Twitter.
+
+        :param limit: x-rate-limit-limit
+        :param remaining: x-rate-limit-remaining
+        :param reset: x-rate-limit-reset (unix time)
+        """
+        self._refill()
+        # Длина окна в заголовках не передается: limit действий распределяется на то же окно period
+        self.capacity = limit
+        self.rate = limit / self.period
+        if remaining > 0:
+            self._tokens = min(self._tokens, remaining)
+        else:
+            # Долг, который погасится ровно к моменту сброса лимита
+            self._tokens = min(self._tokens, 1 - max(reset - time.time(), 0) * self.rate)
+
+
+class RateLimiter:
+    """
+    Token bucket на каждую пару (аккаунт, тип действия).
+    Простаивающие (полные) ведра удаляются не чаще раза в evict_interval секунд:
+    новое ведро в таком же состоянии создается при следующем действии.
+    """
+
+    def __init__(self, limits: Mapping[Action, tuple[int, int]], evict_interval: float = 60):
+        self.limits = limits
+        self.evict_interval = evict_interval
+        self._buckets: dict[tuple[Hashable, Action], TokenBucket] = {}
+        self._evicted_at = time.monotonic()
+
+    def _evict_idle(self):
+        now = time.monotonic()
+        if now - self._evicted_at < self.evict_interval:
+            return
+        self._evicted_at = now
+        for key in [key for key, bucket in self._buckets.items() if bucket.is_idle()]:
+            del self._buckets[key]
+
+    def bucket(self, account_key: Hashable, action: Action) -> TokenBucket:
+        self._evict_idle()
+        key = (account_key, action)
+        if key not in self._buckets:
+            self._buckets[key] = TokenBucket(*self.limits[action])
+        return self._buckets[key]
+
+    async def acquire(self, account_key: Hashable, action: Action) -> float:
+        return await self.bucket(account_key, action).acquire()
+
+    def update_from_headers(self, account_key: Hashable, url: str, headers: Mapping[str, str]):
+        if not (action := url_to_action(url)):
+            return
+
+        try:
+            limit = int(headers["x-rate-limit-limit"])
+            remaining = int(headers["x-rate-limit-remaining"])
+            reset = int(headers["x-rate-limit-reset"])
+        except (KeyError, TypeError, ValueError):
+            return
+
+        self.bucket(account_key, action).update(limit, remaining, reset)
+
+
+RATE_LIMITER = RateLimiter({
+    "follow": CONFIG.RATE_LIMITS.FOLLOW,
+    "quote": CONFIG.RATE_LIMITS.QUOTE,
+    "lookup": CONFIG.RATE_LIMITS.LOOKUP,
+    "totp": CONFIG.RATE_LIMITS.TOTP,
+})
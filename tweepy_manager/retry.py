@@ -0,0 +1,185 @@
+import random
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Callable, Hashable
+
+import curl_cffi
+import twitter
+
+from .config import CONFIG
+
+
+@dataclass(frozen=True)
+class ErrorClass:
+    name: str
+    retries: int = 0
+    proxy_failure: bool = False  # Учитывается circuit breaker'ом прокси
+
+
+SERVER_ERROR = ErrorClass("Server error", retries=CONFIG.RETRY.SERVER_ERROR_RETRIES)
+NETWORK_ERROR = ErrorClass("May be bad or slow proxy", retries=CONFIG.RETRY.NETWORK_ERROR_RETRIES, proxy_failure=True)
+RATE_LIMITED = ErrorClass("Rate limited", retries=CONFIG.RETRY.RATE_LIMIT_RETRIES)
+RELOGIN_FAILED = ErrorClass("Relogin failed! Try again later")
+BAD_ACCOUNT = ErrorClass("Bad account")
+TWITTER_ERROR = ErrorClass("Twitter error")
+REQUEST_ERROR = ErrorClass("Request error")
+
+# Коды ошибок curl, которые обычно означают плохой или медленный прокси
+# https://curl.se/libcurl/c/libcurl-errors.html
+PROXY_CURL_CODES = frozenset((7, 18, 23, 28, 35, 56))
+
+Classifier = Callable[[Exception], ErrorClass | None]
+
+
+def classify_twitter_error(exc: Exception) -> ErrorClass | None:
+    if isinstance(exc, twitter.errors.BadAccount):
+        # Включая AccountNotFound (код 399): статус аккаунта сохраняется, аккаунт не удаляется
+        return BAD_ACCOUNT
+
+    if isinstance(exc, twitter.errors.HTTPException):
+        if 398 in exc.api_codes:
+            return RELOGIN_FAILED
+        if exc.response.status_code == 429:
+            return RATE_LIMITED
+        if exc.response.status_code >= 500:
+            return SERVER_ERROR
+
+    if isinstance(exc, twitter.errors.TwitterException):
+        return TWITTER_ERROR
+
+    return None
+
+
+def classify_requests_error(exc: Exception) -> ErrorClass | None:
+    if isinstance(exc, curl_cffi.requests.errors.RequestsError):
+        if exc.code in PROXY_CURL_CODES:
+            return NETWORK_ERROR
+        return REQUEST_ERROR
+
+    return None
+
+
+def retry_after(exc: Exception) -> float | None:
+    """Время до снятия ограничения по заголовкам Retry-After или x-rate-limit-reset."""
+    response = getattr(exc, "response", None)
+    if response is None:
+        return None
+
+    if value := response.headers.get("retry-after"):
+        try:
+            return max(float(value), 0)
+        except ValueError:
+            pass
+
+    if value := response.headers.get("x-rate-limit-reset"):
+        try:
+            return max(int(value) - time.time() + 1, 0)
+        except ValueError:
+            pass
+
+    return None
+
+
+@dataclass
+class RetryState:
+    attempts: Counter[ErrorClass] = field(default_factory=Counter)
+
+    @property
+    def total_attempts(self) -> int:
+        return sum(self.attempts.values())
+
+
+class RetryPolicy:
+    """
+    Классифицирует исключения и решает, повторять ли попытку и через сколько секунд.
+
+    - У каждого класса ошибок свой бюджет повторных попыток,
+      общее количество попыток ограничено CONFIG.CONCURRENCY.MAX_RETRIES.
+    - Задержка растет экспоненциально от CONFIG.CONCURRENCY.DELAY_BETWEEN_RETRIES
+      до CONFIG.RETRY.MAX_DELAY, с джиттером.
+    - При 429 задержка берется из заголовков ответа.
+
+    Дополнительные классификаторы подключаются методом register().
+    """
+
+    def __init__(
+            self,
+            *,
+            max_attempts: int = CONFIG.CONCURRENCY.MAX_RETRIES,
+            base_delay: float = CONFIG.CONCURRENCY.DELAY_BETWEEN_RETRIES,
+            max_delay: float = CONFIG.RETRY.MAX_DELAY,
+            jitter: bool = CONFIG.RETRY.JITTER,
+    ):
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.jitter = jitter
+        self.classifiers: list[Classifier] = [classify_twitter_error, classify_requests_error]
+
+    def register(self, classifier: Classifier):
+        """Классификатор, зарегистрированный позже, проверяется раньше."""
+        self.classifiers.insert(0, classifier)
+
+    def classify(self, exc: Exception) -> ErrorClass | None:
+        for classifier in self.classifiers:
+            if error_class := classifier(exc):
+                return error_class
+        return None
+
+    def backoff(self, attempt: int) -> float:
+        delay = min(self.base_delay * 2 ** (attempt - 1), self.max_delay)
+        if self.jitter:
+            delay = random.uniform(delay / 2, delay)
+        return delay
+
+    def next_delay(self, error_class: ErrorClass, exc: Exception, state: RetryState) -> float | None:
+        """
+        Учитывает попытку и возвращает задержку перед следующей
+        или None, если попытки закончились.
+        """
+        state.attempts[error_class] += 1
+        if (state.attempts[error_class] > error_class.retries
+                or state.total_attempts >= self.max_attempts):
+            return None
+
+        if error_class is RATE_LIMITED and (delay := retry_after(exc)) is not None:
+            return delay
+
+        return self.backoff(state.attempts[error_class])
+
+
+class CircuitBreaker:
+    """
+    Размыкается для ключа (прокси) после threshold ошибок подряд на cooldown секунд.
+    После паузы первая же ошибка снова размыкает его.
+    """
+
+    def __init__(
+            self,
+            threshold: int = CONFIG.RETRY.CIRCUIT_BREAKER_THRESHOLD,
+            cooldown: float = CONFIG.RETRY.CIRCUIT_BREAKER_COOLDOWN,
+    ):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self._failures: Counter[Hashable] = Counter()
+        self._half_open: set[Hashable] = set()
+
+    def record_success(self, key: Hashable):
+        self._failures.pop(key, None)
+        self._half_open.discard(key)
+
+    def record_failure(self, key: Hashable) -> float | None:
+        """
+        :return: На сколько секунд разомкнуть цепь или None.
+        """
+        if self.threshold <= 0:
+            return None
+
+        self._failures[key] += 1
+        if key in self._half_open or self._failures[key] >= self.threshold:
+            self._failures.pop(key, None)
+            self._half_open.add(key)
+            return self.cooldown
+
+        return None
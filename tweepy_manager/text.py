@@ -0,0 +1,57 @@
+import asyncio
+from pathlib import Path
+
+from loguru import logger
+
+from common.text import TextGenerator, TextPool, WordsGenerator, TemplateGenerator, MarkovGenerator
+
+from .config import CONFIG
+from .paths import TEXT_DIR, TEXT_SLOTS_DIR
+from .utils import request_english_words
+
+TEMPLATES_TXT = TEXT_DIR / "templates.txt"
+CORPUS_TXT = TEXT_DIR / "corpus.txt"
+
+
+def _read_lines(filepath: Path) -> list[str]:
+    if not filepath.exists():
+        raise FileNotFoundError(f"{filepath} is required for the {CONFIG.TEXT.STRATEGY} text strategy")
+    with open(filepath, "r", encoding="utf-8") as file:
+        return [line.strip() for line in file if line.strip()]
+
+
+def _create_generator(words) -> TextGenerator:
+    if CONFIG.TEXT.STRATEGY == "templates":
+        # Слот {word} — случайное слово, остальные слоты — строки из TEXT_SLOTS_DIR/<slot>.txt
+        slots = {filepath.stem: _read_lines(filepath) for filepath in TEXT_SLOTS_DIR.glob("*.txt")}
+        slots.setdefault("word", words)
+        return TemplateGenerator(_read_lines(TEMPLATES_TXT), slots)
+
+    if CONFIG.TEXT.STRATEGY == "markov":
+        return MarkovGenerator(_read_lines(CORPUS_TXT), CONFIG.TEXT.MARKOV_ORDER, CONFIG.TEXT.MARKOV_MAX_WORDS)
+
+    return WordsGenerator(words, CONFIG.TEXT.WORDS_COUNT)
+
+
+def _create_text_pool(words) -> TextPool:
+    if CONFIG.TEXT.STRATEGY == "words" and CONFIG.TEXT.WORDS_COUNT == (1, 1):
+        # Список слов уже состоит из уникальных текстов
+        return TextPool(words)
+
+    text_pool = TextPool.generate(_create_generator(words), CONFIG.TEXT.POOL_SIZE)
+    if len(text_pool) < CONFIG.TEXT.POOL_SIZE:
+        logger.warning(f"Only {len(text_pool)} unique texts of {CONFIG.TEXT.POOL_SIZE}"
+                       f" were generated ({CONFIG.TEXT.STRATEGY}). Add more templates, slot values or corpus")
+    return text_pool
+
+
+async def create_text_pool() -> TextPool:
+    """
+    Тексты для цитат по стратегии CONFIG.TEXT.STRATEGY, подготовленные один раз на запуск.
+    Генерация выполняется в отдельном потоке и не блокирует цикл событий.
+    """
+    # Цепи Маркова список слов не нужен
+    words = await request_english_words() if CONFIG.TEXT.STRATEGY != "markov" else None
+    text_pool = await asyncio.to_thread(_create_text_pool, words)
+    logger.info(f"Prepared {len(text_pool)} texts ({CONFIG.TEXT.STRATEGY})")
+    return text_pool
@@ -1,32 +1,31 @@
-import asyncio
-import random
-
 from loguru import logger
-from common.sqlalchemy.crud import update_or_create
-from sqlalchemy import select
+from common.sqlalchemy.crud import bulk_get_or_create
+from sqlalchemy import delete
 import twitter
 
 from .config import CONFIG
-from .database.models import TwitterAccount, TwitterUser, Following, Tweet
-from .database import AsyncSessionmaker
+from .database.models import TwitterUser, Following, Tweet
+from .database.records import AccountRecord
+from .database import AsyncSessionmaker, write_buffer
+from .rate_limit import RATE_LIMITER, Action
+
 
+USER_FIELDS = {"id", "username", "name", "created_at", "description", "location", "followers_count", "friends_count"}
 
-async def sleep_between_actions(twitter_account: TwitterAccount):
-    sleep_time = random.randint(*CONFIG.CONCURRENCY.DELAY_BETWEEN_ACTIONS)
-    if not sleep_time:
-        return
 
-    logger.info(f"@{twitter_account.username} (id={twitter_account.twitter_id}) Sleep time: {sleep_time} seconds")
-    await asyncio.sleep(sleep_time)
+def dump_user(user: twitter.User) -> dict:
+    """Поля TwitterUser из модели пользователя (или аккаунта) Twitter."""
+    return user.model_dump(include=USER_FIELDS)
 
 
 class TwitterClient(twitter.Client):
     """
-    - Принимает модель TwitterAccount
-    - Сохраняет данные о TwitterAccount и TwitterAccount.user в бд по завершении работы
+    - Принимает легкую модель аккаунта AccountRecord
+    - Сохраняет данные о TwitterAccount и TwitterAccount.user в бд по завершении работы (отложенно, пачками)
+    - Соблюдает лимиты Twitter на действия аккаунта (см. rate_limit.py)
     """
 
-    def __init__(self, twitter_account: TwitterAccount):
+    def __init__(self, twitter_account: AccountRecord):
         self.db_account = twitter_account
 
         account = twitter.Account(
@@ -42,35 +41,62 @@ class TwitterClient(twitter.Client):
         )
         super().__init__(
             account,
-            proxy=twitter_account.proxy.better_proxy(),
+            proxy=twitter_account.proxy,
             max_unlock_attempts=CONFIG.TWITTER.MAX_UNLOCK_ATTEMPTS,
             capsolver_api_key=CONFIG.CAPTCHA.CAPSOLVER_API_KEY,
             update_account_info_on_startup=False,
+            # 429 обрабатывается планировщиком повторных попыток, чтобы не занимать воркера ожиданием
+            wait_on_rate_limit=False,
         )
 
+    async def _request(self, method, url, **kwargs):
+        try:
+            response, data = await super()._request(method, url, **kwargs)
+        except twitter.errors.HTTPException as exc:
+            RATE_LIMITER.update_from_headers(self.db_account.database_id, url, exc.response.headers)
+            raise
+
+        RATE_LIMITER.update_from_headers(self.db_account.database_id, url, response.headers)
+        return response, data
+
+    async def wait_for_rate_limit(self, action: Action):
+        if delay := await RATE_LIMITER.acquire(self.db_account.database_id, action):
+            logger.info(f"@{self.db_account.username} (id={self.db_account.twitter_id})"
+                        f" Waited {delay:.1f} seconds for {action} rate limit")
+
+    async def request_user_by_username(self, username: str):
+        await self.wait_for_rate_limit("lookup")
+        return await super().request_user_by_username(username)
+
+    async def request_tweet(self, tweet_id: int | str):
+        await self.wait_for_rate_limit("lookup")
+        return await super().request_tweet(tweet_id)
+
+    async def enable_totp(self):
+        await self.wait_for_rate_limit("totp")
+        return await super().enable_totp()
+
     async def __aexit__(self, *args):
         await self.close()
 
     async def close(self):
-        async with AsyncSessionmaker() as session:
-            twitter_account_data = self.account.model_dump(
-                include={"id", "auth_token", "ct0", "username", "password", "email", "totp_secret", "backup_code",
-                         "status"}
-            )
-            session.add(self.db_account)
-            # По сути это как update из Django ORM
-            for key, value in twitter_account_data.items():
-                setattr(self.db_account, key, value)
-
-            twitter_user_data = self.account.model_dump(
-                include={"id", "username", "name", "created_at", "description", "location", "followers_count",
-                         "friends_count"}
-            )
-            if twitter_user_data["id"]:
-                self.db_account.user, _ = await update_or_create(
-                    session, TwitterUser, twitter_user_data, filter_by={"id": twitter_user_data["id"]})
+        """
+        Данные аккаунта и его пользователя попадают в буфер отложенной записи
+        и сохраняются пачкой вместе с данными других аккаунтов.
+        """
+        twitter_account_data = self.account.model_dump(
+            include={"auth_token", "ct0", "username", "password", "email", "totp_secret", "backup_code", "status"}
+        )
+        twitter_user_data = dump_user(self.account)
+        if twitter_user_data["id"]:
+            twitter_account_data["twitter_id"] = twitter_user_data["id"]
+            await write_buffer.add_user(twitter_user_data)
+            self.db_account.followers_count = twitter_user_data["followers_count"]
+        await write_buffer.add_account(self.db_account.database_id, twitter_account_data)
 
-            await session.commit()
+        # Запись в памяти отражает то, что будет сохранено
+        for key, value in twitter_account_data.items():
+            setattr(self.db_account, key, value)
 
         await super().close()
 
@@ -83,6 +109,7 @@ class TwitterClient(twitter.Client):
     ) -> Tweet:
         # TODO Когда этот метод будет принимать tweet_id, а не tweet_url,
         #   не делать твит, если в бд уже есть об этом информация
+        await self.wait_for_rate_limit("quote")
         tweet = await self.quote(tweet_url, text, media_id=media_id)
 
         db_tweet = Tweet.from_pydantic_model(tweet)
@@ -90,44 +117,46 @@ class TwitterClient(twitter.Client):
             await session.merge(db_tweet)
             await session.commit()
 
-        await sleep_between_actions(self.db_account)
         return db_tweet
 
     async def follow_and_save(self, user: twitter.User) -> bool:
-        twitter_user_data = user.model_dump(
-            include={"id", "username", "name", "created_at", "description", "location", "followers_count",
-                     "friends_count"}
-        )
-
+        """
+        Проверяет подписку и сохраняет пользователя в бд, если его там еще нет,
+        затем подписывается (см. follow_and_buffer).
+        Существующая запись пользователя не перезаписывается: у user могут быть заполнены только id и username.
+        """
         async with AsyncSessionmaker() as session:
-            query = select(Following).options(
-            ).filter_by(
-                user_id=self.account.id,
-                followed_to_user_id=user.id,
-            )
-            if await session.scalar(query):
+            if await session.get(Following, (self.account.id, user.id)):
                 logger.warning(f"@{self.account.username} (id={self.account.id})"
                                f" User (id={user.id}) already followed")
                 return True
-            user, _ = await update_or_create(
-                session, TwitterUser, twitter_user_data, filter_by={"id": twitter_user_data["id"]})
+            await bulk_get_or_create(session, TwitterUser, [dump_user(user)], conflict_cols=["id"])
             await session.commit()
 
-            followed = await super().follow(user.id)
-            if followed:
-                logger.success(f"@{self.account.username} (id={self.account.id})"
-                               f" Followed: @{user.username} (id={user.id})")
-                session.add(Following(user_id=self.account.id, followed_to_user_id=user.id))
-                await session.commit()
-
-        await sleep_between_actions(self.db_account)
+        return await self.follow_and_buffer(user)
+
+    async def follow_and_buffer(self, user: twitter.User) -> bool:
+        """
+        Подписывается без обращений к бд: пользователь, на которого подписываются, должен быть уже сохранен.
+        Подписка попадает в буфер отложенной записи и сохраняется пачкой вместе с подписками других аккаунтов.
+        """
+        await self.wait_for_rate_limit("follow")
+        followed = await super().follow(user.id)
+        if followed:
+            logger.success(f"@{self.account.username} (id={self.account.id})"
+                           f" Followed: @{user.username} (id={user.id})")
+            # Пользователь аккаунта попадает в буфер раньше подписки: на него ссылается following.user_id
+            await write_buffer.add_user(dump_user(self.account))
+            await write_buffer.add_following(self.account.id, user.id)
         return followed
 
     async def unfollow_and_save(self, user_id: str | int):
+        await self.wait_for_rate_limit("follow")
         unfollowed = await super().unfollow(user_id)
         if unfollowed:
+            write_buffer.discard_following(self.account.id, int(user_id))
             async with AsyncSessionmaker() as session:
-                await session.delete(Following(user_id=self.account.id, followed_to_user_id=user_id))
+                await session.execute(delete(Following).filter_by(
+                    user_id=self.account.id, followed_to_user_id=int(user_id)))
                 await session.commit()
-        await sleep_between_actions(self.db_account)
         return unfollowed
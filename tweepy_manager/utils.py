@@ -1,16 +1,53 @@
-from functools import lru_cache
+import asyncio
 
 from loguru import logger
 import requests
 
+from common.words import WordList, read_words
 
-@lru_cache
-def request_english_words() -> list[str]:
+from .paths import CACHE_DIR, WORDS_DIR
+
+ENGLISH_WORDS_URL = "https://raw.githubusercontent.com/dwyl/english-words/master/words_alpha.txt"
+ENGLISH_WORDS_CACHE = CACHE_DIR / "english_words.txt"
+USER_WORDS_CACHE = CACHE_DIR / "user_words.txt"
+
+_english_words: WordList | None = None
+
+
+def _download_english_words() -> WordList:
+    try:
+        response = requests.get(ENGLISH_WORDS_URL, timeout=60)
+        response.raise_for_status()
+    except requests.RequestException as exc:
+        raise RuntimeError(f"Failed to request english words ({exc})."
+                           f" Put your own word lists (.txt, one word per line) into {WORDS_DIR}") from exc
+    words = WordList.build(ENGLISH_WORDS_CACHE, response.text.splitlines())
+    logger.info(f"Requested {len(words)} english words from {ENGLISH_WORDS_URL}")
+    return words
+
+
+def _load_english_words() -> WordList:
+    # Свои списки слов из WORDS_DIR важнее загружаемого
+    if user_word_files := sorted(WORDS_DIR.glob("*.txt")):
+        if WordList.is_built(USER_WORDS_CACHE, newer_than=user_word_files):
+            return WordList(USER_WORDS_CACHE)
+        words = WordList.build(USER_WORDS_CACHE, read_words(user_word_files))
+        logger.info(f"Loaded {len(words)} words from {len(user_word_files)} files in {WORDS_DIR}")
+        return words
+
+    if WordList.is_built(ENGLISH_WORDS_CACHE):
+        return WordList(ENGLISH_WORDS_CACHE)
+    return _download_english_words()
+
+
+async def request_english_words() -> WordList:
     """
-    Запрашивает список английских слов.
+    Список английских слов. Загружается из сети один раз и хранится в CACHE_DIR,
+    после этого открывается с диска мгновенно и без сети.
+    Если в WORDS_DIR есть файлы .txt, используются слова из них.
+    Загрузка и чтение с диска выполняются в отдельном потоке и не блокируют цикл событий.
     """
-    url = 'https://raw.githubusercontent.com/dwyl/english-words/master/words_alpha.txt'
-    response = requests.get(url)
-    words = response.text.splitlines()
-    logger.info(f"Requested {len(words)} english words from {url}")
-    return words
+    global _english_words
+    if _english_words is None:
+        _english_words = await asyncio.to_thread(_load_english_words)
+    return _english_words